@@ -1,5 +1,7 @@
 import streamlit as st
 from utils.langfuse_monitor import is_monitoring_enabled
+from utils.client_pool import render_pool_stats
+from utils.query_cache import render_query_cache_stats
 
 def show_admin_page():
     st.title("🔒 관리자 페이지")
@@ -13,6 +15,14 @@ def show_admin_page():
     else:
         st.warning("⚠️ Langfuse 모니터링이 비활성화되어 있습니다")
 
+    # 프로세스 공용 LLM 클라이언트/HTTP 연결 재사용 현황
+    st.subheader("🔌 LLM 연결 재사용")
+    render_pool_stats()
+
+    # help_uiux/web_search 질문 캐시 적중 현황
+    st.subheader("🗂️ 검색 결과 캐시")
+    render_query_cache_stats()
+
 def login_form():
     st.title("🔐 관리자 로그인")
     password = st.text_input("비밀번호를 입력하세요", type="password")
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# 오디오 정규화 단계(다운믹스 → 16kHz 리샘플링 → 16-bit 재양자화)의 처리량 측정
+# 결과는 CPU 1초당 처리한 오디오 길이(초)로 출력한다.
+# 실행: python benchmarks/bench_audio_normalize.py --seconds 600
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.speech_utils import WavAudio, normalize_wav_audio
+
+
+def make_test_audio(seconds, frame_rate, channels, sample_width):
+    """음성 대역 톤과 잡음을 섞은 합성 PCM 생성"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+    frames = np.repeat(signal[:, None], channels, axis=1)
+
+    if sample_width == 2:
+        pcm = (frames * 32767).astype('<i2')
+    elif sample_width == 4:
+        pcm = (frames * (2 ** 31 - 1)).astype('<i4')
+    else:
+        raise ValueError("2 또는 4 바이트 샘플만 지원합니다")
+
+    return WavAudio(channels, sample_width, frame_rate, len(t), memoryview(pcm.tobytes()))
+
+
+def run(seconds, repeat):
+    cases = [
+        ("48kHz 스테레오 16-bit", 48000, 2, 2),
+        ("44.1kHz 스테레오 16-bit", 44100, 2, 2),
+        ("48kHz 모노 32-bit", 48000, 1, 4),
+        ("8kHz 모노 16-bit (업샘플링)", 8000, 1, 2),
+    ]
+
+    print(f"오디오 길이: {seconds}초, 반복: {repeat}회")
+    print(f"{'입력 형식':<28}{'CPU 시간(초)':>14}{'오디오초/CPU초':>16}{'전송량 감소':>12}")
+    for name, frame_rate, channels, sample_width in cases:
+        audio = make_test_audio(seconds, frame_rate, channels, sample_width)
+
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.process_time()
+            normalized = normalize_wav_audio(audio)
+            best = min(best, time.process_time() - start)
+
+        throughput = seconds / best if best > 0 else float("inf")
+        reduction = len(audio.data) / len(normalized.data)
+        print(f"{name:<28}{best:>14.3f}{throughput:>16.0f}{reduction:>11.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오디오 정규화 처리량 벤치마크")
+    parser.add_argument("--seconds", type=float, default=300, help="합성 오디오 길이(초)")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최소 CPU 시간 사용)")
+    args = parser.parse_args()
+    run(args.seconds, args.repeat)
@@ -1,15 +1,34 @@
 from dotenv import load_dotenv
 import streamlit as st
-import os, json, re, datetime
+import os, json, datetime, asyncio
 from langchain.schema import HumanMessage, SystemMessage
-from utils.speech_utils import init_speech_config, speech_to_text_safe, validate_wav_file_only
-from utils.langchain_utils import init_langchain_client
+from utils.speech_utils import init_speech_config, speech_to_text_safe, validate_wav_file_only, open_uploaded_wav
+from utils.langchain_utils import init_langchain_client, stream_llm_response, record_prompt_usage
+from utils.json_stream import IncrementalJSONExtractor
+from utils.structured_output import (
+    JSON_RESPONSE_FORMAT, REQUIREMENTS_ANALYSIS_SCHEMA, INTEGRATED_CODE_IMPROVEMENT_SCHEMA, INTEGRATED_CODE_PATCH_SCHEMA,
+    validate_structured_response, render_schema_errors
+)
+from utils.code_patch import (
+    OUTPUT_MODES, PATCH_OUTPUT_FORMAT_RULES, apply_patch_result, merge_edit_hunks, render_patch_failures, render_merge_conflicts
+)
+from utils.code_structure import detect_code_language, split_code_units, route_requirements, group_requirements, replace_units
+from utils.json_stream import extract_json_object
+from utils.token_budget import plan_execution, render_execution_plan
 
 # 회의록에서 요구사항 도출 > 코드 개선 > 통합 결과 전체를 한 화면에서 제공하는 페이지
 
 # 환경변수 로드
 load_dotenv()
 llm_name = os.getenv("AZURE_OPENAI_LLM_MINI")
+ANALYSIS_OUTPUT_TOKENS = 4000       # 요구사항 분석 JSON의 예상 최대 길이
+CODE_CHANGES_OUTPUT_TOKENS = 3000   # 개선된 전체 코드 외 applied_changes/summary의 예상 길이
+CODE_PATCH_OUTPUT_TOKENS = 6000     # 패치 모드에서 편집(search/replace) 전체의 예상 길이
+CODE_SINGLE_PASS_TOKENS = 8000      # 코드 개선 입력이 이보다 크면 구조 단위로 나누어 동시에 개선
+CODE_UNIT_TOKENS = 3000             # 구조 단위 하나의 최대 토큰 수 (더 큰 DOM 하위 트리는 자식 단위로 분할)
+CODE_UNIT_MAX_CONCURRENCY = 4       # 동시에 요청하는 단위 개선 수
+CODE_GROUP_MIN_REQUIREMENTS = 4     # 요구사항이 이 수 이상이면 그룹별로 나누어 동시에 적용할 수 있음
+CODE_GROUP_MAX_CONCURRENCY = 4      # 동시에 요청하는 요구사항 그룹 수
 
 # 회의록 분석 시스템 프롬프트
 MEETING_ANALYSIS_PROMPT = """
@@ -56,10 +75,36 @@ MEETING_ANALYSIS_PROMPT = """
 - 실행 가능한 구체적 개선안 제시
 """
 
-# 코드 개선 시스템 프롬프트 생성 함수
-def create_code_improvement_prompt(code_language, focus_area):
+# 코드 개선 시스템 프롬프트 생성 함수 (출력 방식별로 항상 같은 문자열)
+# 대상 언어/집중 영역처럼 요청마다 바뀌는 값은 사용자 메시지 앞부분에 두어, 긴 시스템 프롬프트가 provider 프롬프트 캐시의 공통 prefix가 되도록 한다.
+def create_code_improvement_prompt(output_mode="full"):
+    if output_mode == "patch":
+        # 변경 부분만 search/replace 편집으로 받아 로컬에서 적용 (출력 길이가 변경량에 비례)
+        final_step = "3. 접근성, 반응형, 사용성을 고려하여 변경이 필요한 부분만 편집(search/replace)으로 작성"
+        changes_format = """    {
+      "requirement": "적용된 요구사항",
+      "change_description": "구체적인 변경 내용",
+      "search": "현재 코드에서 바꿀 부분 (원문 그대로)",
+      "replace": "search를 대체할 새 코드"
+    }"""
+        code_field = ""
+        patch_rules = PATCH_OUTPUT_FORMAT_RULES
+        last_rule = "- 모든 편집을 적용한 결과가 실행 가능한 완전한 코드가 되도록 작성"
+    else:
+        final_step = "3. 접근성, 반응형, 사용성을 고려한 완전한 코드 작성"
+        changes_format = """    {
+      "requirement": "적용된 요구사항",
+      "change_description": "구체적인 변경 내용",
+      "code_section": "수정된 핵심 코드 부분",
+      "before_after": "변경 전후 비교"
+    }"""
+        code_field = """
+  "improved_code": "개선된 완전한 실행 가능한 코드","""
+        patch_rules = ""
+        last_rule = "- 실행 가능한 완전한 코드 제공"
+
     return f"""
-당신은 {code_language.upper()} 코드 개선 전문가입니다.
+당신은 웹 프론트엔드(HTML, React, Vue, Angular, JSP, JavaScript) 코드 개선 전문가입니다.
 
 **역할:**
 회의록에서 분석된 UI/UX 요구사항을 바탕으로 기존 코드를 직접 개선합니다.
@@ -67,20 +112,14 @@ def create_code_improvement_prompt(code_language, focus_area):
 **개선 절차:**
 1. JSON 형태의 요구사항을 현재 코드에 직접 반영
 2. 요구사항별로 구체적인 코드 수정 적용
-3. 접근성, 반응형, 사용성을 고려한 완전한 코드 작성
+{final_step}
 
 **출력 형식:**
 ```json
 {{
   "applied_changes": [
-    {{
-      "requirement": "적용된 요구사항",
-      "change_description": "구체적인 변경 내용",
-      "code_section": "수정된 핵심 코드 부분",
-      "before_after": "변경 전후 비교"
-    }}
-  ],
-  "improved_code": "개선된 완전한 실행 가능한 코드",
+{changes_format}
+  ],{code_field}
   "technical_improvements": [
     "성능 개선사항",
     "접근성 개선사항", 
@@ -93,16 +132,21 @@ def create_code_improvement_prompt(code_language, focus_area):
   }}
 }}
 ```
-
+{patch_rules}
 **개선 시 고려사항:**
-- {code_language.upper()}의 최신 모범 사례 적용
+- 대상 언어의 최신 모범 사례 적용
 - 요구사항을 정확히 코드에 반영
 - 기존 기능은 유지하면서 개선
 - 크로스 브라우저 호환성 고려
 - 접근성 (WCAG) 가이드라인 준수
 - 반응형 디자인 적용
-- 실행 가능한 완전한 코드 제공
+{last_rule}
+- 사용자 메시지에 지정된 특별 집중 영역에 특히 집중하여 개선
+"""
 
+def create_code_improvement_context(code_language, focus_area):
+    """요청마다 달라지는 코드 개선 조건 (사용자 메시지 맨 앞에 둠)"""
+    return f"""**대상 언어:** {code_language.upper()}
 **특별 집중 영역:** {focus_area}에 특히 집중하여 개선하세요.
 """
 
@@ -121,25 +165,6 @@ def parse_requirements(requirements_text):
     
     return requirements_text, "text"
 
-def detect_code_language(code):
-    """코드 내용을 분석하여 언어를 자동 감지"""
-    code_lower = code.lower()
-    
-    if 'import react' in code_lower or 'from react' in code_lower or 'jsx' in code_lower:
-        return 'react'
-    elif '<%' in code and '%>' in code:
-        return 'jsp'
-    elif '<html' in code_lower or '<!doctype html' in code_lower:
-        return 'html'
-    elif 'function' in code_lower and ('document.' in code_lower or 'window.' in code_lower):
-        return 'javascript'
-    elif '<template>' in code_lower and '<script>' in code_lower:
-        return 'vue'
-    elif 'component' in code_lower and '@' in code:
-        return 'angular'
-    else:
-        return 'html'
-
 def analyze_meeting_notes(llm, meeting_content):
     """회의록을 분석하여 요구사항 도출"""
     try:
@@ -148,30 +173,41 @@ def analyze_meeting_notes(llm, meeting_content):
             HumanMessage(content=f"다음 회의록을 분석하여 UI/UX 개선 요구사항을 도출해주세요:\n\n{meeting_content}")
         ]
         
-        response = llm.invoke(messages)
+        # 요구사항/피드백 항목은 JSON 원소가 완성되는 대로 바로 표시
+        extractor = IncrementalJSONExtractor(["ui_requirements", "user_feedback"], REQUIREMENTS_ANALYSIS_SCHEMA["required"])
+        live = st.empty()
+        board = live.container()
+        feedback_count = 0
         
-        # JSON 파싱 시도
-        try:
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', response.content, re.DOTALL)
-            if json_match:
-                json_content = json_match.group(1)
-                analysis_result = json.loads(json_content)
-                return {"success": True, "data": analysis_result, "raw": response.content}
-            else:
-                analysis_result = json.loads(response.content)
-                return {"success": True, "data": analysis_result, "raw": response.content}
-        except json.JSONDecodeError:
-            return {"success": True, "data": None, "raw": response.content}
+        def render_items(text):
+            nonlocal feedback_count
+            for key, item in extractor.feed(text):
+                with board:
+                    if key == "ui_requirements":
+                        render_requirement_item(item)
+                    else:
+                        feedback_count += 1
+                        render_feedback_item(feedback_count, item)
+        
+        response = stream_llm_response(llm, messages, stage="requirements_analysis", on_text=render_items,
+                                       show_preview=False, response_format=JSON_RESPONSE_FORMAT)
+        live.empty()
+        
+        # 스트리밍 중 찾은 JSON 객체를 스키마로 검증하고 형식이 맞지 않는 필드만 부분 복구
+        data, schema_errors = validate_structured_response(
+            llm, extractor.close(), REQUIREMENTS_ANALYSIS_SCHEMA, "requirements_analysis"
+        )
+        return {"success": True, "data": data, "raw": response.content, "schema_errors": schema_errors}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def improve_code_with_requirements(llm, requirements, current_code, code_language, focus_area):
-    """요구사항을 바탕으로 코드 개선"""
+def improve_code_with_requirements(llm, requirements, current_code, code_language, focus_area, output_mode="full"):
+    """요구사항을 바탕으로 코드 개선 (patch 모드는 편집만 받아 로컬에서 적용)"""
     try:
-        system_prompt = create_code_improvement_prompt(code_language, focus_area)
+        system_prompt = create_code_improvement_prompt(output_mode)
         
-        user_message = f"""
+        user_message = f"""{create_code_improvement_context(code_language, focus_area)}
 **분석된 요구사항 (JSON):**
 ```json
 {json.dumps(requirements, ensure_ascii=False, indent=2)}
@@ -191,28 +227,288 @@ def improve_code_with_requirements(llm, requirements, current_code, code_languag
             HumanMessage(content=user_message)
         ]
         
-        response = llm.invoke(messages)
+        # 적용된 변경사항은 완성되는 대로 표시하고, 긴 improved_code는 원문 미리보기로 진행 상황 표시
+        schema = INTEGRATED_CODE_PATCH_SCHEMA if output_mode == "patch" else INTEGRATED_CODE_IMPROVEMENT_SCHEMA
+        extractor = IncrementalJSONExtractor(["applied_changes"], schema["required"])
+        live = st.empty()
+        board = live.container()
+        change_count = 0
         
-        # JSON 파싱 시도
-        try:
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', response.content, re.DOTALL)
-            if json_match:
-                json_content = json_match.group(1)
-                improvement_result = json.loads(json_content)
-                return {"success": True, "data": improvement_result, "raw": response.content}
-            else:
-                improvement_result = json.loads(response.content)
-                return {"success": True, "data": improvement_result, "raw": response.content}
-        except json.JSONDecodeError:
-            return {"success": True, "data": None, "raw": response.content}
+        def render_items(text):
+            nonlocal change_count
+            for _, change in extractor.feed(text):
+                change_count += 1
+                with board:
+                    render_applied_change(change_count, change, code_language)
+        
+        response = stream_llm_response(llm, messages, stage="code_improvement", on_text=render_items,
+                                       response_format=JSON_RESPONSE_FORMAT)
+        live.empty()
+        
+        data, schema_errors = validate_structured_response(
+            llm, extractor.close(), schema, "code_improvement"
+        )
+        
+        # 패치 모드: 편집을 현재 코드에 적용하여 improved_code 생성 (적용되지 않은 편집은 따로 안내)
+        patch_failures = apply_patch_result(data, current_code) if output_mode == "patch" and data else []
+        return {"success": True, "data": data, "raw": response.content, "schema_errors": schema_errors,
+                "patch_failures": patch_failures}
+            
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def improve_code_in_units(llm, requirements, current_code, code_language, focus_area, output_mode, max_unit_tokens):
+    """큰 코드를 구조 단위(DOM 하위 트리, style/script 블록, 컴포넌트)로 나누어 관련 요구사항만 배정하고,
+    요구사항이 배정된 단위들을 동시에 개선한 뒤 하나의 파일로 다시 조립"""
+    try:
+        ui_requirements = requirements.get("ui_requirements") or [] if isinstance(requirements, dict) else []
+        units = split_code_units(current_code, code_language, max_unit_tokens)
+        routes = route_requirements(units, ui_requirements)
+        jobs = [(units[index], [ui_requirements[number] for number in numbers]) for index, numbers in routes.items() if numbers]
+        if len(jobs) < 2:
+            # 나눌 구조가 없거나 요구사항이 한 단위에 몰리면 한 번에 개선
+            return improve_code_with_requirements(llm, requirements, current_code, code_language, focus_area, output_mode)
+        
+        st.caption(f"🧩 코드를 {len(units)}개 단위로 나누어, 요구사항이 배정된 {len(jobs)}개 단위를 동시에 개선합니다 "
+                   f"(최대 {CODE_UNIT_MAX_CONCURRENCY}개 동시 요청)")
+        
+        system_prompt = create_code_improvement_prompt(output_mode)
+        context = create_code_improvement_context(code_language, focus_area)
+        batches = [
+            [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=f"""{context}
+**분석된 요구사항 (JSON, 이 코드 부분과 관련된 항목만):**
+```json
+{json.dumps({"ui_requirements": unit_requirements}, ensure_ascii=False, indent=2)}
+```
+
+**현재 코드 ({code_language.upper()}) - 전체 파일 중 {unit.name} 부분:**
+```{code_language}
+{unit.text}
+```
+
+위 코드는 전체 파일의 일부입니다. 이 부분에 요구사항을 반영하고, 결과 코드에는 이 부분에 해당하는 코드만 작성해주세요.
+다른 부분에 정의된 클래스, 함수, 스타일은 그대로 있다고 가정하세요.
+""")
+            ]
+            for unit, unit_requirements in jobs
+        ]
+        
+        schema = INTEGRATED_CODE_PATCH_SCHEMA if output_mode == "patch" else INTEGRATED_CODE_IMPROVEMENT_SCHEMA
+        results = [None] * len(jobs)
+        board = st.container()
+        
+        async def run_units():
+            structured_llm = llm.bind(response_format=JSON_RESPONSE_FORMAT)
+            config = {"max_concurrency": CODE_UNIT_MAX_CONCURRENCY}
+            async for index, response in structured_llm.abatch_as_completed(batches, config=config, return_exceptions=True):
+                results[index] = response
+                with board:
+                    status = "❌ 실패" if isinstance(response, Exception) else "✅ 완료"
+                    st.caption(f"{status}: {jobs[index][0].name} ({sum(result is not None for result in results)}/{len(jobs)})")
+        
+        asyncio.run(run_units())
+        record_prompt_usage("code_improvement", [response for response in results if not isinstance(response, Exception)])
+        
+        # 단위 순서대로 결과를 모아 원래 위치에 끼워 넣음 (실패한 단위는 원본 유지)
+        replacements, changes, unit_results = {}, [], []
+        schema_errors, patch_failures, unit_errors, raw_parts = [], [], [], []
+        for (unit, _), response in zip(jobs, results):
+            if isinstance(response, Exception):
+                unit_errors.append(f"{unit.name}: {response}")
+                continue
+            raw_parts.append(f"// {unit.name}\n{response.content}")
+            data, errors = validate_structured_response(
+                llm, extract_json_object(response.content, expected_keys=schema["required"]), schema, "code_improvement"
+            )
+            schema_errors.extend(f"{unit.name} › {error}" for error in errors)
+            if not data:
+                unit_errors.append(f"{unit.name}: 응답에서 결과를 찾지 못했습니다")
+                continue
+            
+            failures = apply_patch_result(data, unit.text) if output_mode == "patch" else []
+            patch_failures.extend((len(changes) + number, reason) for number, reason in failures)
+            if isinstance(data.get("improved_code"), str) and data["improved_code"].strip():
+                replacements[unit] = data["improved_code"]
+            changes.extend(data.get("applied_changes") or [])
+            unit_results.append(data)
+        
+        merged = merge_improvement_results(unit_results, changes, replace_units(current_code, replacements))
+        return {"success": True, "data": merged, "raw": "\n\n".join(raw_parts), "schema_errors": schema_errors,
+                "patch_failures": patch_failures, "unit_errors": unit_errors}
+            
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def improve_code_by_requirement_groups(llm, requirements, current_code, code_language, focus_area):
+    """category와 관련 코드 영역(technical_detail 등에 언급된 식별자)이 같은 요구사항끼리 묶어 그룹별로 동시에 개선
+
+    각 그룹은 관련 코드 부분만 받아 편집(search/replace)으로 답하고, 모든 편집은 원본 코드 기준으로 위치를 찾아
+    그룹 순서대로 한 번에 병합한다. 다른 편집과 겹치는 편집은 적용하지 않고 충돌로 표시한다.
+    전체 소요 시간은 요구사항 수의 합이 아니라 가장 오래 걸리는 그룹에 가까워진다.
+    """
+    try:
+        ui_requirements = requirements.get("ui_requirements") or [] if isinstance(requirements, dict) else []
+        units = split_code_units(current_code, code_language, CODE_UNIT_TOKENS)
+        groups = group_requirements(units, ui_requirements)
+        if len(groups) < 2:
+            return improve_code_with_requirements(llm, requirements, current_code, code_language, focus_area, "patch")
+        
+        st.caption(f"🧩 요구사항 {len(ui_requirements)}개를 {len(groups)}개 그룹으로 나누어 동시에 적용합니다 "
+                   f"(최대 {CODE_GROUP_MAX_CONCURRENCY}개 동시 요청)")
+        
+        def group_code(unit_indices):
+            # 관련 단위를 찾지 못하면 전체 코드를 보낸다
+            if not unit_indices:
+                return f"**현재 코드 ({code_language.upper()}):**\n```{code_language}\n{current_code}\n```"
+            return "\n\n".join(
+                f"**현재 코드 ({code_language.upper()}) - 전체 파일 중 {units[index].name} 부분:**\n"
+                f"```{code_language}\n{units[index].text}\n```"
+                for index in unit_indices
+            )
+        
+        system_prompt = create_code_improvement_prompt("patch")
+        context = create_code_improvement_context(code_language, focus_area)
+        batches = [
+            [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=f"""{context}
+**분석된 요구사항 (JSON, 이 그룹에 해당하는 항목만):**
+```json
+{json.dumps({"ui_requirements": [ui_requirements[number] for number in numbers]}, ensure_ascii=False, indent=2)}
+```
+
+{group_code(unit_indices)}
+
+위 코드는 전체 파일의 일부일 수 있습니다. 이 요구사항들만 반영하고, search에는 위에 보이는 코드만 사용해주세요.
+다른 요구사항은 별도로 처리되므로 관련 없는 부분은 수정하지 마세요.
+""")
+            ]
+            for numbers, unit_indices in groups
+        ]
+        
+        def group_name(index):
+            categories = dict.fromkeys(str(ui_requirements[number].get("category", "")) for number in groups[index][0])
+            return f"그룹 {index + 1} ({', '.join(categories)} · 요구사항 {len(groups[index][0])}개)"
+        
+        results = [None] * len(groups)
+        board = st.container()
+        
+        async def run_groups():
+            structured_llm = llm.bind(response_format=JSON_RESPONSE_FORMAT)
+            config = {"max_concurrency": CODE_GROUP_MAX_CONCURRENCY}
+            async for index, response in structured_llm.abatch_as_completed(batches, config=config, return_exceptions=True):
+                results[index] = response
+                with board:
+                    status = "❌ 실패" if isinstance(response, Exception) else "✅ 완료"
+                    st.caption(f"{status}: {group_name(index)} ({sum(result is not None for result in results)}/{len(groups)})")
+        
+        asyncio.run(run_groups())
+        record_prompt_usage("code_improvement", [response for response in results if not isinstance(response, Exception)])
+        
+        # 완료 순서와 관계없이 그룹 순서대로 편집을 모아 원본 기준으로 병합 (같은 입력이면 항상 같은 결과)
+        edits, changes, group_results = [], [], []
+        schema_errors, unit_errors, raw_parts = [], [], []
+        for index, ((_, unit_indices), response) in enumerate(zip(groups, results)):
+            name = group_name(index)
+            if isinstance(response, Exception):
+                unit_errors.append(f"{name}: {response}")
+                continue
+            raw_parts.append(f"// {name}\n{response.content}")
+            data, errors = validate_structured_response(
+                llm, extract_json_object(response.content, expected_keys=INTEGRATED_CODE_PATCH_SCHEMA["required"]),
+                INTEGRATED_CODE_PATCH_SCHEMA, "code_improvement"
+            )
+            schema_errors.extend(f"{name} › {error}" for error in errors)
+            if not data:
+                unit_errors.append(f"{name}: 응답에서 결과를 찾지 못했습니다")
+                continue
+            
+            within = [(units[unit].start, units[unit].end) for unit in unit_indices]
+            for change in data.get("applied_changes") or []:
+                change.setdefault("code_section", change.get("replace", ""))
+                edits.append((change, within))
+                changes.append(change)
+            group_results.append(data)
+        
+        improved_code, patch_failures, merge_conflicts = merge_edit_hunks(current_code, edits)
+        merged = merge_improvement_results(group_results, changes, improved_code)
+        return {"success": True, "data": merged, "raw": "\n\n".join(raw_parts), "schema_errors": schema_errors,
+                "patch_failures": patch_failures, "merge_conflicts": merge_conflicts, "unit_errors": unit_errors}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def merge_improvement_results(parts, changes, improved_code):
+    """나누어 받은 개선 결과들의 technical_improvements/summary를 하나의 결과로 합침"""
+    technical, improvements, benefits = [], [], []
+    for data in parts:
+        technical.extend(item for item in data.get("technical_improvements") or [] if item not in technical)
+        summary = data.get("summary") if isinstance(data.get("summary"), dict) else {}
+        improvements.extend(item for item in summary.get("main_improvements") or [] if item not in improvements)
+        if summary.get("expected_benefits"):
+            benefits.append(summary["expected_benefits"])
+    return {
+        "applied_changes": changes,
+        "improved_code": improved_code,
+        "technical_improvements": technical,
+        "summary": {
+            "total_changes": len(changes),
+            "main_improvements": improvements,
+            "expected_benefits": " ".join(benefits),
+        },
+    }
+
+def render_requirement_item(req):
+    """UI 요구사항 한 항목 표시 (스트리밍 중 점진 표시와 최종 결과 표시에서 공용)"""
+    priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+    priority = req.get('priority', 'medium')
+    
+    with st.expander(f"{priority_emoji.get(priority, '⚪')} {req.get('category', 'UI')} - {req.get('current_issue', 'Issue')[:50]}..."):
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.write(f"**카테고리:** {req.get('category', 'N/A')}")
+            st.write(f"**우선순위:** {req.get('priority', 'N/A')}")
+            st.write(f"**현재 문제:** {req.get('current_issue', 'N/A')}")
+        with col_b:
+            st.write(f"**개선 요청:** {req.get('improvement_request', 'N/A')}")
+            st.write(f"**구현 방향:** {req.get('technical_detail', 'N/A')}")
+            if req.get('user_impact'):
+                st.write(f"**사용자 영향:** {req['user_impact']}")
+
+def render_feedback_item(number, feedback):
+    """사용자 피드백 한 항목 표시"""
+    with st.container():
+        st.write(f"**피드백 {number}:**")
+        st.info(feedback.get('feedback', 'N/A'))
+        col_c, col_d = st.columns(2)
+        with col_c:
+            st.write(f"**불편사항:** {feedback.get('pain_point', 'N/A')}")
+        with col_d:
+            st.write(f"**제안 해결책:** {feedback.get('suggested_solution', 'N/A')}")
+        st.divider()
+
+def render_applied_change(number, change, code_language):
+    """적용된 코드 개선사항 한 항목 표시"""
+    with st.expander(f"개선사항 {number}: {change.get('requirement', 'Improvement')[:60]}..."):
+        st.write(f"**요구사항:** {change.get('requirement', 'N/A')}")
+        st.write(f"**변경내용:** {change.get('change_description', 'N/A')}")
+        
+        if change.get('before_after'):
+            st.write(f"**변경 전후:** {change['before_after']}")
+        
+        # 패치 모드는 적용 전까지 code_section 대신 replace만 있음
+        code_section = change.get('code_section') or change.get('replace')
+        if code_section:
+            st.write("**핵심 변경 코드:**")
+            st.code(code_section, language=code_language)
+
 def display_requirements_analysis(result):
     """요구사항 분석 결과 표시"""
     if result["data"]:
         data = result["data"]
+        render_schema_errors(result.get("schema_errors"))
         
         # 요약 정보
         st.subheader("📊 분석 요약")
@@ -234,36 +530,15 @@ def display_requirements_analysis(result):
         if "ui_requirements" in data and data["ui_requirements"]:
             st.subheader("🎯 UI/UX 개선 요구사항")
             
-            for i, req in enumerate(data["ui_requirements"]):
-                priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-                priority = req.get('priority', 'medium')
-                
-                with st.expander(f"{priority_emoji.get(priority, '⚪')} {req.get('category', 'UI')} - {req.get('current_issue', 'Issue')[:50]}..."):
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        st.write(f"**카테고리:** {req.get('category', 'N/A')}")
-                        st.write(f"**우선순위:** {req.get('priority', 'N/A')}")
-                        st.write(f"**현재 문제:** {req.get('current_issue', 'N/A')}")
-                    with col_b:
-                        st.write(f"**개선 요청:** {req.get('improvement_request', 'N/A')}")
-                        st.write(f"**구현 방향:** {req.get('technical_detail', 'N/A')}")
-                        if req.get('user_impact'):
-                            st.write(f"**사용자 영향:** {req['user_impact']}")
+            for req in data["ui_requirements"]:
+                render_requirement_item(req)
         
         # 사용자 피드백
         if "user_feedback" in data and data["user_feedback"]:
             st.subheader("👥 사용자 피드백")
             
             for i, feedback in enumerate(data["user_feedback"]):
-                with st.container():
-                    st.write(f"**피드백 {i+1}:**")
-                    st.info(feedback.get('feedback', 'N/A'))
-                    col_c, col_d = st.columns(2)
-                    with col_c:
-                        st.write(f"**불편사항:** {feedback.get('pain_point', 'N/A')}")
-                    with col_d:
-                        st.write(f"**제안 해결책:** {feedback.get('suggested_solution', 'N/A')}")
-                    st.divider()
+                render_feedback_item(i + 1, feedback)
     
     else:
         st.subheader("📝 분석 결과")
@@ -273,6 +548,11 @@ def display_code_improvement_results(result, code_language):
     """코드 개선 결과 표시"""
     if result["data"]:
         data = result["data"]
+        render_schema_errors(result.get("schema_errors"))
+        render_patch_failures(result.get("patch_failures"))
+        render_merge_conflicts(result.get("merge_conflicts"))
+        for error in result.get("unit_errors") or []:
+            st.warning(f"⚠️ 코드 일부를 개선하지 못해 해당 부분은 원본을 유지했습니다 - {error}")
         
         # 개선 요약
         if "summary" in data:
@@ -296,16 +576,7 @@ def display_code_improvement_results(result, code_language):
             st.subheader("✅ 적용된 개선사항")
             
             for i, change in enumerate(data["applied_changes"]):
-                with st.expander(f"개선사항 {i+1}: {change.get('requirement', 'Improvement')[:60]}..."):
-                    st.write(f"**요구사항:** {change.get('requirement', 'N/A')}")
-                    st.write(f"**변경내용:** {change.get('change_description', 'N/A')}")
-                    
-                    if change.get('before_after'):
-                        st.write(f"**변경 전후:** {change['before_after']}")
-                    
-                    if change.get('code_section'):
-                        st.write("**핵심 변경 코드:**")
-                        st.code(change['code_section'], language=code_language)
+                render_applied_change(i + 1, change, code_language)
         
         # 기술적 개선사항
         if "technical_improvements" in data:
@@ -423,6 +694,22 @@ def main():
             ["전체 개선", "사용자 경험", "접근성", "반응형 디자인", "성능 최적화", "시각적 디자인"]
         )
         
+        # 코드 개선 응답 형식 (패치는 변경된 부분만 받아 적용하므로 큰 파일에서 빠름)
+        output_mode = st.radio(
+            "코드 개선 출력 방식:",
+            list(OUTPUT_MODES),
+            format_func=OUTPUT_MODES.get,
+            help="'변경 부분만'은 수정할 코드 조각만 받아 현재 코드에 적용합니다. 적용에 실패하면 '전체 코드'로 다시 실행해주세요."
+        )
+        
+        # 요구사항이 많으면 관련 코드 영역별 그룹으로 나누어 동시에 적용 (항상 패치 방식)
+        group_mode = st.checkbox(
+            "요구사항 그룹별 동시 적용",
+            value=True,
+            help=f"요구사항이 {CODE_GROUP_MIN_REQUIREMENTS}개 이상이면 category와 관련 코드 영역이 같은 요구사항끼리 묶어 "
+                 "그룹별로 동시에 적용합니다. 변경 부분만(패치) 방식으로 받으며, 서로 겹치는 변경은 적용하지 않고 표시합니다."
+        )
+        
         st.divider()
         
         # 프로세스 가이드
@@ -497,18 +784,15 @@ def main():
                     st.success(f"✅ WAV 음성 파일이 업로드되었습니다: {uploaded_audio_file.name}")
                     
                     # 파일 정보 표시
-                    file_size = len(uploaded_audio_file.getvalue()) / (1024 * 1024)  # MB
+                    file_size = uploaded_audio_file.size / (1024 * 1024)  # MB
                     st.info(f"📁 파일 크기: {file_size:.2f} MB")
                     
-                    # 파일 크기 제한 확인
-                    if file_size > 100:
-                        st.error("❌ 파일이 100MB를 초과합니다. 더 작은 파일로 나누어 업로드해주세요.")
-                        st.stop()
-                    elif file_size > 50:
-                        st.warning("⚠️ 파일이 50MB를 초과합니다. 처리 시간이 오래 걸릴 수 있습니다.")
+                    # 긴 녹음은 구간 단위로 나누어 처리 (업로드 크기 상한은 .streamlit/config.toml)
+                    if file_size > 50:
+                        st.warning("⚠️ 파일이 50MB를 초과합니다. 긴 녹음은 구간 단위로 나누어 처리되며 시간이 오래 걸릴 수 있습니다.")
                     
                     # 오디오 플레이어
-                    st.audio(uploaded_audio_file.getvalue())
+                    st.audio(uploaded_audio_file)
                     
                     # 음성을 텍스트로 변환
                     if st.button("🎯 WAV 음성을 텍스트로 변환", type="secondary", use_container_width=True, key="wav_audio_convert_btn"):
@@ -517,48 +801,40 @@ def main():
                         
                         if speech_config:
                             with st.spinner("🎯 WAV 음성을 텍스트로 변환 중입니다... (WAV 파일 처리 중)"):
-                                # WAV 파일 검증 및 준비
-                                tmp_file_path, is_valid = validate_wav_file_only(
-                                    uploaded_audio_file.getvalue(), 
-                                    uploaded_audio_file.name
-                                )
+                                # WAV 파일 검증 및 준비 (업로드 버퍼를 복사하지 않고 사용)
+                                with open_uploaded_wav(uploaded_audio_file) as wav_buffer:
+                                    wav_audio, is_valid = validate_wav_file_only(
+                                        wav_buffer, 
+                                        uploaded_audio_file.name
+                                    )
                                 
-                                if not is_valid or not tmp_file_path:
-                                    st.error("❌ WAV 파일 준비에 실패했습니다.")
-                                    return
+                                    if not is_valid or not wav_audio:
+                                        st.error("❌ WAV 파일 준비에 실패했습니다.")
+                                        return
                                 
-                                try:
                                     # speech_utils의 함수 사용
-                                    transcript = speech_to_text_safe(tmp_file_path, speech_config)
-                                    
-                                    if transcript and transcript.strip():
-                                        meeting_content = transcript
-                                        st.success("✅ WAV 음성 인식이 완료되었습니다!")
-                                        
-                                        # 변환된 텍스트 표시
-                                        with st.expander("📄 변환된 텍스트 보기", expanded=True):
-                                            st.text_area("변환된 회의록", meeting_content, height=200, disabled=True, key="wav_audio_transcript_preview")
-                                        
-                                        # 세션에 저장
-                                        st.session_state["converted_meeting_content"] = meeting_content
-                                    else:
-                                        st.error("""
-                                        ❌ WAV 음성 인식에 실패했습니다.
-                                        
-                                        **해결 방법:**
-                                        1. WAV 파일이 손상되지 않았는지 확인
-                                        2. 권장 설정(16-bit PCM, 16kHz)으로 변환
-                                        3. 배경 소음이 적은 깨끗한 녹음 사용
-                                        4. 파일 크기가 너무 크지 않은지 확인
-                                        """)
+                                    transcript = speech_to_text_safe(wav_audio, speech_config, parallel=True)
                                 
-                                finally:
-                                    # 임시 파일 정리
-                                    try:
-                                        if tmp_file_path and os.path.exists(tmp_file_path):
-                                            os.unlink(tmp_file_path)
-                                    except:
-                                        pass
+                                if transcript and transcript.strip():
+                                    meeting_content = transcript
+                                    st.success("✅ WAV 음성 인식이 완료되었습니다!")
+                                    
+                                    # 변환된 텍스트 표시
+                                    with st.expander("📄 변환된 텍스트 보기", expanded=True):
+                                        st.text_area("변환된 회의록", meeting_content, height=200, disabled=True, key="wav_audio_transcript_preview")
+                                    
+                                    # 세션에 저장
+                                    st.session_state["converted_meeting_content"] = meeting_content
+                                else:
+                                    st.error("""
+                                    ❌ WAV 음성 인식에 실패했습니다.
+                                    
+                                    **해결 방법:**
+                                    1. WAV 파일이 손상되지 않았는지 확인
+                                    2. 권장 설정(16-bit PCM, 16kHz)으로 변환
+                                    3. 배경 소음이 적은 깨끗한 녹음 사용
+                                    4. 파일 크기가 너무 크지 않은지 확인
+                                    """)
                         else:
                             st.error("❌ Azure Speech 서비스 설정이 올바르지 않습니다.")
                             st.warning("""
@@ -639,10 +915,18 @@ def main():
                 (input_method == "📝 직접 입력" and st.session_state.get("direct_meeting_input_ready", False))
             )
             
+            # 호출 전 토큰 예상치 확인 (컨텍스트 창을 넘으면 실행하지 않음)
+            analysis_plan = None
+            if is_meeting_ready:
+                analysis_plan = plan_execution(
+                    llm_name, {"system": MEETING_ANALYSIS_PROMPT, "meeting": meeting_content}, ANALYSIS_OUTPUT_TOKENS
+                )
+                render_execution_plan(analysis_plan, {"system": "시스템 프롬프트", "meeting": "회의록"})
+            
             if st.button("🔍 2단계: 요구사항 분석 실행", 
                         type="primary", 
                         use_container_width=True,
-                        disabled=not is_meeting_ready,
+                        disabled=analysis_plan is None or analysis_plan.mode == "too_large",
                         key="requirements_analysis_btn"):
                 
                 with st.spinner("🤖 회의록을 분석하여 요구사항을 도출하는 중..."):
@@ -682,7 +966,7 @@ def main():
                     **🎤 WAV 음성 파일 업로드:**
                     - Azure Speech Service 최적화
                     - 16-bit PCM, 16kHz, 모노 채널 권장
-                    - 100MB 이하 제한
+                    - 최대 200MB (16kHz 모노 기준 약 1시간 50분, 긴 녹음은 구간 단위로 처리)
                     
                     **📝 직접 입력:**
                     - 회의 내용을 자세히 입력
@@ -789,17 +1073,51 @@ def main():
                 (code_input_method == "📝 직접 입력" and st.session_state.get("direct_code_input_ready", False))
             )
             
+            # 호출 전 토큰 예상치 확인 (전체 코드 모드는 개선된 코드가 응답에 담기므로 출력 한도도 함께 확인)
+            improvement_plan = None
+            requirements = st.session_state["structured_requirements"]
+            requirement_count = len(requirements.get("ui_requirements") or []) if isinstance(requirements, dict) else 0
+            use_groups = group_mode and requirement_count >= CODE_GROUP_MIN_REQUIREMENTS
+            improvement_mode = "patch" if use_groups else output_mode
+            if is_code_ready:
+                improvement_plan = plan_execution(
+                    llm_name,
+                    {
+                        "system": create_code_improvement_prompt(improvement_mode),
+                        "requirements": json.dumps(requirements, ensure_ascii=False, indent=2),
+                        "code": current_code,
+                    },
+                    CODE_PATCH_OUTPUT_TOKENS if improvement_mode == "patch" else CODE_CHANGES_OUTPUT_TOKENS,
+                    chunk_part="code",
+                    strategy="chunked",
+                    echo_part=None if improvement_mode == "patch" else "code",
+                    max_single_pass_tokens=CODE_SINGLE_PASS_TOKENS,
+                    max_chunk_tokens=CODE_UNIT_TOKENS,
+                )
+                render_execution_plan(improvement_plan, {"system": "시스템 프롬프트", "requirements": "요구사항 JSON", "code": "코드"})
+            
             if st.button("🚀 4단계: 코드 개선 실행", 
                         type="primary", 
                         use_container_width=True,
-                        disabled=not is_code_ready,
+                        disabled=improvement_plan is None or improvement_plan.mode == "too_large",
                         key="code_improvement_btn"):
                 
                 with st.spinner("🤖 요구사항을 바탕으로 코드를 개선하는 중..."):
-                    requirements = st.session_state["structured_requirements"]
-                    result = improve_code_with_requirements(
-                        llm, requirements, current_code, code_language, focus_area
-                    )
+                    if improvement_plan.mode == "chunked":
+                        # 큰 코드: 구조 단위별로 관련 요구사항만 배정하여 동시에 개선 후 재조립
+                        result = improve_code_in_units(
+                            llm, requirements, current_code, code_language, focus_area, output_mode,
+                            improvement_plan.chunk_tokens
+                        )
+                    elif use_groups:
+                        # 요구사항이 많음: 관련 코드 영역별 그룹을 동시에 적용하고 편집을 병합
+                        result = improve_code_by_requirement_groups(
+                            llm, requirements, current_code, code_language, focus_area
+                        )
+                    else:
+                        result = improve_code_with_requirements(
+                            llm, requirements, current_code, code_language, focus_area, output_mode
+                        )
                     st.session_state["improvement_result"] = result
                     st.session_state["current_code"] = current_code
                     st.session_state["final_code_language"] = code_language
@@ -3,10 +3,11 @@ import os
 import streamlit as st
 from langchain_openai import AzureChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
-import json
-import tempfile
-from utils.speech_utils import init_speech_config, speech_to_text_safe, validate_wav_file_only
-from utils.langchain_utils import init_langchain_client
+from utils.speech_utils import init_speech_config, speech_to_text_safe, validate_wav_file_only, open_uploaded_wav
+from utils.langchain_utils import init_langchain_client, stream_llm_response
+from utils.json_stream import extract_json_object
+from utils.structured_output import JSON_RESPONSE_FORMAT, REQUIREMENTS_ANALYSIS_SCHEMA, validate_structured_response, render_schema_errors
+from utils.token_budget import plan_execution, render_execution_plan
 from utils.langfuse_monitor import langfuse_monitor, log_user_action, log_generation
 
 
@@ -20,6 +21,7 @@ from utils.langfuse_monitor import langfuse_monitor, log_user_action, log_genera
 # 환경변수 로드
 load_dotenv()
 llm_name = os.getenv("AZURE_OPENAI_LLM_MINI")
+ANALYSIS_OUTPUT_TOKENS = 4000  # 요구사항 분석 JSON의 예상 최대 길이
 
 
 # 시스템 프롬프트 정의
@@ -69,18 +71,19 @@ def analyze_meeting_content(llm, system_prompt, content, focus_area):
         # LangChain 메시지 구성
         messages = [
             SystemMessage(content=system_prompt),
-            HumanMessage(content=f"다음 회의록을 분석해주세요:\n\n{content}\n\n분석 집중 영역: {focus_area}")
+            # 고정 지시문 > 집중 영역 > 회의록 순서 (바뀌는 내용일수록 뒤에 두어 프롬프트 캐시 prefix 유지)
+            HumanMessage(content=f"결과는 JSON 객체로만 작성해주세요.\n\n분석 집중 영역: {focus_area}\n\n다음 회의록을 분석해주세요:\n\n{content}")
         ]
         
-        # LLM 호출 - 입력/출력이 자동으로 Langfuse에 기록됨
-        response = llm.invoke(messages)
+        # LLM 호출 (JSON 모드, 응답을 받는 대로 화면에 표시) - 입력/출력이 자동으로 Langfuse에 기록됨
+        response = stream_llm_response(llm, messages, stage="meeting_analysis", response_format=JSON_RESPONSE_FORMAT)
         
-        # JSON 파싱 시도
-        try:
-            analysis_result = json.loads(response.content)
-            return {"success": True, "data": analysis_result, "raw": response.content}
-        except json.JSONDecodeError:
-            return {"success": True, "data": None, "raw": response.content}
+        # 스키마 검증 후 형식이 맞지 않는 필드만 부분 복구 (전체 재실행 없음)
+        data, schema_errors = validate_structured_response(
+            llm, extract_json_object(response.content, expected_keys=REQUIREMENTS_ANALYSIS_SCHEMA["required"]),
+            REQUIREMENTS_ANALYSIS_SCHEMA, "meeting_analysis"
+        )
+        return {"success": True, "data": data, "raw": response.content, "schema_errors": schema_errors}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -89,6 +92,7 @@ def display_analysis_results(result):
     """분석 결과 표시"""
     if result["data"]:  # JSON 파싱 성공
         data = result["data"]
+        render_schema_errors(result.get("schema_errors"))
         
         # 요약 정보
         st.subheader("📊 분석 요약")
@@ -251,18 +255,15 @@ def main():
                 st.success(f"✅ WAV 음성 파일이 업로드되었습니다: {uploaded_audio_file.name}")
                 
                 # 파일 정보 표시
-                file_size = len(uploaded_audio_file.getvalue()) / (1024 * 1024)  # MB
+                file_size = uploaded_audio_file.size / (1024 * 1024)  # MB
                 st.info(f"📁 파일 크기: {file_size:.2f} MB")
                 
-                # 파일 크기 제한 확인
-                if file_size > 100:
-                    st.error("❌ 파일이 100MB를 초과합니다. 더 작은 파일로 나누어 업로드해주세요.")
-                    st.stop()
-                elif file_size > 50:
-                    st.warning("⚠️ 파일이 50MB를 초과합니다. 처리 시간이 오래 걸릴 수 있습니다.")
+                # 긴 녹음은 구간 단위로 나누어 처리 (업로드 크기 상한은 .streamlit/config.toml)
+                if file_size > 50:
+                    st.warning("⚠️ 파일이 50MB를 초과합니다. 긴 녹음은 구간 단위로 나누어 처리되며 시간이 오래 걸릴 수 있습니다.")
                 
                 # 오디오 플레이어
-                st.audio(uploaded_audio_file.getvalue())
+                st.audio(uploaded_audio_file)
                 
                 # WAV 음성을 텍스트로 변환
                 if st.button("🎯 음성을 텍스트로 변환", type="secondary", use_container_width=True):
@@ -271,49 +272,41 @@ def main():
                     
                     if speech_config:
                         with st.spinner("🎯 음성을 텍스트로 변환 중입니다..."):
-                            # WAV 파일 검증 및 준비
-                            tmp_file_path, is_valid = validate_wav_file_only(
-                                uploaded_audio_file.getvalue(), 
-                                uploaded_audio_file.name
-                            )
+                            # WAV 파일 검증 및 준비 (업로드 버퍼를 복사하지 않고 사용)
+                            with open_uploaded_wav(uploaded_audio_file) as wav_buffer:
+                                wav_audio, is_valid = validate_wav_file_only(
+                                    wav_buffer, 
+                                    uploaded_audio_file.name
+                                )
                             
-                            if not is_valid or not tmp_file_path:
-                                st.error("❌ WAV 파일 준비에 실패했습니다.")
-                                return
+                                if not is_valid or not wav_audio:
+                                    st.error("❌ WAV 파일 준비에 실패했습니다.")
+                                    return
                             
-                            try:
                                 # speech_utils의 WAV 전용 함수 사용
-                                transcript = speech_to_text_safe(tmp_file_path, speech_config)
-                                
-                                if transcript and transcript.strip():
-                                    content = transcript
-                                    st.success("✅ WAV 음성 인식이 완료되었습니다!")
-                                    
-                                    # 변환된 텍스트 표시
-                                    with st.expander("📄 변환된 텍스트 보기", expanded=True):
-                                        st.text_area("변환된 회의록", content, height=200, disabled=True)
-                                    
-                                    # 세션에 저장
-                                    st.session_state["converted_audio_content"] = content
-                                    st.session_state["audio_input_ready"] = True
-                                else:
-                                    st.error("""
-                                    ❌ WAV 음성 인식에 실패했습니다.
-                                    
-                                    **해결 방법:**
-                                    1. WAV 파일이 손상되지 않았는지 확인
-                                    2. 권장 설정(16-bit PCM, 16kHz)으로 변환
-                                    3. 배경 소음이 적은 깨끗한 녹음 사용
-                                    4. 파일 크기가 너무 크지 않은지 확인
-                                    """)
+                                transcript = speech_to_text_safe(wav_audio, speech_config, parallel=True)
                             
-                            finally:
-                                # 임시 파일 정리
-                                try:
-                                    if tmp_file_path and os.path.exists(tmp_file_path):
-                                        os.unlink(tmp_file_path)
-                                except:
-                                    pass
+                            if transcript and transcript.strip():
+                                content = transcript
+                                st.success("✅ WAV 음성 인식이 완료되었습니다!")
+                                
+                                # 변환된 텍스트 표시
+                                with st.expander("📄 변환된 텍스트 보기", expanded=True):
+                                    st.text_area("변환된 회의록", content, height=200, disabled=True)
+                                
+                                # 세션에 저장
+                                st.session_state["converted_audio_content"] = content
+                                st.session_state["audio_input_ready"] = True
+                            else:
+                                st.error("""
+                                ❌ WAV 음성 인식에 실패했습니다.
+                                
+                                **해결 방법:**
+                                1. WAV 파일이 손상되지 않았는지 확인
+                                2. 권장 설정(16-bit PCM, 16kHz)으로 변환
+                                3. 배경 소음이 적은 깨끗한 녹음 사용
+                                4. 파일 크기가 너무 크지 않은지 확인
+                                """)
                     else:
                         st.error("❌ Azure Speech 서비스 설정이 올바르지 않습니다.")
                         st.warning("""
@@ -398,10 +391,15 @@ def main():
         
         # 분석 실행
         if is_ready and content.strip():
-            if st.button("🚀 요구사항 분석 시작", type="primary", use_container_width=True):
+            # 사용자가 화면에서 시스템 프롬프트를 수정한 경우 반영한다.
+            system_prompt = custom_prompt if 'custom_prompt' in locals() else SYSTEM_PROMPT
+            
+            # 호출 전 토큰 예상치 확인 (컨텍스트 창을 넘으면 실행하지 않음)
+            plan = plan_execution(llm_name, {"system": system_prompt, "meeting": content}, ANALYSIS_OUTPUT_TOKENS)
+            render_execution_plan(plan, {"system": "시스템 프롬프트", "meeting": "회의록"})
+            
+            if st.button("🚀 요구사항 분석 시작", type="primary", use_container_width=True, disabled=plan.mode == "too_large"):
                 with st.spinner("🤖 AI가 회의록을 분석 중입니다..."):
-                    # 사용자가 화면에서 시스템 프롬프트를 수정한 경우 반영한다.
-                    system_prompt = custom_prompt if 'custom_prompt' in locals() else SYSTEM_PROMPT
                     result = analyze_meeting_content(llm, system_prompt, content, focus_area=analysis_focus)
                     st.session_state["analysis_result"] = result  # 세션 상태에 저장
         
@@ -450,7 +448,7 @@ def main():
                 **🎵 WAV 음성 파일 팁:**
                 - WAV 형식만 지원됩니다
                 - 배경 소음이 적은 깨끗한 녹음 사용
-                - 파일 크기는 100MB 이하로 제한
+                - 최대 200MB (16kHz 모노 기준 약 1시간 50분), 긴 녹음은 구간 단위로 나누어 처리
                 """)
             else:
                 st.markdown("""
@@ -1,10 +1,17 @@
 from dotenv import load_dotenv
-import os, json, re
+import os, json
 import streamlit as st
 from langchain_openai import AzureChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 from utils.langfuse_monitor import langfuse_monitor
-from utils.langchain_utils import init_langchain_client
+from utils.langchain_utils import init_langchain_client, stream_llm_response
+from utils.json_stream import extract_json_object
+from utils.structured_output import (
+    JSON_RESPONSE_FORMAT, CODE_IMPROVEMENT_SCHEMA, CODE_PATCH_SCHEMA, validate_structured_response, render_schema_errors
+)
+from utils.code_structure import detect_code_language
+from utils.code_patch import OUTPUT_MODES, PATCH_OUTPUT_FORMAT_RULES, apply_patch_result, render_patch_failures
+from utils.token_budget import plan_execution, render_execution_plan
 
 # 회의록에서 도출된 요구사항과 현재 코드를 입력받아 개선된 코드를 제공하는 페이지
 # JSON 형태의 요구사항과 HTML/React/JavaScript/JSP 코드를 분석하여 개선안 제시
@@ -13,6 +20,8 @@ from utils.langchain_utils import init_langchain_client
 load_dotenv()
 llm_name = os.getenv("AZURE_OPENAI_LLM_MINI")
 # llm_name = os.getenv("AZURE_OPENAI_LLM_GPT4")
+CODE_CHANGES_OUTPUT_TOKENS = 3000  # 개선된 전체 코드 외 applied_changes/summary의 예상 길이
+CODE_PATCH_OUTPUT_TOKENS = 6000    # 패치 모드에서 편집(search/replace) 전체의 예상 길이
 
 
 # 요구사항 파싱 함수
@@ -42,29 +51,48 @@ def format_requirements_for_ai(requirements, format_type):
         return f"**마크다운 형태 요구사항:**\n{requirements}"
     else:
         return f"**텍스트 요구사항:**\n{requirements}"
-def detect_code_language(code):
-    """코드 내용을 분석하여 언어를 자동 감지"""
-    code_lower = code.lower()
-    
-    if 'import react' in code_lower or 'from react' in code_lower or 'jsx' in code_lower:
-        return 'react'
-    elif '<%' in code and '%>' in code:
-        return 'jsp'
-    elif '<html' in code_lower or '<!doctype html' in code_lower:
-        return 'html'
-    elif 'function' in code_lower and ('document.' in code_lower or 'window.' in code_lower):
-        return 'javascript'
-    elif '<template>' in code_lower and '<script>' in code_lower:
-        return 'vue'
-    elif 'component' in code_lower and '@' in code:
-        return 'angular'
+
+# 시스템 프롬프트 생성 함수 (출력 방식별로 항상 같은 문자열)
+# 대상 언어/집중 영역은 사용자 메시지 앞부분에 두어, 시스템 프롬프트가 provider 프롬프트 캐시의 공통 prefix가 되도록 한다.
+def create_system_prompt(output_mode="full"):
+    if output_mode == "patch":
+        # 변경 부분만 search/replace 편집으로 받아 로컬에서 적용 (출력 길이가 변경량에 비례)
+        final_step = "3. 변경이 필요한 부분만 편집(search/replace)으로 작성"
+        output_format = """```json
+{
+  "applied_changes": [
+    {
+      "requirement": "적용된 요구사항",
+      "change_description": "구체적인 변경 내용",
+      "search": "현재 코드에서 바꿀 부분 (원문 그대로)",
+      "replace": "search를 대체할 새 코드"
+    }
+  ],
+  "summary": "주요 개선사항 요약"
+}
+```
+""" + PATCH_OUTPUT_FORMAT_RULES
+        last_rule = "- 모든 편집을 적용한 결과가 실행 가능한 완전한 코드가 되도록 작성"
     else:
-        return 'html'  # 기본값
+        final_step = "3. 개선된 완전한 코드 작성"
+        output_format = """```json
+{
+  "applied_changes": [
+    {
+      "requirement": "적용된 요구사항",
+      "change_description": "구체적인 변경 내용",
+      "code_section": "수정된 코드 부분"
+    }
+  ],
+  "improved_code": "개선된 완전한 코드",
+  "summary": "주요 개선사항 요약"
+}
+```
+"""
+        last_rule = "- 실행 가능한 완전한 코드 제공"
 
-# 시스템 프롬프트 생성 함수
-def create_system_prompt(code_language, focus_area):
-    base_prompt = f"""
-당신은 {code_language.upper()} 코드 개선 전문가입니다.
+    return f"""
+당신은 웹 프론트엔드(HTML, React, Vue, Angular, JSP, JavaScript) 코드 개선 전문가입니다.
 
 **역할:**
 이미 분석된 UI/UX 요구사항을 바탕으로 기존 코드를 직접 개선합니다.
@@ -72,46 +100,36 @@ def create_system_prompt(code_language, focus_area):
 **개선 절차:**
 1. 제공된 요구사항을 현재 코드에 직접 반영
 2. 요구사항별로 구체적인 코드 수정 적용
-3. 개선된 완전한 코드 작성
+{final_step}
 
 **출력 형식:**
-```json
-{{
-  "applied_changes": [
-    {{
-      "requirement": "적용된 요구사항",
-      "change_description": "구체적인 변경 내용",
-      "code_section": "수정된 코드 부분"
-    }}
-  ],
-  "improved_code": "개선된 완전한 코드",
-  "summary": "주요 개선사항 요약"
-}}
-```
-
+{output_format}
 **개선 시 고려사항:**
-- {code_language.upper()}의 모범 사례 적용
+- 대상 언어의 모범 사례 적용
 - 요구사항을 정확히 코드에 반영
 - 기존 기능은 유지하면서 개선
-- 실행 가능한 완전한 코드 제공
+{last_rule}
+- 사용자 메시지에 특별 집중 영역이 있으면 그 영역에 특히 집중하여 개선
 """
-    
+
+def create_request_context(code_language, focus_area):
+    """요청마다 달라지는 코드 개선 조건 (사용자 메시지 맨 앞에 둠)"""
+    context = f"**대상 언어:** {code_language.upper()}\n"
     if focus_area != "전체 개선":
-        base_prompt += f"\n**특별 집중 영역:** {focus_area}에 특히 집중하여 개선하세요."
-    
-    return base_prompt
+        context += f"**특별 집중 영역:** {focus_area}에 특히 집중하여 개선하세요.\n"
+    return context
 
 @langfuse_monitor(name="개선된 코드 제공")  
-def analyze_and_improve_code(llm, requirements, current_code, code_language, focus_area):
-    """요구사항과 현재 코드를 분석하여 개선된 코드 제공"""
+def analyze_and_improve_code(llm, requirements, current_code, code_language, focus_area, output_mode="full"):
+    """요구사항과 현재 코드를 분석하여 개선된 코드 제공 (patch 모드는 편집만 받아 로컬에서 적용)"""
     try:
         # 요구사항 파싱
         parsed_requirements, req_format = parse_requirements(requirements)
         formatted_requirements = format_requirements_for_ai(parsed_requirements, req_format)
         
-        system_prompt = create_system_prompt(code_language, focus_area)
+        system_prompt = create_system_prompt(output_mode)
         
-        user_message = f"""
+        user_message = f"""{create_request_context(code_language, focus_area)}
 {formatted_requirements}
 
 **현재 코드 ({code_language.upper()}):**
@@ -128,22 +146,18 @@ def analyze_and_improve_code(llm, requirements, current_code, code_language, foc
             HumanMessage(content=user_message)
         ]
         
-        response = llm.invoke(messages)
+        response = stream_llm_response(llm, messages, stage="code_improvement", response_format=JSON_RESPONSE_FORMAT)
         
-        # JSON 파싱 시도
-        try:
-            # JSON 블록 추출
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', response.content, re.DOTALL)
-            if json_match:
-                json_content = json_match.group(1)
-                improvement_result = json.loads(json_content)
-                return {"success": True, "data": improvement_result, "raw": response.content}
-            else:
-                # JSON 블록이 없으면 전체 응답에서 JSON 찾기
-                improvement_result = json.loads(response.content)
-                return {"success": True, "data": improvement_result, "raw": response.content}
-        except json.JSONDecodeError:
-            return {"success": True, "data": None, "raw": response.content}
+        # 스키마 검증 후 형식이 맞지 않는 필드만 부분 복구 (전체 재실행 없음)
+        schema = CODE_PATCH_SCHEMA if output_mode == "patch" else CODE_IMPROVEMENT_SCHEMA
+        data, schema_errors = validate_structured_response(
+            llm, extract_json_object(response.content, expected_keys=schema["required"]), schema, "code_improvement"
+        )
+        
+        # 패치 모드: 편집을 현재 코드에 적용하여 improved_code 생성 (적용되지 않은 편집은 따로 안내)
+        patch_failures = apply_patch_result(data, current_code) if output_mode == "patch" and data else []
+        return {"success": True, "data": data, "raw": response.content, "schema_errors": schema_errors,
+                "patch_failures": patch_failures}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -152,6 +166,8 @@ def display_improvement_results(result, code_language):
     """코드 개선 결과 표시"""
     if result["data"]:
         data = result["data"]
+        render_schema_errors(result.get("schema_errors"))
+        render_patch_failures(result.get("patch_failures"))
         
         # 적용된 변경사항
         if "applied_changes" in data:
@@ -254,6 +270,14 @@ def main():
             ["전체 개선", "UI 디자인", "사용자 경험", "성능 최적화", "접근성", "반응형 디자인"]
         )
         
+        # 응답 형식 (패치는 변경된 부분만 받아 적용하므로 큰 파일에서 빠름)
+        output_mode = st.radio(
+            "출력 방식:",
+            list(OUTPUT_MODES),
+            format_func=OUTPUT_MODES.get,
+            help="'변경 부분만'은 수정할 코드 조각만 받아 현재 코드에 적용합니다. 적용에 실패하면 '전체 코드'로 다시 실행해주세요."
+        )
+        
         st.divider()
         
         # 지원하는 요구사항 형태 안내
@@ -459,18 +483,34 @@ JSON 형태:
                 st.info("⚠️ 화면 미리보기는 HTML 코드에만 지원됩니다.")
             st.divider()
 
+        # 호출 전 토큰 예상치 확인 (전체 코드 모드는 개선된 코드가 응답에 담기므로 출력 한도도 함께 확인)
+        plan = None
+        if requirements_ready and code_ready and has_requirements and has_code:
+            parsed_requirements, req_format = parse_requirements(requirements)
+            plan = plan_execution(
+                llm_name,
+                {
+                    "system": create_system_prompt(output_mode),
+                    "requirements": format_requirements_for_ai(parsed_requirements, req_format),
+                    "code": current_code,
+                },
+                CODE_PATCH_OUTPUT_TOKENS if output_mode == "patch" else CODE_CHANGES_OUTPUT_TOKENS,
+                echo_part=None if output_mode == "patch" else "code",
+            )
+            render_execution_plan(plan, {"system": "시스템 프롬프트", "requirements": "요구사항", "code": "코드"})
+
         # 개선 실행 버튼
         if st.button("🚀 코드 개선 시작", 
                     type="primary", 
                     use_container_width=True,
-                    disabled=not (requirements_ready and code_ready and has_requirements and has_code),
+                    disabled=plan is None or plan.mode == "too_large",
                     key="improvement_start_btn"):
             
             with st.spinner("🤖 AI가 코드를 개선하는 중입니다..."):
                 import datetime
                 st.session_state["analysis_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 result = analyze_and_improve_code(
-                    llm, requirements, current_code, code_language, focus_area
+                    llm, requirements, current_code, code_language, focus_area, output_mode
                 )
                 st.session_state["improvement_result"] = result
 
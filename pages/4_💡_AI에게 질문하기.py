@@ -1,15 +1,18 @@
 import os
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import tool
 from langchain_core.callbacks import BaseCallbackHandler
-from langchain_community.retrievers import AzureAISearchRetriever
 from langchain_community.tools import TavilySearchResults
 from langchain.agents import AgentExecutor, create_tool_calling_agent
+from utils.token_budget import plan_execution, render_execution_plan
+from utils.client_pool import get_chat_client, get_search_retriever, render_pool_stats
+from utils.rag_index import get_local_retriever
+from utils.vector_store import get_vector_retriever
+from utils.query_cache import uiux_query_cache, web_query_cache
 
 # 환경변수 로드
 load_dotenv()
@@ -28,6 +31,10 @@ col1, col2 = st.columns([1, 1])
 llm_gpt4 = os.getenv("AZURE_OPENAI_LLM_GPT4")   # Agent를 위한 gpt-4 모델 사용
 llm_mini = os.getenv("AZURE_OPENAI_LLM_MINI")
 search_index_name = os.getenv("AZURE_AI_SEARCH_INDEX_NAME") # rag-uiux
+# UI/UX 가이드라인 검색 방식: local(rag-docs 로컬 BM25 색인, 네트워크 호출 없음) / azure(Azure AI Search, 실패 시 local)
+# / vector(rag-docs 로컬 벡터 저장소, 임베더는 RAG_EMBEDDER 설정, 실패 시 local)
+UIUX_RETRIEVER = os.getenv("UIUX_RETRIEVER", "local")
+AGENT_OUTPUT_TOKENS = 2000   # 에이전트 답변의 예상 최대 길이 (도구 결과는 호출 후에 더해짐)
 
 # Tool 사용을 추적하는 콜백 클래스 (agent가 어떤 tool을 사용했는지 확인)
 class ToolTracker(BaseCallbackHandler):
@@ -49,29 +56,42 @@ if 'tool_tracker' not in st.session_state:
 def format_docs(docs):
     return "\n\n".join([doc.page_content for doc in docs])
 
+def get_uiux_retriever():
+    """help_uiux에서 사용할 가이드라인 retriever (Azure AI Search를 쓸 수 없으면 로컬 색인으로 검색)"""
+    local_retriever = get_local_retriever(k=3)
+    if UIUX_RETRIEVER == "vector":
+        try:
+            return get_vector_retriever(k=3).with_fallbacks([local_retriever])
+        except Exception as e:
+            print(f"벡터 저장소를 사용할 수 없어 로컬 색인으로 검색합니다: {e}")
+            return local_retriever
+    if UIUX_RETRIEVER != "azure" or not search_index_name:
+        return local_retriever
+    return get_search_retriever(
+        search_index_name,
+        top_k=3,  # 검색 결과로 가져올 문서 수
+        content_key="chunk" # "content"로 하지 않게 주의! index 생성할 때 확인하자
+    ).with_fallbacks([local_retriever])
+
+def search_guidelines(query):
+    """가이드라인 검색 결과 (같은 질문은 TTL 동안 다시 검색하지 않음)"""
+    return uiux_query_cache.get_or_compute(query, lambda: format_docs(get_uiux_retriever().invoke(query)))
+
 @tool
-def help_uiux(query: str) -> str:   # Azure AI Search의 인덱스를 통해 UI/UX 관련 질문에 답변하는 기능
+def help_uiux(query: str) -> str:   # UI/UX 가이드라인 색인(로컬 BM25 또는 Azure AI Search)을 통해 UI/UX 관련 질문에 답변하는 기능
     """
     AI에게 UI/UX 관련 질문을 던져 답변을 받는 기능입니다.
     """
     try:
-        # chain이 독자적으로 실행될 수 있도록 하위에 다 넣어줌
-        retriever = AzureAISearchRetriever(
-                    index_name=search_index_name,
-                    top_k=3,  # 검색 결과로 가져올 문서 수
-                    content_key="chunk" # "content"로 하지 않게 주의! index 생성할 때 확인하자
-        )
-        
-        prompt = ChatPromptTemplate.from_template(  # 이 prompt 이용해서 search
-        """
-        가이드라인: {context}
-        질문: {question}
-        
+        # chain이 독자적으로 실행될 수 있도록 하위에 다 넣어줌 (검색 결과는 질문 캐시, LLM 클라이언트는 프로세스 공용 레지스트리에서 재사용)
+        # 고정된 지침을 시스템 메시지로 앞에 두고 검색 결과/질문은 마지막에 두어, 지침이 provider 프롬프트 캐시의 공통 prefix가 되도록 함
+        prompt = ChatPromptTemplate.from_messages([  # 이 prompt 이용해서 search
+        ("system", """
         당신은 UI/UX 전문 AI 어시스턴트입니다. 가이드라인과 본인의 창의적 역량을 결합하여 사용자에게 최적의 디자인 솔루션을 제공합니다.
         핵심 원칙
         1. 지식 기반 활용
 
-        Azure AI Search에서 검색된 UI/UX 가이드라인을 우선 참고하되, 맹목적으로 따르지 마세요. 검색된 내용이 사용자 요구사항과 완전히 맞지 않을 경우, 적절히 해석하고 응용하세요. 가이드라인에 명시되지 않은 부분은 창의적으로 보완하세요
+        검색된 UI/UX 가이드라인을 우선 참고하되, 맹목적으로 따르지 마세요. 검색된 내용이 사용자 요구사항과 완전히 맞지 않을 경우, 적절히 해석하고 응용하세요. 가이드라인에 명시되지 않은 부분은 창의적으로 보완하세요
 
         2. 창의적 사고
 
@@ -133,14 +153,18 @@ def help_uiux(query: str) -> str:   # Azure AI Search의 인덱스를 통해 UI/
         사용자의 실제 제약조건(예산, 기술, 시간)을 무시한 제안은 자제하세요
 
         기억하세요: 당신은 가이드라인의 해석자이자 창의적 파트너입니다. 기존 지식을 존중하면서도, 사용자만의 독특한 솔루션을 만들어내는 것이 목표입니다.
-        """
-        )
+        """),
+        ("human", """
+        가이드라인: {context}
+        질문: {question}
+        """),
+        ])
         
-        llm = AzureChatOpenAI(deployment_name=llm_mini)
+        llm = get_chat_client(llm_mini)
 
         chain = (
             {
-                "context": retriever | format_docs,
+                "context": search_guidelines,
                 "question": RunnablePassthrough()
             }
             | prompt
@@ -159,12 +183,10 @@ def help_microcopy(query: str) -> str:
     AI에게 마이크로카피 작성 요청을 던져 답변을 받는 기능입니다.
     """
     try:
-        prompt = ChatPromptTemplate.from_template(
-            """
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """
             당신은 UI/UX 전문 AI 어시스턴트입니다. 사용자의 요구에 맞는 마이크로카피를 작성합니다.
             
-            질문: {question}
-            
             마이크로카피 작성 가이드라인:
             1. 간결하고 명확하게 전달
             2. 사용자 친화적인 언어 사용
@@ -175,11 +197,12 @@ def help_microcopy(query: str) -> str:
             - 버튼 텍스트: "지금 시작하기"
             - 오류 메시지: "입력한 정보를 확인해주세요."
             
-            위의 가이드라인을 참고하여, 다음 질문에 대한 마이크로카피를 작성해주세요.
-            """
-        )
+            위의 가이드라인을 참고하여, 사용자의 질문에 대한 마이크로카피를 작성해주세요.
+            """),
+            ("human", "질문: {question}"),
+        ])
         
-        llm = AzureChatOpenAI(deployment_name=llm_mini)
+        llm = get_chat_client(llm_mini)
         
         chain = (
             {
@@ -199,6 +222,10 @@ def help_microcopy(query: str) -> str:
 def web_search(query: str) -> str:   
     """직접적인 UI 관련 질문이 아닌 경우 웹 검색을 통해 답변을 제공하는 기능입니다."""
     try:
+        cached = web_query_cache.get(query)
+        if cached is not None:
+            return cached
+
         tavilyRetriever = TavilySearchResults(
             max_results=3,  # 반환할 결과의 수
             search_depth="basic",  # 검색 깊이: basic 또는 advanced
@@ -208,14 +235,13 @@ def web_search(query: str) -> str:
         )
         
         result = tavilyRetriever.invoke(query)
+        if isinstance(result, list):   # 검색 실패 시에는 오류 문자열이 반환되므로 캐시하지 않음
+            web_query_cache.put(query, str(result))
         return str(result)  # 결과를 문자열로 변환
     except Exception as e:
         return f"웹 검색 중 오류가 발생했습니다: {str(e)}"
 
 # Azure OpenAI LLM을 사용하여 Agent 생성
-agent_llm = AzureChatOpenAI(
-    deployment_name=llm_gpt4,
-)
 tools = [help_uiux, help_microcopy, web_search]
 
 prompt = ChatPromptTemplate.from_messages(
@@ -245,22 +271,27 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-agent = create_tool_calling_agent(
-    agent_llm,
-    tools,
-    prompt,
-)
+def create_agent_executor():
+    agent = create_tool_calling_agent(
+        get_chat_client(llm_gpt4),
+        tools,
+        prompt,
+    )
 
-# AgentExecutor 생성 - return_intermediate_steps=True 추가!
-agent_executor = AgentExecutor(
-    agent=agent, 
-    tools=tools, 
-    verbose=True,
-    handle_parsing_errors=True,  # 파싱 에러 처리
-    max_iterations=3,  # 최대 반복 횟수 제한
-    max_execution_time=60,  # 최대 실행 시간(초)
-    return_intermediate_steps=True,  # 중간 단계 정보 반환
-)
+    # AgentExecutor 생성 - return_intermediate_steps=True 추가!
+    return AgentExecutor(
+        agent=agent, 
+        tools=tools, 
+        verbose=True,
+        handle_parsing_errors=True,  # 파싱 에러 처리
+        max_iterations=3,  # 최대 반복 횟수 제한
+        max_execution_time=60,  # 최대 실행 시간(초)
+        return_intermediate_steps=True,  # 중간 단계 정보 반환
+    )
+
+# 도구는 이번 실행의 설정(배포 이름, 검색 방식 등)을 참조하므로 실행기는 공유하지 않고 매번 만든다
+# (생성 비용은 작고, LLM 클라이언트와 HTTP 연결 풀은 프로세스 공용 레지스트리에서 재사용됨)
+agent_executor = create_agent_executor()
 
 with col1:
     st.subheader("📝 질문 입력 또는 회의록 업로드")
@@ -271,7 +302,7 @@ with col1:
     )
     st.markdown("""
     - UI/UX 개선, 디자인 원칙, 마이크로카피, 사례 등 다양한 질문을 할 수 있습니다.
-    - Azure AI Search 인덱스 기반 가이드라인을 참고하여 답변합니다.
+    - UI/UX 가이드라인 문서 색인을 참고하여 답변합니다.
     - 웹 검색도 활용합니다.
     """)
     
@@ -312,18 +343,28 @@ with col2:
     if user_question.strip() or meeting_content.strip():
         if user_question.strip():
             btn_key = f"ask_ai_btn_question_{len(user_question)}"
+            agent_input = user_question
         else:
             btn_key = f"ask_ai_btn_meeting_{len(meeting_content)}"
-        if st.button("🚀 질문/조언 받기", type="primary", use_container_width=True, key=btn_key):
+            agent_input = meeting_content
+        
+        # 호출 전 토큰 예상치 확인 (에이전트 시스템 프롬프트 + 질문/회의록)
+        plan = plan_execution(llm_gpt4, {"system": prompt.messages[0].prompt.template, "input": agent_input}, AGENT_OUTPUT_TOKENS)
+        render_execution_plan(plan, {"system": "시스템 프롬프트", "input": "질문" if user_question.strip() else "회의록"})
+        
+        if st.button("🚀 질문/조언 받기", type="primary", use_container_width=True, key=btn_key, disabled=plan.mode == "too_large"):
             with st.spinner("AI가 답변을 준비 중입니다..."):
                 try:
                     # Tool tracker 리셋
                     st.session_state.tool_tracker.reset()
                     
                     if meeting_content.strip() and not user_question.strip():
+                        # 고정 지시문을 앞에, 회의록을 마지막에 둠 (프롬프트 캐시 prefix 유지)
                         advice_prompt = f"""
-                        다음 회의록을 바탕으로 UI/UX 개선 조언을 해주세요:\n\n{meeting_content}
+                        다음 회의록을 바탕으로 UI/UX 개선 조언을 해주세요.
                         회의 내용을 전체적으로 파악해서 다양한 관점에서의 개선을 제시하세요.
+
+                        회의록:\n\n{meeting_content}
                         """
                         # AgentExecutor의 invoke 메서드 사용 (콜백 포함)
                         result = agent_executor.invoke(
@@ -404,11 +445,14 @@ with col2:
 with st.sidebar:
     st.markdown("### ℹ️ 사용법 안내")
     st.markdown("""
-    - 질문을 입력하면 AI가 Azure AI Search 인덱스와 웹 검색을 참고해 답변합니다.
+    - 질문을 입력하면 AI가 UI/UX 가이드라인 문서 색인과 웹 검색을 참고해 답변합니다.
     - 회의록을 입력하거나 업로드하면, 회의 내용을 바탕으로 UI/UX 개선 조언을 받을 수 있습니다.
     - 답변은 Markdown 파일로 다운로드할 수 있습니다.
     - UI/UX, 마이크로카피, 사례 등 다양한 주제를 자유롭게 질문하세요.
     """)
+
+    st.markdown("### 🔌 연결 재사용 현황")
+    render_pool_stats()
     
     st.divider()
     st.markdown("### 🔧 AI Tools")
@@ -1,15 +1,24 @@
 from dotenv import load_dotenv
-import os, tempfile, wave
+import os, wave, time, asyncio
 import streamlit as st
 import azure.cognitiveservices.speech as speechsdk
 from langchain.schema import HumanMessage, SystemMessage
-from utils.speech_utils import init_speech_config, speech_to_text_safe
-from utils.langchain_utils import init_langchain_client
+from utils.speech_utils import init_speech_config, speech_to_text_safe, parse_wav_header, open_uploaded_wav
+from utils.langchain_utils import init_langchain_client, stream_llm_response, record_prompt_usage
+from utils.transcript import Transcript
+from utils.token_budget import split_text_by_tokens, plan_execution, render_execution_plan
 
 # 환경변수 로드
 load_dotenv()
 llm_name = os.getenv("AZURE_OPENAI_LLM_4o")  # 음성 처리 위해 mini 대신 GPT-4o 사용
 
+# 긴 녹취록 요약 설정 (구간별 요약을 동시에 생성한 뒤 하나로 통합)
+SUMMARY_SINGLE_PASS_TOKENS = 12000   # 이 이하이면 녹취록 전체를 한 번에 요약
+SUMMARY_CHUNK_TOKENS = 6000          # 구간별 요약 시 한 구간의 최대 토큰 수
+SUMMARY_MAX_CONCURRENCY = 4          # 동시에 요청하는 구간 요약 수
+SUMMARY_OUTPUT_TOKENS = 2000         # 요약 결과의 예상 최대 길이
+SPEECH_TOKENS_PER_MINUTE = 250       # 변환 전 녹음 길이로 녹취록 토큰 수를 추정할 때 사용 (한국어 회의 기준)
+
 # 페이지 설정
 st.set_page_config(page_title="회의 녹음 기반 요약", page_icon="💿")
 st.title("💿 회의 녹음 기반 요약")
@@ -17,7 +26,7 @@ st.markdown("WAV 형식의 음성 파일을 업로드하면 AI가 자동으로 
 
 # WAV 파일 검증 및 준비 함수
 def validate_and_prepare_wav_audio(file_data, file_name):
-    """WAV 파일 검증 및 Azure Speech SDK 호환 형식으로 준비"""
+    """WAV 파일 검증 및 Azure Speech SDK 호환 형식으로 준비 (임시 파일 없이 메모리에서 헤더 파싱)"""
     try:
         file_extension = os.path.splitext(file_name)[1].lower()
         
@@ -26,49 +35,35 @@ def validate_and_prepare_wav_audio(file_data, file_name):
             st.error(f"❌ {file_extension.upper()} 파일은 지원하지 않습니다. WAV 파일만 업로드해주세요.")
             return None, False
         
-        # 임시 파일 생성
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            tmp_file.write(file_data)
-            tmp_file_path = tmp_file.name
-        
         # WAV 파일 상세 검증
         try:
-            with wave.open(tmp_file_path, 'rb') as wav_file:
-                channels = wav_file.getnchannels()
-                sample_width = wav_file.getsampwidth()
-                frame_rate = wav_file.getframerate()
-                frames = wav_file.getnframes()
-                duration = frames / frame_rate
-
-                # Azure Speech SDK 호환성 경고
-                warnings = []
-                if channels > 2:
-                    warnings.append("⚠️ 채널 수가 많습니다. 모노(1채널) 또는 스테레오(2채널)를 권장합니다.")
-                if sample_width != 2:
-                    warnings.append("⚠️ 16-bit PCM을 권장합니다.")
-                if frame_rate < 8000 or frame_rate > 48000:
-                    warnings.append("⚠️ 샘플링 레이트가 권장 범위(8-48kHz)를 벗어납니다.")
-                
-                if warnings:
-                    for warning in warnings:
-                        st.warning(warning)
-                    st.info("💡 파일이 제대로 인식되지 않으면 권장 설정으로 변환해보세요.")
-                
-                return tmp_file_path, True
-                
+            wav_audio = parse_wav_header(file_data)
         except wave.Error as e:
             st.error(f"❌ WAV 파일이 손상되었거나 지원하지 않는 형식입니다: {e}")
-            os.unlink(tmp_file_path)
             return None, False
+        
+        # Azure Speech SDK 호환성 경고
+        warnings = []
+        if wav_audio.channels > 2:
+            warnings.append("⚠️ 채널 수가 많습니다. 모노(1채널) 또는 스테레오(2채널)를 권장합니다.")
+        if wav_audio.sample_width != 2:
+            warnings.append("⚠️ 16-bit PCM을 권장합니다.")
+        if wav_audio.frame_rate < 8000 or wav_audio.frame_rate > 48000:
+            warnings.append("⚠️ 샘플링 레이트가 권장 범위(8-48kHz)를 벗어납니다.")
+        
+        if warnings:
+            for warning in warnings:
+                st.warning(warning)
+            st.info("💡 인식 전에 16kHz / 모노 / 16-bit PCM으로 자동 변환됩니다.")
+        
+        return wav_audio, True
             
     except Exception as e:
         st.error(f"❌ 파일 준비 중 오류 발생: {e}")
         return None, False
 
-# 회의 내용 요약 함수
-def summarize_meeting(llm, transcript):
-    """회의 텍스트를 요약하는 함수"""
-    system_prompt = """
+# 회의 요약 시스템 프롬프트 (구간별 요약을 통합할 때도 같은 형식 사용)
+SUMMARY_SYSTEM_PROMPT = """
     당신은 회의 내용을 전문적으로 요약하는 AI 어시스턴트입니다.
     음성에서 변환된 텍스트이므로 일부 불완전한 부분이 있을 수 있습니다.
     맥락을 파악하여 의미를 정확히 전달하도록 요약해주세요.
@@ -99,24 +94,90 @@ def summarize_meeting(llm, transcript):
     - 불분명한 부분은 앞뒤 맥락으로 추정하여 명확히 표현
     - 중요한 수치나 날짜는 특별히 주의하여 정확히 기록
     """
-    
+
+# 요약 실행 방식 결정 함수
+def plan_meeting_summary(transcript):
+    """녹취록(또는 추정 토큰 수)으로 한 번에 요약할지, 구간별 요약 후 통합할지 결정"""
+    return plan_execution(
+        llm_name,
+        {"system": SUMMARY_SYSTEM_PROMPT, "transcript": transcript},
+        SUMMARY_OUTPUT_TOKENS,
+        chunk_part="transcript",
+        strategy="map_reduce",
+        max_single_pass_tokens=SUMMARY_SINGLE_PASS_TOKENS,
+        max_chunk_tokens=SUMMARY_CHUNK_TOKENS,
+    )
+
+# 회의 내용 요약 함수
+def summarize_meeting(llm, transcript):
+    """회의 텍스트를 요약하는 함수"""
     try:
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"""다음은 음성에서 변환된 회의 녹취록입니다:
+        # 한 번에 요약할 때는 녹취록 본문을 그대로 보내므로 그 텍스트로 판단 (구간별 요약만 시각 표시 녹취록 사용)
+        plan = plan_meeting_summary(str(transcript))
+        if plan.mode == "single":
+            content = f"""다음은 음성에서 변환된 회의 녹취록입니다:
 
 {transcript}
 
-위 내용을 체계적으로 요약하고, 음성 변환 과정에서 발생한 불완전한 부분들을 맥락에 맞게 보완해주세요.""")
+위 내용을 체계적으로 요약하고, 음성 변환 과정에서 발생한 불완전한 부분들을 맥락에 맞게 보완해주세요."""
+        else:
+            # 긴 회의: 구간별 요약(map)을 동시에 생성한 뒤 한 번에 통합(reduce)
+            source = transcript.to_timestamped_text() if isinstance(transcript, Transcript) else transcript
+            chunk_summaries = summarize_transcript_chunks(llm, source, plan.chunk_tokens)
+            joined = "\n\n".join(
+                f"### 구간 {index}/{len(chunk_summaries)}\n{summary}" for index, summary in enumerate(chunk_summaries, 1)
+            )
+            content = f"""다음은 긴 회의 녹취록을 시간 순서대로 나누어 구간별로 요약한 내용입니다:
+
+{joined}
+
+구간별 요약을 하나의 회의 요약으로 통합해주세요. 여러 구간에 걸친 안건과 결정사항은 합치고, 중복된 내용은 한 번만 기록해주세요."""
+
+        messages = [
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(content=content)
         ]
         
-        response = llm.invoke(messages)
+        response = stream_llm_response(llm, messages, stage="meeting_summary", language=None)
         return response.content
     
     except Exception as e:
         st.error(f"요약 생성 중 오류 발생: {e}")
         return None
 
+# 녹취록 구간별 요약 함수 (map 단계)
+def summarize_transcript_chunks(llm, source, chunk_tokens=SUMMARY_CHUNK_TOKENS):
+    """녹취록을 토큰 예산 단위로 나누어 구간별 요약을 동시에 생성 (시간 순서 유지)"""
+    chunk_prompt = """
+    당신은 긴 회의 녹취록의 일부 구간을 요약하는 AI 어시스턴트입니다.
+    이 요약은 다른 구간의 요약과 합쳐져 최종 회의 요약이 되므로, 나중에 통합할 수 있도록 사실 위주로 정리해주세요.
+
+    **정리할 내용:**
+    - 논의된 안건과 각 안건의 핵심 논점
+    - 결정된 사항과 반대 의견
+    - 액션 아이템 (담당자, 기한이 언급되었다면 함께)
+    - 언급된 중요한 수치, 날짜, 고유명사
+
+    음성 변환 과정의 오타는 맥락에 맞게 교정하고, 구간 밖의 내용은 추측하지 마세요.
+    """
+
+    chunks = split_text_by_tokens(source, chunk_tokens)
+    st.caption(f"🧩 녹취록이 길어 {len(chunks)}개 구간으로 나누어 동시에 요약합니다 (최대 {SUMMARY_MAX_CONCURRENCY}개 동시 요청)")
+
+    batches = [
+        [
+            SystemMessage(content=chunk_prompt),
+            HumanMessage(content=f"다음은 회의 녹취록 전체 {len(chunks)}개 구간 중 {index}번째 구간입니다:\n\n{chunk}")
+        ]
+        for index, chunk in enumerate(chunks, 1)
+    ]
+
+    started = time.monotonic()
+    responses = asyncio.run(llm.abatch(batches, config={"max_concurrency": SUMMARY_MAX_CONCURRENCY}))
+    st.caption(f"⏱️ 구간별 요약 {len(chunks)}개 완료 ({time.monotonic() - started:.1f}초)")
+    record_prompt_usage("meeting_summary_chunks", responses)
+    return [response.content for response in responses]
+
 # 메인 함수
 def main():
     # 클라이언트 초기화
@@ -154,76 +215,78 @@ def main():
             st.success(f"✅ WAV 파일 업로드 완료: {uploaded_file.name}")
             
             # 파일 정보 표시
-            file_size = len(uploaded_file.getvalue()) / (1024 * 1024)  # MB
+            file_size = uploaded_file.size / (1024 * 1024)  # MB
             st.info(f"📁 파일 크기: {file_size:.2f} MB")
             
-            # 파일 크기 제한 확인
-            if file_size > 100:
-                st.error("❌ 파일이 100MB를 초과합니다. 더 작은 파일로 나누어 업로드해주세요.")
-                st.stop()
-            elif file_size > 50:
-                st.warning("⚠️ 파일이 50MB를 초과합니다. 처리 시간이 오래 걸릴 수 있습니다.")
+            # 긴 녹음은 구간 단위로 나누어 처리 (업로드 크기 상한은 .streamlit/config.toml)
+            if file_size > 50:
+                st.warning("⚠️ 파일이 50MB를 초과합니다. 긴 녹음은 구간 단위로 나누어 처리되며 시간이 오래 걸릴 수 있습니다.")
             
             # 오디오 플레이어
-            st.audio(uploaded_file.getvalue())
+            st.audio(uploaded_file)
             
-            # 변환 시작 버튼
-            if st.button("🚀 음성 → 텍스트 변환 및 요약", type="primary", use_container_width=True):
-                # WAV 파일 검증 및 준비
-                with st.spinner("📋 WAV 파일 검증 및 준비 중..."):
-                    tmp_file_path, is_valid = validate_and_prepare_wav_audio(
-                        uploaded_file.getvalue(), 
-                        uploaded_file.name
+            # 업로드 버퍼 하나로 길이 추정과 변환을 모두 처리 (복사 없음)
+            with open_uploaded_wav(uploaded_file) as wav_buffer:
+                # 요약 단계 토큰 예상치 (변환 전이므로 녹음 길이로 녹취록 분량 추정)
+                try:
+                    minutes = parse_wav_header(wav_buffer).duration / 60
+                    render_execution_plan(
+                        plan_meeting_summary(int(minutes * SPEECH_TOKENS_PER_MINUTE)),
+                        {"system": "시스템 프롬프트", "transcript": f"녹취록(약 {minutes:.0f}분 추정)"}
                     )
+                except wave.Error:
+                    pass  # 손상된 파일은 변환 단계의 검증에서 안내
                 
-                if not is_valid or not tmp_file_path:
-                    st.error("❌ WAV 파일 준비에 실패했습니다.")
-                    return
+                # 변환 시작 버튼
+                if st.button("🚀 음성 → 텍스트 변환 및 요약", type="primary", use_container_width=True):
+                    with st.spinner("📋 WAV 파일 검증 및 준비 중..."):
+                        wav_audio, is_valid = validate_and_prepare_wav_audio(
+                            wav_buffer, 
+                            uploaded_file.name
+                        )
                 
-                try:
-                    # 음성을 텍스트로 변환
-                    with st.spinner("🎯 음성을 텍스트로 변환 중... (WAV 파일 처리 중)"):
-                        transcript = speech_to_text_safe(tmp_file_path, speech_config)
+                    if not is_valid or not wav_audio:
+                        st.error("❌ WAV 파일 준비에 실패했습니다.")
+                        return
+                
+                    try:
+                        # 음성을 텍스트로 변환
+                        transcription_stats = {}
+                        with st.spinner("🎯 음성을 텍스트로 변환 중... (WAV 파일 처리 중)"):
+                            transcript = speech_to_text_safe(wav_audio, speech_config, parallel=True, stats=transcription_stats)
                     
-                    if transcript and transcript.strip():
-                        st.session_state["transcript"] = transcript
-                        st.success(f"✅ 음성 인식 완료! (인식된 텍스트 길이: {len(transcript)}자)")
+                        if transcript and transcript.strip():
+                            st.session_state["transcript"] = transcript
+                            st.session_state["transcription_stats"] = transcription_stats
+                            st.success(f"✅ 음성 인식 완료! (인식된 텍스트 길이: {len(transcript)}자)")
                         
-                        # 요약 생성
-                        with st.spinner("📝 AI가 회의 내용을 요약 중입니다..."):
-                            summary = summarize_meeting(llm, transcript)
-                            if summary:
-                                st.session_state["summary"] = summary
-                                st.balloons()  # 성공 애니메이션
-                                st.success("🎉 변환 및 요약이 완료되었습니다!")
-                    else:
-                        st.error("""
-                        ❌ 음성 인식에 실패했습니다.
+                            # 요약 생성
+                            with st.spinner("📝 AI가 회의 내용을 요약 중입니다..."):
+                                summary = summarize_meeting(llm, transcript)
+                                if summary:
+                                    st.session_state["summary"] = summary
+                                    st.balloons()  # 성공 애니메이션
+                                    st.success("🎉 변환 및 요약이 완료되었습니다!")
+                        else:
+                            st.error("""
+                            ❌ 음성 인식에 실패했습니다.
                         
-                        **해결 방법:**
-                        1. WAV 파일이 손상되지 않았는지 확인
-                        2. 권장 설정(16-bit PCM, 16kHz)으로 변환
-                        3. 배경 소음이 적은 깨끗한 녹음 사용
-                        4. 파일 크기가 너무 크지 않은지 확인
-                        """)
+                            **해결 방법:**
+                            1. WAV 파일이 손상되지 않았는지 확인
+                            2. 권장 설정(16-bit PCM, 16kHz)으로 변환
+                            3. 배경 소음이 적은 깨끗한 녹음 사용
+                            4. 파일 크기가 너무 크지 않은지 확인
+                            """)
                 
-                except Exception as e:
-                    st.error(f"❌ 음성 변환 중 오류 발생: {e}")
-                    st.error("""
-                    **WAV 파일 오류 해결 방법:**
-                    1. 다른 WAV 파일로 테스트
-                    2. 오디오 편집 프로그램으로 파일 재저장
-                    3. 권장 설정으로 변환:
-                       `ffmpeg -i input.wav -acodec pcm_s16le -ar 16000 -ac 1 output.wav`
-                    """)
-                
-                finally:
-                    # 임시 파일 삭제
-                    try:
-                        if tmp_file_path and os.path.exists(tmp_file_path):
-                            os.unlink(tmp_file_path)
-                    except:
-                        pass
+                    except Exception as e:
+                        st.error(f"❌ 음성 변환 중 오류 발생: {e}")
+                        st.error("""
+                        **WAV 파일 오류 해결 방법:**
+                        1. 다른 WAV 파일로 테스트
+                        2. 오디오 편집 프로그램으로 파일 재저장
+                        3. 권장 설정으로 변환:
+                           `ffmpeg -i input.wav -acodec pcm_s16le -ar 16000 -ac 1 output.wav`
+                        """)
     
     with col2:
         st.subheader("📝 변환 및 요약 결과")
@@ -248,17 +311,48 @@ def main():
                 if "transcript" in st.session_state:
                     st.download_button(
                         label="📄 전문 다운로드 (TXT)",
-                        data=st.session_state["transcript"],
+                        data=st.session_state["transcript"].to_timestamped_text() if isinstance(st.session_state["transcript"], Transcript) else st.session_state["transcript"],
                         file_name="meeting_transcript.txt",
                         mime="text/plain",
                         use_container_width=True,
                         key="download_transcript_btn"
                     )
             
-            # 전문 보기 (접히는 형태)
+            # 음성 인식 처리 통계 (무음 구간 제거 비율, 신호 품질)
+            if "transcription_stats" in st.session_state:
+                stats = st.session_state["transcription_stats"]
+                col_s1, col_s2, col_s3 = st.columns(3)
+                with col_s1:
+                    st.metric("녹음 길이", f"{stats.get('duration_seconds', 0) / 60:.1f}분")
+                with col_s2:
+                    st.metric("무음 제거 비율", f"{stats.get('removed_ratio', 0) * 100:.1f}%",
+                              help="긴 무음 구간을 압축하여 인식하지 않은 오디오의 비율")
+                with col_s3:
+                    st.metric("인식 세그먼트", stats.get("segments", "캐시" if stats.get("cached") else "N/A"))
+
+                signal = stats.get("signal")
+                if signal:
+                    st.caption(
+                        f"📊 녹음 품질 {signal['quality_score']}점 · 평균 음량 {signal['rms_dbfs']:.0f} dBFS · "
+                        f"SNR {signal['snr_db']:.0f} dB · 대역폭 {signal['bandwidth_hz'] / 1000:.1f}kHz · "
+                        f"클리핑 {signal['clipping_ratio'] * 100:.2f}%"
+                    )
+
+            # 전문 보기 (접히는 형태, 발화 시각이 있으면 구간 선택 가능)
             if "transcript" in st.session_state:
+                transcript = st.session_state["transcript"]
                 with st.expander("📖 전체 녹취록 보기"):
-                    st.text_area("변환된 텍스트", st.session_state["transcript"], height=300, disabled=True, key="transcript_display")
+                    if isinstance(transcript, Transcript) and transcript.utterance_count:
+                        total_minutes = max(1, int(transcript.duration_seconds // 60) + 1)
+                        start_minute, end_minute = st.slider(
+                            "구간 선택 (분)", 0, total_minutes, (0, total_minutes), key="transcript_range"
+                        )
+                        selected = transcript.slice_time(start_minute * 60, end_minute * 60)
+                        if transcript.mean_confidence is not None:
+                            st.caption(f"발화 {selected.utterance_count}개 · 평균 인식 신뢰도 {transcript.mean_confidence * 100:.0f}%")
+                        st.text_area("변환된 텍스트", selected.to_timestamped_text(), height=300, disabled=True, key="transcript_display")
+                    else:
+                        st.text_area("변환된 텍스트", transcript, height=300, disabled=True, key="transcript_display")
         
         else:
             st.info("👆 WAV 음성 파일을 업로드하고 '변환 및 요약' 버튼을 눌러주세요.")
@@ -1,2 +1,3 @@
 pip install -r requirements.txt
+python -m utils.rag_ingest   # rag-docs 적재 및 BM25 색인 갱신 (바뀐 문서만)
 python -m streamlit run Home.py --server.port 8000 --server.address 0.0.0.0
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import sys
+
+# search/replace 패치 적용(utils.code_patch) 테스트 - 정확한 일치, 공백 무시 일치와 들여쓰기 보정, 모호한 일치, 병합 충돌
+# 실행: python -m pytest tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.code_patch import apply_edit_hunks, locate_edit, merge_edit_hunks
+
+CODE = """class Form:
+    def render(self):
+        label = "저장"
+        return button(label)
+
+    def reset(self):
+        label = "저장"
+        return None
+"""
+
+
+def test_exact_match_replaces_only_the_span():
+    code, failures = apply_edit_hunks(CODE, [{"search": "return button(label)", "replace": "return button(label, size=44)"}])
+    assert failures == []
+    assert "        return button(label, size=44)\n" in code
+    assert code.replace("button(label, size=44)", "button(label)") == CODE
+
+
+def test_fuzzy_match_reindents_replace_to_matched_lines():
+    hunk = {
+        "search": "def render(self):\n    label = \"저장\"\n",
+        "replace": "def render(self):\n    label = \"제출\"\n    color = \"primary\"\n",
+    }
+    code, failures = apply_edit_hunks(CODE, [hunk])
+    assert failures == []
+    assert '    def render(self):\n        label = "제출"\n        color = "primary"\n        return button(label)\n' in code
+
+
+def test_fuzzy_match_ignores_trailing_whitespace():
+    code, failures = apply_edit_hunks(CODE, [{"search": "    def reset(self):   \n        return None", "replace": ""}])
+    assert failures == [(1, "search와 일치하는 코드를 찾지 못했습니다")]
+    code, failures = apply_edit_hunks(CODE, [{"search": "def reset(self):   \n    label = \"저장\"", "replace": "def clear(self):\n    label = \"\""}])
+    assert failures == []
+    assert '    def clear(self):\n        label = ""\n        return None\n' in code
+
+
+def test_search_without_trailing_newline_keeps_line_break():
+    search = "label = \"저장\"\nreturn None"
+    span, reason = locate_edit(CODE, search)
+    assert reason is None
+    assert CODE[span[0]:span[1]] == '        label = "저장"\n        return None'
+    code, _ = apply_edit_hunks(CODE, [{"search": search, "replace": "return label"}])
+    assert code.endswith("    def reset(self):\n        return label\n")
+
+
+def test_ambiguous_match_fails_without_within():
+    span, reason = locate_edit(CODE, 'label = "저장"')
+    assert span is None
+    assert reason == "search가 코드의 2곳과 일치합니다"
+
+    code, failures = apply_edit_hunks(CODE, [{"search": 'label = "저장"', "replace": 'label = "제출"'}])
+    assert code == CODE
+    assert failures == [(1, "search가 코드의 2곳과 일치합니다")]
+
+
+def test_ambiguous_match_resolved_by_within():
+    reset_start = CODE.index("    def reset")
+    span, reason = locate_edit(CODE, 'label = "저장"', within=[(reset_start, len(CODE))])
+    assert reason is None
+    assert span[0] > reset_start
+
+    # within 밖에만 있는 일치는 무시하지 않고 그대로 모호한 일치로 보고
+    span, reason = locate_edit(CODE, 'label = "저장"', within=[(0, 10)])
+    assert span is None and reason == "search가 코드의 2곳과 일치합니다"
+
+
+def test_merge_applies_non_overlapping_edits_against_original():
+    render = (0, CODE.index("    def reset"))
+    reset = (render[1], len(CODE))
+    edits = [
+        ({"search": 'label = "저장"', "replace": 'label = "제출"'}, [render]),
+        ({"search": 'label = "저장"', "replace": 'label = "초기화"'}, [reset]),
+    ]
+    merged, failures, conflicts = merge_edit_hunks(CODE, edits)
+    assert failures == [] and conflicts == []
+    assert merged == CODE.replace('"저장"', '"제출"', 1).replace('"저장"', '"초기화"', 1)
+
+
+def test_merge_reports_overlapping_edits_and_applies_duplicates_once():
+    first = {"search": "return button(label)", "replace": "return button(label, size=44)"}
+    overlapping = {"search": "label = \"저장\"\n        return button(label)", "replace": "return button(\"저장\")"}
+    edits = [(first, None), (dict(first), None), (overlapping, None), ({"search": "없는 코드", "replace": ""}, None)]
+
+    merged, failures, conflicts = merge_edit_hunks(CODE, edits)
+    assert merged.count("size=44") == 1
+    assert conflicts == [(3, 1)]
+    assert failures == [(4, "search와 일치하는 코드를 찾지 못했습니다")]
+
+
+def test_empty_search_is_rejected():
+    code, failures = apply_edit_hunks(CODE, [{"search": "  \n", "replace": "x"}])
+    assert code == CODE
+    assert failures == [(1, "search가 비어 있습니다")]
@@ -0,0 +1,125 @@
+import os
+import sys
+import pytest
+
+# 코드 구조 단위 분할/재조립(utils.code_structure)과 요구사항 그룹화 테스트
+# 실행: python -m pytest tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.code_structure import CodeUnit, group_requirements, replace_units, split_code_units
+
+HTML = """<!DOCTYPE html>
+<html>
+<head>
+  <style>
+    .btn { color: #333; }
+  </style>
+  <script>const ready = true;</script>
+</head>
+<body>
+  <header class="top"><nav><a href="/">홈</a></nav></header>
+  <main id="content">
+    <section class="form">
+      <label>이름<input name="name"></label>
+      <button class="btn" onclick="save()">저장</button>
+      <ul><li>하나<li>둘</ul>
+    </section>
+    <p>안내 &amp; 설명</p>
+  </main>
+</body>
+</html>
+"""
+
+JSX = """import React, { useState } from "react";
+import "./App.css";
+
+export function SaveButton({ onSave }) {
+  return <button className="btn" onClick={onSave}>저장</button>;
+}
+
+const useForm = () => {
+  const [value, setValue] = useState("");
+  return { value, setValue };
+};
+
+@observer
+class Panel extends React.Component {
+  render() { return <div className="panel">{this.props.children}</div>; }
+}
+
+export default function App() {
+  return <Panel><SaveButton onSave={() => {}} /></Panel>;
+}
+"""
+
+
+def assert_units_cover_code(code, units):
+    """단위가 원문 순서이고 서로 겹치지 않으며 각 단위 텍스트가 원문 구간과 같은지 확인"""
+    assert units
+    position = 0
+    for unit in units:
+        assert unit.start >= position
+        assert unit.text == code[unit.start:unit.end]
+        position = unit.end
+
+
+@pytest.mark.parametrize("code, language, max_unit_tokens", [
+    (HTML, "html", 10_000),
+    (HTML, "html", 20),      # 큰 요소는 자식 단위로 더 나눔
+    (JSX, "react", 10_000),
+])
+def test_split_and_reassemble_returns_original(code, language, max_unit_tokens):
+    units = split_code_units(code, language, max_unit_tokens)
+    assert_units_cover_code(code, units)
+    assert replace_units(code, {unit: unit.text for unit in units}) == code
+
+
+def test_small_budget_splits_html_into_child_elements():
+    whole = split_code_units(HTML, "html", 10_000)
+    split = split_code_units(HTML, "html", 20)
+    assert len(split) > len(whole)
+    assert any(unit.text.startswith("<button") for unit in split)
+    assert {unit.kind for unit in whole} >= {"style", "script", "element"}
+
+
+def test_jsx_units_are_top_level_declarations():
+    units = split_code_units(JSX, "react", 10_000)
+    assert [unit.name for unit in units] == ["SaveButton", "useForm", "Panel", "App"]
+    assert units[2].text.startswith("@observer")
+    assert all("import" not in unit.text for unit in units)
+
+
+def test_replace_units_keeps_code_between_units():
+    units = split_code_units(JSX, "react", 10_000)
+    button = units[0]
+    new_button = button.text.replace('className="btn"', 'className="btn btn-primary"')
+
+    result = replace_units(JSX, {button: new_button})
+    assert result == JSX.replace('className="btn"', 'className="btn btn-primary"')
+
+
+def test_replace_units_rejects_overlapping_units():
+    outer = CodeUnit("element", "<main>", 0, 20, HTML[:20])
+    inner = CodeUnit("element", "<p>", 10, 30, HTML[10:30])
+    with pytest.raises(ValueError):
+        replace_units(HTML, {outer: "", inner: ""})
+
+
+def test_group_requirements_joins_shared_units_transitively_within_category():
+    units = [
+        CodeUnit("element", "<button> submit", 0, 1, '<button id="submitBtn">저장</button>'),
+        CodeUnit("element", "<button> cancel", 1, 2, '<button id="cancelBtn">취소</button>'),
+        CodeUnit("element", "<p> notice", 2, 3, '<p class="notice">안내</p>'),
+        CodeUnit("style", "<style>", 3, 4, "button { color: #666; }"),
+    ]
+    requirements = [
+        {"category": "기타", "technical_detail": "submitBtn 문구 변경"},
+        {"category": "기타", "technical_detail": "submitBtn과 cancelBtn 순서 변경"},
+        {"category": "기타", "technical_detail": "cancelBtn 문구 변경"},
+        {"category": "기타", "technical_detail": "notice 문구 변경"},
+        {"category": "색상", "technical_detail": "submitBtn 색상 변경"},
+    ]
+
+    groups = group_requirements(units, requirements, max_units_per_requirement=2)
+    # 0과 2는 직접 겹치지 않지만 1을 통해 같은 그룹, 4는 0과 같은 단위를 고치지만 category가 달라 별도 그룹
+    assert groups == [([0, 1, 2], [0, 1]), ([3], [2]), ([4], [0, 3])]
@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+
+# 스트리밍 JSON 추출(utils.json_stream) 테스트 - 설명 문장/코드 펜스가 섞인 응답을 여러 조각으로 나누어 공급
+# 실행: python -m pytest tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.json_stream import IncrementalJSONExtractor, extract_json_object
+
+RESULT = {
+    "applied_changes": [
+        {"requirement": "버튼 크기", "change_description": "터치 영역 확대 {min: 44px}"},
+        {"requirement": "대비", "change_description": "색상 \"대비\" 개선"},
+    ],
+    "improved_code": "<button class=\"btn\">{label}</button>",
+    "summary": "2개 변경",
+}
+EXPECTED_KEYS = ("applied_changes", "improved_code", "summary")
+
+
+def stream(text, size=7, expected_keys=EXPECTED_KEYS):
+    """text를 size 글자씩 공급하여 (마지막 원소가 도착한 뒤 닫히기 전까지 내보낸 원소, 최종 결과) 반환"""
+    extractor = IncrementalJSONExtractor(["applied_changes"], expected_keys)
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(item for _, item in extractor.feed(text[start:start + size]))
+    return items, extractor.close()
+
+
+def test_plain_object():
+    items, result = stream(json.dumps(RESULT, ensure_ascii=False))
+    assert items == RESULT["applied_changes"]
+    assert result == RESULT
+
+
+def test_fenced_object_with_preamble_example():
+    text = ('예시 형식은 {"a": 1}입니다.\n```json\n' + json.dumps(RESULT, ensure_ascii=False, indent=2) + "\n```\n끝.")
+    items, result = stream(text)
+    assert items == RESULT["applied_changes"]
+    assert result == RESULT
+
+
+def test_stray_brace_in_preamble_does_not_block_streaming():
+    body = json.dumps(RESULT, ensure_ascii=False)
+    text = "중괄호 {braces 는 설명일 뿐입니다.\n" + body
+    extractor = IncrementalJSONExtractor(["applied_changes"], EXPECTED_KEYS)
+    cut = len(text) - len(body) + body.index('"improved_code"')
+
+    # 객체가 닫히기 전(improved_code 직전)까지만 보내도 원소가 모두 나와야 함
+    items = [item for _, item in extractor.feed(text[:cut])]
+    assert items == RESULT["applied_changes"]
+    extractor.feed(text[cut:])
+    assert extractor.close() == RESULT
+
+
+def test_unexpected_first_key_reanchors_to_nested_result():
+    text = json.dumps({"note": "래퍼", "data": RESULT}, ensure_ascii=False)
+    items, result = stream(text)
+    assert items == RESULT["applied_changes"]
+    assert result == RESULT
+
+
+def test_extract_json_object_without_result():
+    assert extract_json_object("JSON이 없는 응답 {", expected_keys=EXPECTED_KEYS) is None
+    assert extract_json_object('{"fixes": []}', expected_keys=("fixes",)) == {"fixes": []}
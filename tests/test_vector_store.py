@@ -0,0 +1,115 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# 로컬 벡터 저장소(utils.vector_store) 빌드/검색/증분 재사용 테스트 (결정적 HashingEmbeddings 사용, 네트워크 없음)
+# 실행: python -m pytest tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vector_store import CURRENT_FILE, GENERATION_PREFIX, HashingEmbeddings, MmapVectorStore
+
+EMBEDDER_NAME = "hashing:test"
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """임베딩한 텍스트를 기록하는 HashingEmbeddings (fail_after개를 넘기면 예외)"""
+
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.embedded = []
+        self.fail_after = fail_after
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and len(self.embedded) + len(texts) > self.fail_after:
+            raise RuntimeError("임베딩 실패")
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def make_chunks(*texts):
+    return [{"text": text, "source": f"doc{number}.md", "heading": ""} for number, text in enumerate(texts)]
+
+
+CHUNKS = make_chunks(
+    "버튼은 충분한 터치 영역을 가져야 합니다",
+    "색상 대비는 접근성 기준을 만족해야 합니다",
+    "오류 메시지는 해결 방법을 함께 안내합니다",
+    "로딩 중에는 진행 상태를 표시합니다",
+)
+
+
+def generations(path):
+    return sorted(name for name in os.listdir(path) if name.startswith(GENERATION_PREFIX))
+
+
+def test_build_and_reopen(tmp_path):
+    store = MmapVectorStore.build(str(tmp_path), CHUNKS, HashingEmbeddings(), EMBEDDER_NAME, {"files": {"a": "1"}})
+
+    reopened = MmapVectorStore(str(tmp_path))
+    assert reopened.generation == store.generation
+    assert reopened.embedder_name == EMBEDDER_NAME
+    assert reopened.fingerprint == {"files": {"a": "1"}}
+    assert reopened.chunks == CHUNKS
+    assert reopened.vectors.shape == (len(CHUNKS), reopened.dim)
+    np.testing.assert_allclose(np.linalg.norm(reopened.vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_search_returns_top_k_by_similarity(tmp_path):
+    store = MmapVectorStore.build(str(tmp_path), CHUNKS, HashingEmbeddings(), EMBEDDER_NAME)
+    query = HashingEmbeddings().embed_query("오류 메시지 해결 방법")
+
+    results = store.search(query, k=2)
+    assert len(results) == 2
+    assert results[0][1]["text"] == CHUNKS[2]["text"]
+    assert results[0][0] >= results[1][0]
+    assert len(store.search(query, k=10)) == len(CHUNKS)
+
+
+def test_incremental_build_embeds_only_new_chunks(tmp_path):
+    first = MmapVectorStore.build(str(tmp_path), CHUNKS, HashingEmbeddings(), EMBEDDER_NAME)
+    changed = CHUNKS[:3] + make_chunks("모달은 닫기 버튼과 Esc 키를 지원합니다")
+
+    embedder = CountingEmbeddings()
+    second = MmapVectorStore.build(str(tmp_path), changed, embedder, EMBEDDER_NAME, previous=first)
+
+    assert embedder.embedded == [changed[3]["text"]]
+    assert second.embedded_count == 1
+    np.testing.assert_array_equal(second.vectors[:3], first.vectors[:3])
+    np.testing.assert_allclose(second.vectors[3], HashingEmbeddings().embed_query(changed[3]["text"]), rtol=1e-5)
+
+
+def test_incremental_build_reembeds_when_embedder_changes(tmp_path):
+    first = MmapVectorStore.build(str(tmp_path), CHUNKS, HashingEmbeddings(), EMBEDDER_NAME)
+
+    embedder = CountingEmbeddings()
+    MmapVectorStore.build(str(tmp_path), CHUNKS, embedder, "hashing:other", previous=first)
+
+    assert len(embedder.embedded) == len(CHUNKS)
+
+
+def test_failed_build_keeps_previous_store(tmp_path):
+    first = MmapVectorStore.build(str(tmp_path), CHUNKS, HashingEmbeddings(), EMBEDDER_NAME)
+    changed = make_chunks(*(f"새 구간 {number}" for number in range(10)))
+
+    with pytest.raises(RuntimeError):
+        MmapVectorStore.build(str(tmp_path), changed, CountingEmbeddings(fail_after=4), EMBEDDER_NAME,
+                              batch_size=2, previous=first)
+
+    reopened = MmapVectorStore(str(tmp_path))
+    assert reopened.generation == first.generation
+    assert reopened.chunks == CHUNKS
+    np.testing.assert_array_equal(reopened.vectors, first.vectors)
+    assert generations(str(tmp_path)) == [first.generation]
+
+
+def test_old_generations_are_removed(tmp_path):
+    store = None
+    for text in ("첫 번째", "두 번째", "세 번째"):
+        store = MmapVectorStore.build(str(tmp_path), make_chunks(text), HashingEmbeddings(), EMBEDDER_NAME,
+                                      previous=store)
+
+    # 현재 세대와 (아직 열려 있을 수 있는) 직전 세대만 남음
+    assert len(generations(str(tmp_path))) == 2
+    with open(os.path.join(str(tmp_path), CURRENT_FILE), encoding="utf-8") as f:
+        assert f.read() == store.generation
@@ -0,0 +1,143 @@
+import os
+import threading
+import httpx
+import streamlit as st
+from dotenv import load_dotenv
+from langchain_openai import AzureChatOpenAI
+
+
+load_dotenv()
+
+# 프로세스 전체에서 공유하는 LLM 클라이언트/검색 retriever 레지스트리
+# Streamlit은 질문마다 페이지 스크립트를 다시 실행하므로, 클라이언트를 매번 만들면 생성 비용과 새 TLS 연결 비용이 반복된다.
+# 같은 설정의 클라이언트는 한 번만 만들고, 모든 Azure OpenAI 동기 호출은 keep-alive 연결 풀을 가진 하나의 httpx.Client를 공유한다.
+# (비동기 호출(abatch)은 이벤트 루프마다 연결이 묶이므로 langchain_openai 기본 비동기 클라이언트를 그대로 사용한다.)
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", 120))
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", 600))   # openai 기본값과 같음
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = 10
+
+_resources = {}
+_creation_locks = {}          # key별 생성 잠금 (생성 중인 key만 기다리고 다른 key의 조회는 막지 않음)
+_lock = threading.Lock()      # _resources/_creation_locks/_stats 보호용 (factory 실행 중에는 잡지 않음)
+_local = threading.local()    # 현재 스레드가 실행 중인 factory 깊이 (내부 조회는 재사용 통계에서 제외)
+_stats = {"created": 0, "reused": 0, "requests": 0, "connections": 0}
+
+
+def get_resource(key, factory):
+    """key로 등록된 객체를 반환하고, 없으면 factory()로 만들어 등록 (생성에 실패하면 등록하지 않음)
+
+    factory는 전역 잠금 밖에서 실행되므로 느린 생성(색인 빌드 등)이 다른 key의 조회를 막지 않고,
+    같은 key를 동시에 요청한 스레드만 생성이 끝날 때까지 기다린다.
+    재사용 통계는 페이지에서 직접 요청한 경우만 센다 (factory 안에서의 조회는 제외).
+    """
+    top_level = not getattr(_local, "depth", 0)
+    with _lock:
+        if key in _resources:
+            _stats["reused"] += top_level
+            return _resources[key]
+        creation_lock = _creation_locks.setdefault(key, threading.Lock())
+
+    with creation_lock:
+        with _lock:
+            if key in _resources:   # 기다리는 동안 다른 스레드가 만든 경우
+                _stats["reused"] += top_level
+                return _resources[key]
+        _local.depth = getattr(_local, "depth", 0) + 1
+        try:
+            resource = factory()
+        finally:
+            _local.depth -= 1
+        with _lock:
+            _resources[key] = resource
+            _creation_locks.pop(key, None)
+            _stats["created"] += 1
+        return resource
+
+
+def shared_http_client():
+    """keep-alive 연결 풀을 가진 프로세스 공용 httpx.Client"""
+    return get_resource(("http_client",), _create_http_client)
+
+
+def get_chat_client(deployment, **options):
+    """배포 이름과 옵션(temperature, cache 등)이 같으면 같은 AzureChatOpenAI 인스턴스를 반환
+
+    엔드포인트/키를 options로 주지 않으면 AzureChatOpenAI의 환경변수 기본값을 사용한다.
+    """
+    key = ("chat", deployment, tuple(sorted(options.items())))
+    return get_resource(key, lambda: AzureChatOpenAI(
+        azure_deployment=deployment,
+        http_client=shared_http_client(),
+        **options
+    ))
+
+
+def get_embedding_client(deployment, **options):
+    """배포 이름과 옵션이 같으면 같은 AzureOpenAIEmbeddings 인스턴스를 반환 (연결 풀 공유)"""
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    key = ("embeddings", deployment, tuple(sorted(options.items())))
+    return get_resource(key, lambda: AzureOpenAIEmbeddings(
+        azure_deployment=deployment,
+        http_client=shared_http_client(),
+        **options
+    ))
+
+
+def get_search_retriever(index_name, top_k, content_key):
+    """인덱스와 검색 설정이 같으면 같은 AzureAISearchRetriever 인스턴스를 반환"""
+    from langchain_community.retrievers import AzureAISearchRetriever
+
+    key = ("search_retriever", index_name, top_k, content_key)
+    return get_resource(key, lambda: AzureAISearchRetriever(index_name=index_name, top_k=top_k, content_key=content_key))
+
+
+def pool_stats():
+    """클라이언트 재사용 및 HTTP 연결 재사용 현황"""
+    with _lock:
+        stats = dict(_stats)
+    stats["connection_reuse_rate"] = (
+        (stats["requests"] - stats["connections"]) / stats["requests"] if stats["requests"] else 0.0
+    )
+    return stats
+
+
+def render_pool_stats():
+    """클라이언트/연결 재사용 지표 표시"""
+    stats = pool_stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("클라이언트 재사용", f"{stats['reused']:,}회", help=f"새로 만든 클라이언트 {stats['created']:,}개")
+    col2.metric("HTTP 요청", f"{stats['requests']:,}회")
+    col3.metric("연결 재사용률", f"{stats['connection_reuse_rate'] * 100:.0f}%",
+                help=f"새로 연 TCP 연결 {stats['connections']:,}개 (나머지 요청은 keep-alive 연결 재사용)")
+
+
+def _create_http_client():
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(LLM_HTTP_TIMEOUT_SECONDS, connect=LLM_HTTP_CONNECT_TIMEOUT_SECONDS),
+        event_hooks={"request": [_trace_request]},
+    )
+
+
+def _trace_request(request):
+    _count("requests")
+    # httpcore trace 확장으로 새 TCP 연결을 열 때만 기록 (풀에서 재사용한 요청은 연결 이벤트가 없음)
+    request.extensions["trace"] = _trace_connection
+
+
+def _trace_connection(event_name, info):
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections")
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
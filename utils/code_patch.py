@@ -0,0 +1,169 @@
+import re
+import streamlit as st
+
+# 코드 개선 결과를 전체 코드 대신 search/replace 편집 단위(hunk)로 받아 로컬에서 적용하는 패치 모드
+# 응답 길이가 파일 크기가 아니라 변경량에 비례하므로, 큰 파일에서 몇 줄만 바뀔 때 출력 토큰과 지연 시간이 크게 줄어든다.
+
+OUTPUT_MODES = {
+    "patch": "변경 부분만 (패치)",
+    "full": "전체 코드",
+}
+
+PATCH_OUTPUT_FORMAT_RULES = """
+**패치 작성 규칙:**
+- 전체 코드를 다시 쓰지 말고 바뀌는 부분만 applied_changes의 search/replace로 작성
+- search는 현재 코드의 일부를 공백과 들여쓰기까지 그대로 복사하고, 코드 안에서 한 번만 나타나도록 앞뒤 줄을 충분히 포함
+- 여러 변경의 search 범위가 서로 겹치지 않도록 작성 (위에서 아래 순서)
+- 코드를 추가할 때는 삽입 위치의 기존 줄을 search에 넣고, replace에 기존 줄과 추가 코드를 함께 작성
+- 코드를 삭제할 때는 replace를 빈 문자열로 작성
+"""
+
+
+def apply_edit_hunks(code, hunks):
+    """search/replace 편집을 순서대로 적용하여 (적용된 코드, 실패 목록) 반환
+
+    search가 코드에 정확히 한 번 나타나면 그대로 바꾸고, 없으면 줄 끝 공백/들여쓰기 차이를 무시하고 줄 단위로 다시 찾는다.
+    (공백 무시로 찾은 경우 replace의 들여쓰기를 일치한 코드의 들여쓰기에 맞춘다)
+    찾지 못하거나 여러 곳에 일치하는 편집은 적용하지 않고 (번호, 사유)로 실패 목록에 담는다.
+    """
+    failures = []
+    for number, hunk in enumerate(hunks, 1):
+        span, reason = locate_edit(code, hunk.get("search") or "")
+        if span is None:
+            failures.append((number, reason))
+            continue
+        start, end = span
+        code = code[:start] + _replacement(code, span, hunk) + code[end:]
+    return code, failures
+
+
+def locate_edit(code, search, within=None):
+    """search가 가리키는 코드 구간 ((시작, 끝), None) 또는 찾지 못한 경우 (None, 사유)
+
+    within(구간 목록)을 주면 여러 곳에 일치할 때 그 구간 안의 일치만 남긴다 (편집을 요청한 코드 부분 우선).
+    """
+    if not search.strip():
+        return None, "search가 비어 있습니다"
+
+    spans = [(match.start(), match.end()) for match in re.finditer(re.escape(search), code)]
+    fuzzy = not spans
+    if fuzzy:
+        spans = _find_line_spans(code, search)
+    if len(spans) > 1 and within:
+        inside = [span for span in spans if any(start <= span[0] and span[1] <= end for start, end in within)]
+        spans = inside or spans
+
+    if len(spans) == 1:
+        return spans[0], None
+    if spans:
+        return None, f"search가 코드의 {len(spans)}곳과 일치합니다" + (" (공백 무시)" if fuzzy else "")
+    return None, "search와 일치하는 코드를 찾지 못했습니다"
+
+
+def merge_edit_hunks(code, edits):
+    """여러 요청에서 받은 편집을 원본 기준으로 위치를 찾아 한 번에 적용
+
+    edits는 (편집, within) 목록이며 순서가 곧 우선순위이다. 앞선 편집과 구간이 겹치는 편집은 적용하지 않고
+    충돌로 보고하며, 같은 구간을 같은 내용으로 바꾸는 중복 편집은 한 번만 적용한다.
+    (병합된 코드, 실패 [(번호, 사유)], 충돌 [(번호, 먼저 적용된 편집 번호)])를 반환하며 번호는 1부터 시작한다.
+    """
+    accepted, failures, conflicts = [], [], []
+    for number, (hunk, within) in enumerate(edits, 1):
+        span, reason = locate_edit(code, hunk.get("search") or "", within)
+        if span is None:
+            failures.append((number, reason))
+            continue
+
+        replace = _replacement(code, span, hunk)
+        clash = next((item for item in accepted if item[0][0] < span[1] and span[0] < item[0][1]), None)
+        if clash is None:
+            accepted.append((span, replace, number))
+        elif clash[0] != span or clash[1] != replace:
+            conflicts.append((number, clash[2]))
+
+    merged = code
+    for (start, end), replace, _ in sorted(accepted, key=lambda item: item[0][0], reverse=True):
+        merged = merged[:start] + replace + merged[end:]
+    return merged, failures, conflicts
+
+
+def _find_line_spans(code, search):
+    """공백 차이를 무시하고 search의 줄들과 일치하는 모든 코드 구간 ((시작, 끝) 문자 위치 목록)"""
+    needle = [line.strip() for line in search.strip("\n").splitlines()]
+    lines = code.splitlines(keepends=True)
+    stripped = [line.strip() for line in lines]
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    spans = []
+    for index in range(len(lines) - len(needle) + 1):
+        if stripped[index:index + len(needle)] == needle:
+            end = offsets[index + len(needle)]
+            # 원본 search가 줄바꿈으로 끝나지 않으면 마지막 줄바꿈은 남겨 둔다
+            if not search.endswith("\n") and lines[index + len(needle) - 1].endswith("\n"):
+                end -= 1
+            spans.append((offsets[index], end))
+    return spans
+
+
+def _replacement(code, span, hunk):
+    """span에 넣을 replace (search가 공백 무시로 일치했으면 첫 줄 들여쓰기 차이만큼 replace 각 줄을 옮김)
+
+    공백 무시 일치는 줄 시작부터 바꾸므로, 들여쓰기를 빼고 보낸 search/replace를 그대로 넣으면 원래 들여쓰기가 사라진다.
+    """
+    search = hunk.get("search") or ""
+    replace = hunk.get("replace") or ""
+    start, end = span
+    if code[start:end] == search or not replace:
+        return replace
+
+    search_indent = _first_indent(search)
+    code_indent = _first_indent(code[start:end])
+    if search_indent == code_indent:
+        return replace
+    lines = replace.splitlines(keepends=True)
+    return "".join(
+        code_indent + line[len(search_indent):] if line.strip() and line.startswith(search_indent) else line
+        for line in lines
+    )
+
+
+def _first_indent(text):
+    """첫 번째 비어 있지 않은 줄의 들여쓰기"""
+    for line in text.splitlines():
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    return ""
+
+
+def apply_patch_result(data, current_code):
+    """패치 모드 응답(data)의 편집을 현재 코드에 적용하여 improved_code를 채우고 실패 목록 반환
+
+    기존 화면/보고서가 그대로 동작하도록 각 변경사항의 code_section에는 replace 내용을 넣는다.
+    """
+    changes = data.get("applied_changes") or []
+    improved_code, failures = apply_edit_hunks(current_code, changes)
+    for change in changes:
+        change.setdefault("code_section", change.get("replace", ""))
+    data["improved_code"] = improved_code
+    return failures
+
+
+def render_patch_failures(failures):
+    """적용하지 못한 편집 안내"""
+    if failures:
+        st.warning(
+            f"⚠️ 변경사항 {len(failures)}개를 현재 코드에 적용하지 못했습니다. "
+            "나머지 변경만 반영된 코드이며, 필요하면 출력 방식을 '전체 코드'로 바꿔 다시 실행해주세요."
+        )
+        for number, reason in failures:
+            st.write(f"- 개선사항 {number}: {reason}")
+
+
+def render_merge_conflicts(conflicts):
+    """서로 겹쳐서 적용하지 않은 편집 안내"""
+    if conflicts:
+        st.warning(f"⚠️ 다른 요구사항 그룹의 편집과 같은 코드를 수정하는 변경사항 {len(conflicts)}개는 적용하지 않았습니다.")
+        for number, other in conflicts:
+            st.write(f"- 개선사항 {number}: 개선사항 {other}과(와) 충돌")
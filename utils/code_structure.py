@@ -0,0 +1,302 @@
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+from utils.token_budget import count_tokens
+
+# 코드 언어 감지 및 구조 단위 분할
+# 큰 HTML/JSX/Vue 파일을 독립적으로 개선할 수 있는 단위(DOM 하위 트리, style/script 블록, React 컴포넌트)로 나누고,
+# 요구사항을 관련된 단위에만 배정한 뒤 개선 결과를 원래 위치에 다시 끼워 넣는다.
+# 단위 사이의 코드(import 문, 감싸는 태그 등)는 수정 대상이 아니며 원문 그대로 유지된다.
+
+CodeUnit = namedtuple("CodeUnit", ["kind", "name", "start", "end", "text"])
+
+# 요구사항 category별로 관련 코드를 찾을 때 쓰는 단서 (소문자 비교)
+CATEGORY_HINTS = {
+    "버튼": ("<button", "button", "btn", "onclick"),
+    "인터페이스": ("<button", "<input", "<a ", "modal", "dialog", "onclick"),
+    "레이아웃": ("display", "flex", "grid", "margin", "padding", "container", "layout", "<section", "<div"),
+    "색상": ("color", "background", "border", "theme", "#"),
+    "텍스트": ("<h1", "<h2", "<h3", "<p", "<label", "<span", "font", "placeholder", "title"),
+    "폼": ("<form", "<input", "<select", "<textarea", "<label", "submit", "onchange", "validation"),
+    "네비게이션": ("<nav", "<header", "menu", "<a ", "href", "router", "link"),
+    "반응형": ("@media", "max-width", "min-width", "flex", "grid", "viewport"),
+    "접근성": ("aria-", "alt=", "role=", "tabindex", "<label", "focus"),
+}
+STYLE_CATEGORIES = {"색상", "레이아웃", "반응형"}
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_WORD = re.compile(r'[A-Za-z][A-Za-z0-9_-]{2,}')
+_JS_DECLARATION = re.compile(
+    r'^(?:@(?P<decorator>\w+)'
+    r'|(?:export\s+(?:default\s+)?)?(?:async\s+)?function\*?\s+(?P<function>\w+)'
+    r'|(?:export\s+(?:default\s+)?)?class\s+(?P<class>\w+)'
+    r'|(?:export\s+)?(?:const|let|var)\s+(?P<variable>\w+)\s*=)',
+    re.M
+)
+_VUE_BLOCK = re.compile(r'^<(template|script|style)\b[^>]*>(.*?)^</\1>', re.M | re.S)
+
+
+def detect_code_language(code):
+    """코드 내용을 분석하여 언어를 자동 감지"""
+    code_lower = code.lower()
+
+    if 'import react' in code_lower or 'from react' in code_lower or 'jsx' in code_lower:
+        return 'react'
+    elif '<%' in code and '%>' in code:
+        return 'jsp'
+    elif '<html' in code_lower or '<!doctype html' in code_lower:
+        return 'html'
+    elif 'function' in code_lower and ('document.' in code_lower or 'window.' in code_lower):
+        return 'javascript'
+    elif '<template>' in code_lower and '<script>' in code_lower:
+        return 'vue'
+    elif 'component' in code_lower and '@' in code:
+        return 'angular'
+    else:
+        return 'html'  # 기본값
+
+
+def split_code_units(code, code_language, max_unit_tokens):
+    """코드를 개선 단위 목록(원문 순서, 서로 겹치지 않음)으로 분할
+
+    max_unit_tokens보다 큰 DOM 하위 트리는 자식 요소 단위로 더 나누며, 더 나눌 수 없는 단위는 그대로 둔다.
+    """
+    if code_language in ("html", "jsp"):
+        units = _split_html(code, 0, len(code), max_unit_tokens)
+    elif code_language == "vue":
+        units = _split_vue(code, max_unit_tokens)
+    else:  # react, javascript, angular
+        units = _split_script(code, 0, len(code), max_unit_tokens)
+    return [unit for unit in units if unit.text.strip()]
+
+
+def route_requirements(units, requirements, max_units_per_requirement=3):
+    """요구사항마다 관련도가 높은 단위(최대 max_units_per_requirement개)를 골라 단위별 요구사항 번호 목록 반환
+
+    관련도는 category 단서와 요구사항 문장에 나오는 영문 식별자(클래스명, 태그, 컴포넌트명 등)가 단위 코드에 나타나는 횟수이다.
+    관련 단위를 찾지 못한 요구사항은 스타일 단위(색상/레이아웃/반응형) 또는 가장 큰 마크업 단위에 배정한다.
+    """
+    lowered = [unit.text.lower() for unit in units]
+    routes = {index: [] for index in range(len(units))}
+    for number, requirement in enumerate(requirements):
+        scores = [_relevance(text, unit, requirement) for text, unit in zip(lowered, units)]
+        ranked = sorted((index for index, score in enumerate(scores) if score > 0), key=lambda index: -scores[index])
+        targets = ranked[:max_units_per_requirement] or _fallback_units(units, requirement)
+        for index in targets:
+            routes[index].append(number)
+    return routes
+
+
+def group_requirements(units, requirements, max_units_per_requirement=3):
+    """category가 같고 배정된 코드 단위가 겹치는 요구사항끼리 묶은 그룹 목록 [(요구사항 번호 목록, 단위 번호 목록)]
+
+    technical_detail 등에 언급된 식별자로 배정 단위가 정해지므로, 같은 코드 영역을 같은 관점으로 고치는 요구사항이 한 그룹이 된다.
+    그룹은 첫 요구사항 번호 순서이며, 단위 번호 목록은 원문 순서이다.
+    """
+    routes = route_requirements(units, requirements, max_units_per_requirement)
+    targets = {number: set() for number in range(len(requirements))}
+    for index, numbers in routes.items():
+        for number in numbers:
+            targets[number].add(index)
+
+    parent = list(range(len(requirements)))
+
+    def find(number):
+        while parent[number] != number:
+            parent[number] = parent[parent[number]]
+            number = parent[number]
+        return number
+
+    for number in range(len(requirements)):
+        for other in range(number):
+            same_category = str(requirements[number].get("category", "")) == str(requirements[other].get("category", ""))
+            if same_category and targets[number] & targets[other]:
+                parent[find(number)] = find(other)
+
+    groups = {}
+    for number in range(len(requirements)):
+        groups.setdefault(find(number), []).append(number)
+    return [
+        (numbers, sorted(set().union(*(targets[number] for number in numbers))))
+        for numbers in sorted(groups.values(), key=lambda numbers: numbers[0])
+    ]
+
+
+def replace_units(code, replacements):
+    """{단위: 새 코드}를 원래 위치에 끼워 넣은 전체 코드 (단위 밖의 코드는 그대로)"""
+    result, position = [], 0
+    for unit in sorted(replacements, key=lambda unit: unit.start):
+        if unit.start < position:
+            raise ValueError(f"겹치는 코드 단위가 있습니다: {unit.name}")
+        result.append(code[position:unit.start])
+        result.append(replacements[unit])
+        position = unit.end
+    result.append(code[position:])
+    return "".join(result)
+
+
+def _relevance(text, unit, requirement):
+    category = str(requirement.get("category", ""))
+    score = 0
+    for name, hints in CATEGORY_HINTS.items():
+        if name in category:
+            score += sum(1 for hint in hints if hint in text)
+            if name in STYLE_CATEGORIES and unit.kind == "style":
+                score += 2
+
+    description = " ".join(str(requirement.get(key, "")) for key in ("current_issue", "improvement_request", "technical_detail"))
+    for word in set(_WORD.findall(description)):
+        if word.lower() in text:
+            score += 3  # 요구사항에 직접 언급된 식별자는 category 단서보다 강한 근거
+    return score
+
+
+def _fallback_units(units, requirement):
+    if not units:
+        return []
+    if any(name in str(requirement.get("category", "")) for name in STYLE_CATEGORIES):
+        styles = [index for index, unit in enumerate(units) if unit.kind == "style"]
+        if styles:
+            return styles[:1]
+    markup = [index for index, unit in enumerate(units) if unit.kind in ("element", "template", "component")]
+    candidates = markup or range(len(units))
+    return [max(candidates, key=lambda index: len(units[index].text))]
+
+
+class _ElementTreeBuilder(HTMLParser):
+    """HTMLParser 이벤트로 요소별 (태그, 시작, 끝, 자식) 트리를 만드는 파서 (문자 단위 위치)"""
+
+    def __init__(self, code):
+        super().__init__(convert_charrefs=False)
+        self.code = code
+        self.line_starts = [0] + [match.end() for match in re.finditer(r'\n', code)]
+        self.root = {"tag": None, "start": 0, "end": len(code), "children": []}
+        self.stack = [self.root]
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        end = start + len(self.get_starttag_text() or "")
+        node = {"tag": tag, "start": start, "end": end, "children": []}
+        self.stack[-1]["children"].append(node)
+        if tag not in _VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        start = self._offset()
+        self.stack[-1]["children"].append(
+            {"tag": tag, "start": start, "end": start + len(self.get_starttag_text() or ""), "children": []}
+        )
+
+    def handle_endtag(self, tag):
+        if not any(node["tag"] == tag for node in self.stack[1:]):
+            return  # 짝이 없는 닫는 태그는 무시
+        start = self._offset()
+        close = self.code.find(">", start)
+        end = len(self.code) if close < 0 else close + 1
+        # 닫히지 않은 채 남은 요소(<li>, <p> 등)는 이 닫는 태그 앞에서 끝난 것으로 본다
+        while self.stack[-1]["tag"] != tag:
+            self.stack.pop()["end"] = start
+        self.stack.pop()["end"] = end
+
+    def close(self):
+        super().close()
+        while len(self.stack) > 1:
+            self.stack.pop()["end"] = len(self.code)
+
+
+def _split_html(code, start, end, max_unit_tokens):
+    builder = _ElementTreeBuilder(code[start:end])
+    builder.feed(code[start:end])
+    builder.close()
+
+    units = []
+    head = _find_element(builder.root, "head")
+    if head:
+        units.extend(_element_unit(code, start, node) for node in _walk(head) if node["tag"] in ("style", "script"))
+    container = _find_element(builder.root, "body") or _find_element(builder.root, "html") or builder.root
+    for node in container["children"]:
+        if node is head or node["tag"] in ("html", "head"):
+            continue
+        units.extend(_split_element(code, start, node, max_unit_tokens))
+    return sorted(units, key=lambda unit: unit.start)
+
+
+def _split_element(code, base, node, max_unit_tokens):
+    unit = _element_unit(code, base, node)
+    if not node["children"] or unit.kind != "element" or count_tokens(unit.text) <= max_unit_tokens:
+        return [unit]
+    units = []
+    for child in node["children"]:
+        units.extend(_split_element(code, base, child, max_unit_tokens))
+    return units
+
+
+def _element_unit(code, base, node):
+    start, end = base + node["start"], base + node["end"]
+    kind = node["tag"] if node["tag"] in ("style", "script") else "element"
+    text = code[start:end]
+    identifier = re.search(r'\b(?:id|class|className)\s*=\s*["\']([^"\']+)', text[:300])
+    name = f"<{node['tag']}>" + (f" {identifier.group(1)}" if identifier else "")
+    return CodeUnit(kind, name, start, end, text)
+
+
+def _find_element(node, tag):
+    for child in _walk(node):
+        if child["tag"] == tag:
+            return child
+    return None
+
+
+def _walk(node):
+    for child in node["children"]:
+        yield child
+        yield from _walk(child)
+
+
+def _split_script(code, start, end, max_unit_tokens):
+    """최상위 선언(function/class/const/데코레이터가 붙은 class) 단위로 분할
+
+    각 단위는 선언 시작부터 다음 최상위 선언 직전까지이며, 첫 선언 앞의 import 문 등은 단위에 포함하지 않는다.
+    """
+    source = code[start:end]
+    declarations, decorator_start = [], None
+    for match in _JS_DECLARATION.finditer(source):
+        if match.group("decorator"):
+            # 데코레이터는 바로 뒤에 오는 선언과 같은 단위
+            if decorator_start is None:
+                decorator_start = match.start()
+            continue
+        name = match.group("function") or match.group("class") or match.group("variable")
+        declarations.append((match.start() if decorator_start is None else decorator_start, name))
+        decorator_start = None
+    if decorator_start is not None:
+        declarations.append((decorator_start, None))
+
+    if not declarations:
+        return [CodeUnit("script", "script", start, end, source)]
+
+    units = []
+    for index, (offset, name) in enumerate(declarations):
+        unit_end = declarations[index + 1][0] if index + 1 < len(declarations) else len(source)
+        text = source[offset:unit_end].rstrip()
+        kind = "component" if name and name[:1].isupper() else "script"
+        units.append(CodeUnit(kind, name or "decorator", start + offset, start + offset + len(text), text))
+    return units
+
+
+def _split_vue(code, max_unit_tokens):
+    units = []
+    for match in _VUE_BLOCK.finditer(code):
+        block, inner_start, inner_end = match.group(1), match.start(2), match.end(2)
+        inner = code[inner_start:inner_end]
+        if count_tokens(inner) > max_unit_tokens and block == "template":
+            units.extend(_split_html(code, inner_start, inner_end, max_unit_tokens))
+        elif count_tokens(inner) > max_unit_tokens and block == "script":
+            units.extend(_split_script(code, inner_start, inner_end, max_unit_tokens))
+        else:
+            units.append(CodeUnit(block, f"<{block}>", inner_start, inner_end, inner))
+    return units or [CodeUnit("template", "vue", 0, len(code), code)]
@@ -0,0 +1,192 @@
+import re
+import json
+from bisect import bisect_right
+
+# LLM 스트리밍 응답에서 JSON 결과를 점진적으로 추출하는 파서
+# 코드 펜스(```json)나 앞뒤 설명 문장이 섞인 응답도 처리하며, 응답 전체를 정규식으로 되짚지 않고 한 번만 훑는다.
+# 도착한 조각은 이어 붙이지 않고 목록으로 보관하며(긴 응답에서 매번 전체를 복사하지 않음), 마지막으로 훑은 위치부터 새 조각만 훑는다.
+
+_STRUCTURAL = re.compile(r'[{}\[\]":\\]')
+
+
+class IncrementalJSONExtractor:
+    """스트리밍 텍스트에서 최상위 JSON 결과 객체를 선형 스캔으로 찾는 파서
+
+    watch_keys에 지정한 최상위 배열(예: ui_requirements)의 원소는 닫히는 즉시 feed()의 반환값으로 내보낸다.
+    완결된 객체가 expected_keys(기본값: watch_keys) 중 하나라도 가지고 있을 때만 결과로 인정하므로,
+    앞쪽 설명 문장 속 예시 객체(예: 'Use {"a": 1} format')는 건너뛴다.
+    후보 '{'는 첫 키에서 바로 확인하여, 뒤에 공백 외의 글자가 오거나 첫 키가 expected_keys에 없으면 그 다음 '{'부터 다시 탐색한다.
+    (설명 문장 속 짝 없는 '{' 때문에 스트리밍 중 원소를 하나도 내보내지 못하는 일이 없도록 close()까지 기다리지 않음)
+    객체가 모두 도착하면 result에 파싱된 dict가 들어가며, 이후 도착하는 텍스트(설명 문장 등)는 무시한다.
+    """
+
+    def __init__(self, watch_keys=(), expected_keys=None):
+        self.watch_keys = set(watch_keys)
+        self.expected_keys = set(self.watch_keys if expected_keys is None else expected_keys)
+        self.result = None
+        self._parts = []          # 도착한 텍스트 조각
+        self._part_starts = []    # 조각별 전체 텍스트 기준 시작 위치
+        self._length = 0
+        self._pos = 0             # 다음에 훑을 전체 텍스트 기준 위치
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self._start = None        # 최상위 '{' 위치
+        self._opening = False     # 후보 '{' 다음의 첫 구조 문자를 기다리는 중
+        self._first_key = False   # 후보 객체의 첫 키를 기다리는 중
+        self._depth = 0
+        self._in_string = False
+        self._string_start = None
+        self._last_string = None  # 최상위 객체 안에서 마지막으로 닫힌 문자열 (키 후보)
+        self._key = None
+        self._watching = None     # 현재 원소를 내보내는 중인 배열의 키
+        self._item_start = None
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def feed(self, text):
+        """텍스트 조각을 추가하고 새로 완결된 (키, 원소) 목록 반환"""
+        if self.done or not text:
+            return []
+        self._parts.append(text)
+        self._part_starts.append(self._length)
+        self._length += len(text)
+        return self._scan()
+
+    def close(self):
+        """스트림 종료 시 호출 - 파싱된 최상위 객체(없으면 None) 반환
+
+        끝까지 닫히지 않은 후보(설명 문장 속 짝이 맞지 않는 '{' 등)가 있으면 그 다음 '{'부터 다시 탐색하여,
+        시작 이후로 끝까지 짝이 맞는 객체를 찾는다.
+        """
+        while not self.done and self._start is not None:
+            restart = self._start + 1
+            self._reset_scan()
+            self._pos = restart
+            self._scan()
+        return self.result
+
+    def _slice(self, start, end):
+        """전체 텍스트 기준 [start, end) 구간 (해당 조각만 이어 붙임)"""
+        first = bisect_right(self._part_starts, start) - 1
+        last = bisect_right(self._part_starts, end - 1) - 1
+        if first == last:
+            base = self._part_starts[first]
+            return self._parts[first][start - base:end - base]
+        pieces = [self._parts[first][start - self._part_starts[first]:]]
+        pieces.extend(self._parts[first + 1:last])
+        pieces.append(self._parts[last][:end - self._part_starts[last]])
+        return "".join(pieces)
+
+    def _scan(self):
+        items = []
+        while not self.done and self._pos < self._length:
+            # _pos가 속한 조각부터 조각 단위로 훑음 (실패한 후보를 되짚는 경우 앞 조각으로 돌아갈 수 있음)
+            number = bisect_right(self._part_starts, self._pos) - 1
+            base, text = self._part_starts[number], self._parts[number]
+            restarted = self._scan_part(text, base, items)
+            if not restarted and self._pos < base + len(text):
+                self._pos = base + len(text)
+        return items
+
+    def _scan_part(self, text, base, items):
+        """조각 하나를 훑고, 후보 객체를 버리고 앞쪽에서 다시 시작해야 하면 True 반환"""
+        local = self._pos - base
+        while not self.done:
+            match = _STRUCTURAL.search(text, local)
+            if not match:
+                return False
+            local = match.start() + 1
+            index = base + match.start()
+            char = match.group()
+            self._pos = index + 1
+
+            if self._in_string:
+                if char == '\\':
+                    # 이스케이프 대상 문자는 건너뜀 (다음 조각의 첫 글자일 수도 있음)
+                    local += 1
+                    self._pos += 1
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = (self._string_start, index + 1)
+                    elif self._depth == 2 and self._watching and self._item_start == self._string_start:
+                        items.append((self._watching, json.loads(self._slice(self._item_start, index + 1))))
+                        self._item_start = None
+                continue
+
+            if self._start is None:
+                if char == '{':
+                    self._start = index
+                    self._depth = 1
+                    self._opening = self._first_key = True
+                continue
+
+            if self._opening:
+                # JSON 객체라면 '{' 다음에는 공백 뒤 키의 '"' 또는 빈 객체의 '}'만 올 수 있음
+                self._opening = False
+                if char not in '"}' or (index > self._start + 1 and self._slice(self._start + 1, index).strip()):
+                    return self._restart(self._start + 1)
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+                if self._depth == 2 and self._watching and self._item_start is None:
+                    self._item_start = index
+            elif char == ':' and self._depth == 1 and self._last_string:
+                try:
+                    self._key = json.loads(self._slice(*self._last_string))
+                except ValueError:
+                    self._key = None
+                self._last_string = None
+                if self._first_key:
+                    self._first_key = False
+                    if self.expected_keys and self._key not in self.expected_keys:
+                        return self._restart(self._start + 1)
+            elif char in '{[':
+                if self._depth == 1 and char == '[' and self._key in self.watch_keys:
+                    self._watching = self._key
+                elif self._depth == 2 and self._watching and self._item_start is None:
+                    self._item_start = index
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 2 and self._watching and self._item_start is not None:
+                    try:
+                        items.append((self._watching, json.loads(self._slice(self._item_start, index + 1))))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif self._depth == 1:
+                    self._watching = None
+                elif self._depth == 0:
+                    if self._finish_object(index):
+                        return True
+        return False
+
+    def _finish_object(self, end):
+        """완결된 후보 객체를 파싱하여 결과로 인정하거나, 버리고 다시 탐색할 위치를 정함 (다시 탐색하면 True)"""
+        try:
+            parsed = json.loads(self._slice(self._start, end + 1))
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict) and (not self.expected_keys or self.expected_keys & parsed.keys()):
+            self.result = parsed
+            return False
+        # 예시 객체(기대한 키 없음)는 통째로 건너뛰고, 설명 문장 속 중괄호 등으로 잘못 시작한 경우는 다음 '{'부터 다시 탐색
+        return self._restart(end + 1 if isinstance(parsed, dict) else self._start + 1)
+
+    def _restart(self, position):
+        """현재 후보를 버리고 position부터 다시 탐색 (항상 True)"""
+        self._reset_scan()
+        self._pos = position
+        return True
+
+
+def extract_json_object(text, watch_keys=(), expected_keys=None):
+    """완성된 응답 텍스트에서 최상위 JSON 객체 추출 (없으면 None, expected_keys는 IncrementalJSONExtractor 참고)"""
+    extractor = IncrementalJSONExtractor(watch_keys, expected_keys)
+    extractor.feed(text)
+    return extractor.close()
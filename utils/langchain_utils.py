@@ -1,23 +1,283 @@
 import os
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.load import dumps, loads
+from utils.client_pool import get_resource, get_chat_client
 
 
 load_dotenv()
 
-# LangChain Azure OpenAI 클라이언트 설정
-@st.cache_resource
-def init_langchain_client(llm_name, temp):
+# 동일한 프롬프트의 LLM 응답을 재사용하는 로컬 캐시 (모든 페이지/세션 공유)
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_responses.sqlite3")
+)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 100 * 1024 * 1024))
+LLM_CACHE_EVICT_INTERVAL = 50    # 저장 N회마다 만료/용량 초과 항목 정리
+
+# 스트리밍 응답 표시 주기 (토큰마다 다시 그리지 않도록 제한)
+STREAM_RENDER_INTERVAL_SECONDS = 0.1
+
+
+class SQLiteResponseCache(BaseCache):
+    """배포 이름 + temperature + 메시지 해시를 키로 하는 SQLite 응답 캐시
+
+    LangChain의 cache 확장 지점으로 연결되므로 llm.invoke 호출부는 바꿀 필요가 없다.
+    TTL이 지난 항목은 조회되지 않으며, 전체 크기가 max_bytes를 넘으면 오래 사용되지 않은 항목부터 삭제한다.
+    """
+
+    def __init__(self, deployment, temperature, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.deployment = deployment
+        self.temperature = temperature
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, deployment TEXT, temperature REAL, value TEXT, "
+                "size INTEGER, created REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # Streamlit 스크립트 스레드마다 호출되므로 연결은 호출 단위로 열고 닫는다
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _key(self, prompt, llm_string):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.deployment, self.temperature]).encode("utf-8"))
+        digest.update(llm_string.encode("utf-8"))
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value FROM llm_cache WHERE key = ? AND created > ?", (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"LLM 응답 캐시 조회 실패: {e}")
+            return None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return loads(row[0]) if row else None
+
+    def update(self, prompt, llm_string, return_val):
+        value = dumps(list(return_val))
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self._key(prompt, llm_string), self.deployment, self.temperature, value, len(value), now, now)
+                )
+        except sqlite3.Error as e:
+            print(f"LLM 응답 캐시 저장 실패: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % LLM_CACHE_EVICT_INTERVAL == 1
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """TTL이 지난 항목을 지우고, 용량 상한을 넘으면 마지막 사용 시각이 오래된 순으로 삭제"""
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache WHERE created <= ?", (time.time() - self.ttl_seconds,))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed").fetchall()
+                    stale = []
+                    for key, size in rows:
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale)
+        except sqlite3.Error as e:
+            print(f"LLM 응답 캐시 정리 실패: {e}")
+
+    def clear(self, **kwargs):
+        """이 배포/temperature 조합의 캐시 항목 삭제"""
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache WHERE deployment = ? AND temperature = ?", (self.deployment, self.temperature))
+        except sqlite3.Error as e:
+            print(f"LLM 응답 캐시 삭제 실패: {e}")
+
+
+# LangChain Azure OpenAI 클라이언트 설정 (프로세스 공용 레지스트리에서 재사용, HTTP 연결 풀 공유)
+def init_langchain_client(llm_name, temp, use_cache=True):
+    """Azure OpenAI 채팅 클라이언트 반환 (use_cache=True이면 동일 요청의 응답을 SQLite 캐시에서 재사용)"""
     try:
-        llm = AzureChatOpenAI(
-            azure_deployment=llm_name,
-            api_version=os.getenv("OPENAI_API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=temp
-        )
-        return llm
+        # 응답 캐시와 클라이언트 조회를 한 번의 요청으로 묶어 재사용 통계를 호출 단위로 셈
+        return get_resource(("langchain_client", llm_name, temp, use_cache),
+                            lambda: _create_langchain_client(llm_name, temp, use_cache))
     except Exception as e:
         st.error(f"LangChain Azure OpenAI 연결 실패: {str(e)}")
         return None
+
+
+def _create_langchain_client(llm_name, temp, use_cache):
+    cache = None
+    if use_cache:
+        try:
+            cache = get_resource(("response_cache", llm_name, temp), lambda: SQLiteResponseCache(llm_name, temp))
+        except (OSError, sqlite3.Error) as e:
+            print(f"LLM 응답 캐시 초기화 실패, 캐시 없이 진행합니다: {e}")
+
+    return get_chat_client(
+        llm_name,
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=temp,
+        cache=cache,
+        stream_usage=True  # 스트리밍 응답에도 usage(입력/캐시된 입력 토큰 수) 포함
+    )
+
+
+class _TokenStreamHandler(BaseCallbackHandler):
+    """llm.invoke(..., stream=True)가 받는 토큰을 콜백으로 전달"""
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+
+    def on_llm_new_token(self, token, **kwargs):
+        if token:
+            self.on_token(token)
+
+
+def stream_llm_response(llm, messages, stage, language="json", on_text=None, show_preview=True, response_format=None):
+    """llm.invoke(stream=True)로 응답을 받아 도착하는 대로 화면에 표시하고, 완성된 메시지(.content)를 반환
+
+    stage별 첫 토큰까지의 시간(TTFT), 전체 응답 시간, 입력 토큰 중 provider 프롬프트 캐시에서 읽은 토큰 수를
+    st.session_state["llm_stage_timings"]에 기록한다.
+    language가 None이면 마크다운으로, 아니면 해당 언어의 코드 블록으로 표시하며 완료 후 미리보기는 지운다.
+    on_text는 도착한 텍스트 조각마다 호출된다 (캐시 적중 시에는 전체 응답으로 한 번 호출).
+    response_format(예: {"type": "json_object"})을 지정하면 구조화된 출력으로 요청하며 캐시 키에도 포함된다.
+    캐시 조회/저장은 LangChain 기본 경로(init_langchain_client의 응답 캐시)에 맡기므로, 캐시 적중 시에도
+    콜백(Langfuse 등)이 그대로 실행되고 토큰 없이 완성된 응답이 바로 반환된다.
+    """
+    started = time.monotonic()
+    placeholder = st.empty()
+    state = {"text": "", "first_token_at": None, "last_render": 0.0}
+
+    def on_token(token):
+        now = time.monotonic()
+        if state["first_token_at"] is None:
+            state["first_token_at"] = now
+        state["text"] += token
+        if on_text:
+            on_text(token)
+        if show_preview and now - state["last_render"] >= STREAM_RENDER_INTERVAL_SECONDS:
+            _render_partial(placeholder, state["text"], language)
+            state["last_render"] = now
+
+    kwargs = {"response_format": response_format} if response_format else {}
+    message = llm.invoke(
+        messages,
+        config={"callbacks": [_TokenStreamHandler(on_token)], "run_name": stage},
+        stream=True,  # 캐시에 없으면 스트리밍 API로 요청 (토큰은 on_llm_new_token으로 전달)
+        **kwargs
+    )
+    placeholder.empty()
+    finished = time.monotonic()
+
+    # 토큰이 하나도 오지 않고 응답이 있으면 캐시에서 가져온 응답
+    if state["first_token_at"] is None and message.content:
+        _record_stage_timing(stage, finished - started, finished - started, len(message.content), cached=True)
+        if on_text:
+            on_text(message.content)
+        return message
+
+    _record_stage_timing(stage, (state["first_token_at"] or finished) - started, finished - started, len(message.content),
+                         usage=prompt_token_usage([message]))
+    return message
+
+
+def _render_partial(placeholder, text, language):
+    if language:
+        placeholder.code(text + " ▌", language=language)
+    else:
+        placeholder.markdown(text + " ▌")
+
+
+def prompt_token_usage(messages):
+    """응답 메시지들의 (입력 토큰 수, provider 프롬프트 캐시에서 읽은 입력 토큰 수) 합계
+
+    usage 정보가 없는 응답(예외, 이전 버전 캐시 항목 등)은 0으로 센다.
+    """
+    input_tokens = cached_tokens = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None) or {}
+        input_tokens += usage.get("input_tokens") or 0
+        cached_tokens += (usage.get("input_token_details") or {}).get("cache_read") or 0
+    return input_tokens, cached_tokens
+
+
+def record_prompt_usage(stage, messages):
+    """동시 요청(abatch 등)으로 받은 응답들의 입력/캐시 토큰 수를 단계별로 기록 및 표시"""
+    input_tokens, cached_tokens = prompt_token_usage(messages)
+    st.session_state.setdefault("llm_stage_timings", {}).setdefault(stage, {}).update(
+        input_tokens=input_tokens, cached_input_tokens=cached_tokens
+    )
+    if input_tokens:
+        st.caption(f"🧾 {_format_prompt_usage(input_tokens, cached_tokens)}")
+
+
+def _format_prompt_usage(input_tokens, cached_tokens):
+    return f"입력 {input_tokens:,}토큰 중 프롬프트 캐시 {cached_tokens:,}토큰 ({cached_tokens / input_tokens * 100:.0f}%)"
+
+
+def _record_stage_timing(stage, ttft, total, chars, cached=False, usage=(0, 0)):
+    """단계별 응답 시간과 입력/캐시 토큰 수 기록 및 표시"""
+    input_tokens, cached_tokens = usage
+    st.session_state.setdefault("llm_stage_timings", {})[stage] = {
+        "ttft_seconds": ttft,
+        "total_seconds": total,
+        "chars": chars,
+        "cached": cached,
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached_tokens,
+    }
+    if cached:
+        st.caption(f"⚡ 캐시된 응답 사용 ({total:.2f}초)")
+    elif input_tokens:
+        st.caption(f"⏱️ 첫 토큰 {ttft:.1f}초 · 전체 {total:.1f}초 · {chars}자 · "
+                   f"{_format_prompt_usage(input_tokens, cached_tokens)}")
+    else:
+        st.caption(f"⏱️ 첫 토큰 {ttft:.1f}초 · 전체 {total:.1f}초 · {chars}자")
@@ -0,0 +1,121 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+import streamlit as st
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# 검색 도구(help_uiux 가이드라인 검색, web_search 웹 검색) 결과를 질문 단위로 재사용하는 프로세스 공용 TTL 캐시
+# 디자이너들이 거의 같은 질문을 반복하므로, 대소문자/공백/끝 문장부호만 다른 질문은 같은 키로 보고 검색을 다시 하지 않는다.
+# 가이드라인 색인은 거의 바뀌지 않아 TTL을 길게, 웹 검색 결과는 최신성이 중요해 짧게 두며,
+# 두 캐시 모두 항목 수와 바이트 수 상한을 넘으면 가장 오래 사용하지 않은 항목부터 버린다.
+
+UIUX_QUERY_CACHE_TTL_SECONDS = float(os.getenv("UIUX_QUERY_CACHE_TTL_SECONDS", 24 * 60 * 60))
+WEB_QUERY_CACHE_TTL_SECONDS = float(os.getenv("WEB_QUERY_CACHE_TTL_SECONDS", 10 * 60))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 256))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 8 * 1024 * 1024))   # 캐시별 (웹 결과는 원문 포함이라 큼)
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?？!！.。~]+$")
+
+
+def normalize_query(query):
+    """캐시 키용 질문 정규화 (유니코드 NFKC, 소문자, 공백 하나로, 끝 문장부호 제거)"""
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = " ".join(query.split())
+    return _TRAILING_PUNCTUATION.sub("", query)
+
+
+class TTLQueryCache:
+    """정규화한 질문 → 검색 결과 문자열 LRU 캐시 (TTL, 항목 수, 바이트 수 상한)"""
+
+    def __init__(self, name, ttl_seconds, max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key → (만료 시각, 바이트 수, 값), 최근 사용한 항목이 뒤
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, query):
+        """캐시된 결과 (없거나 만료되었으면 None)"""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[2]
+
+    def put(self, query, value):
+        """결과 저장 (혼자서 바이트 상한을 넘는 결과는 저장하지 않음)"""
+        key = normalize_query(query)
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def get_or_compute(self, query, compute):
+        """캐시된 결과가 없으면 compute()로 구해서 저장 (예외는 저장하지 않고 그대로 전달)"""
+        value = self.get(query)
+        if value is None:
+            value = compute()
+            self.put(query, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+uiux_query_cache = TTLQueryCache("UI/UX 가이드라인 검색", UIUX_QUERY_CACHE_TTL_SECONDS)
+web_query_cache = TTLQueryCache("웹 검색", WEB_QUERY_CACHE_TTL_SECONDS)
+_caches = (uiux_query_cache, web_query_cache)
+
+
+def render_query_cache_stats():
+    """검색 캐시별 적중률/항목 수 표시"""
+    for cache in _caches:
+        stats = cache.stats()
+        st.caption(f"{cache.name} (TTL {_format_ttl(cache.ttl_seconds)})")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("적중률", f"{stats['hit_rate'] * 100:.0f}%")
+        col2.metric("적중", f"{stats['hits']:,}회")
+        col3.metric("미스", f"{stats['misses']:,}회", help=f"그중 만료 {stats['expired']:,}회")
+        col4.metric("저장 항목", f"{stats['entries']:,}개",
+                    help=f"{stats['bytes'] / 1024:,.0f}KB / {cache.max_bytes / 1024:,.0f}KB, "
+                         f"상한 초과로 버린 항목 {stats['evictions']:,}개")
+
+
+def _format_ttl(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:g}시간"
+    if seconds >= 60:
+        return f"{seconds / 60:g}분"
+    return f"{seconds:g}초"
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.rag_ingest import RAG_DOCS_DIR, load_manifest, manifest_chunks, manifest_fingerprint
+
+# rag-docs 문서를 대상으로 하는 로컬 BM25 검색 (네트워크 호출 없음)
+# utils.rag_ingest가 적재한 구간으로 역색인을 만들어 .cache에 저장하며, 문서 내용 해시가 바뀌면 바뀐 구간만 다시 토큰화하여 갱신한다.
+# 한국어는 조사를 떼어낸 어절과 음절 bigram으로, 영어는 소문자 단어로 색인하여 "버튼을"/"버튼", "타이포"/"타이포그래피"가 서로 검색된다.
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAG_BM25_INDEX_PATH = os.getenv("RAG_BM25_INDEX_PATH", os.path.join(_ROOT, ".cache", "rag_bm25_index.json"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+|[가-힣]+")
+# 긴 조사부터 비교 (어간이 두 글자 이상 남을 때만 떼어냄)
+_JOSA = sorted(
+    ("으로써", "으로서", "에서는", "에게서", "이라는", "으로", "에서", "에게", "까지", "부터", "처럼", "보다", "라는",
+     "이나", "과의", "와의", "하는", "하고", "의", "은", "는", "이", "가", "을", "를", "에", "와", "과", "도", "만", "로"),
+    key=len, reverse=True
+)
+_ENGLISH_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "is", "are", "be", "as", "at",
+    "it", "its", "this", "that", "from", "can", "should", "how", "what", "when", "do", "does", "i", "you", "my",
+}
+
+
+def tokenize(text):
+    """검색어/문서 공통 토큰화 (영어: 소문자 단어, 한국어: 조사를 뗀 어절 + 음절 bigram)"""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if word.isascii():
+            if word not in _ENGLISH_STOPWORDS and len(word) > 1:
+                # 복수형 s만 정규화 (status, class처럼 s로 끝나는 단어는 유지)
+                tokens.append(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")) else word)
+            continue
+        stem = _strip_josa(word)
+        tokens.append(stem)
+        if len(stem) > 2:
+            tokens.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return tokens
+
+
+def _strip_josa(word):
+    for josa in _JOSA:
+        if word.endswith(josa) and len(word) - len(josa) >= 2:
+            return word[:-len(josa)]
+    return word
+
+
+class BM25Index:
+    """구간(chunk) 목록에 대한 BM25 역색인 (term → [(구간 번호, 빈도)])"""
+
+    def __init__(self, chunks, postings, lengths, fingerprint=None):
+        self.chunks = chunks
+        self.postings = postings
+        self.lengths = lengths
+        self.fingerprint = fingerprint or {}
+        # 검색마다 다시 계산하지 않도록 idf와 문서 길이 정규화 값을 미리 계산
+        count = len(lengths)
+        average = sum(lengths) / count if count else 0
+        self._idf = {
+            term: math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5)) for term, posting in postings.items()
+        }
+        self._norm = [BM25_K1 * (1 - BM25_B + BM25_B * length / average) if average else BM25_K1 for length in lengths]
+
+    @classmethod
+    def build(cls, chunks, fingerprint=None, previous=None):
+        """chunks: [{"text", "source", "heading"}]
+
+        previous(이전 색인)에 같은 텍스트의 구간이 있으면 다시 토큰화하지 않고 그 빈도를 재사용한다.
+        (문서 하나가 바뀌면 그 문서의 구간만 토큰화하고, idf/길이 정규화는 전체 구간으로 다시 계산)
+        """
+        reusable = previous.term_counts_by_text() if previous is not None else {}
+        postings, lengths = {}, []
+        for number, chunk in enumerate(chunks):
+            counts = reusable.get(chunk["text"]) or Counter(tokenize(chunk["text"]))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                postings.setdefault(term, []).append((number, frequency))
+        return cls(chunks, postings, lengths, fingerprint)
+
+    def term_counts_by_text(self):
+        """{구간 텍스트: {term: 빈도}} - 역색인에서 구간별 빈도를 복원"""
+        counts = [{} for _ in self.chunks]
+        for term, posting in self.postings.items():
+            for number, frequency in posting:
+                counts[number][term] = frequency
+        return {chunk["text"]: counts[number] for number, chunk in enumerate(self.chunks)}
+
+    def search(self, query, k=3):
+        """[(점수, 구간)] 점수 내림차순 상위 k개"""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for number, frequency in self.postings[term]:
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + self._norm[number])
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[number]) for number, score in top]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": BM25_INDEX_VERSION,
+                "fingerprint": self.fingerprint,
+                "chunks": self.chunks,
+                "postings": self.postings,
+                "lengths": self.lengths,
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != BM25_INDEX_VERSION:
+            raise ValueError("색인 형식 버전이 다릅니다")
+        postings = {term: [tuple(entry) for entry in posting] for term, posting in data["postings"].items()}
+        return cls(data["chunks"], postings, data["lengths"], data["fingerprint"])
+
+
+class LocalBM25Retriever(BaseRetriever):
+    """rag-docs BM25 색인을 사용하는 LangChain retriever (AzureAISearchRetriever 대신 체인에 그대로 연결)"""
+
+    index: Any
+    k: int = 3
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [
+            Document(page_content=chunk["text"], metadata={"source": chunk["source"], "heading": chunk["heading"], "score": score})
+            for score, chunk in self.index.search(query, self.k)
+        ]
+
+
+_cached_index = None
+_cache_lock = threading.Lock()
+
+
+def get_local_retriever(k=3, docs_dir=RAG_DOCS_DIR, index_path=RAG_BM25_INDEX_PATH):
+    """rag-docs 로컬 검색 retriever (색인은 프로세스에서 한 번 읽고, 적재 기록이 바뀐 경우에만 다시 만듦)"""
+    return LocalBM25Retriever(index=load_bm25_index(docs_dir, index_path), k=k)
+
+
+def load_bm25_index(docs_dir=RAG_DOCS_DIR, index_path=RAG_BM25_INDEX_PATH):
+    """저장된 색인이 적재 기록과 같으면 재사용하고, 아니면 색인을 갱신 (문서 적재는 python -m utils.rag_ingest)"""
+    manifest = load_manifest(docs_dir)
+    return update_bm25_index(manifest, index_path)
+
+
+def update_bm25_index(manifest, index_path=RAG_BM25_INDEX_PATH):
+    """적재 기록(utils.rag_ingest)과 색인의 fingerprint가 다르면 다시 만들어 저장"""
+    global _cached_index
+    fingerprint = manifest_fingerprint(manifest)
+    with _cache_lock:
+        if _cached_index is not None and _cached_index.fingerprint == fingerprint:
+            return _cached_index
+
+        index = _cached_index
+        if index is None and os.path.exists(index_path):
+            try:
+                index = BM25Index.load(index_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"BM25 색인 로드 실패, 다시 만듭니다: {e}")
+        if index is None or index.fingerprint != fingerprint:
+            index = BM25Index.build(manifest_chunks(manifest), fingerprint, previous=index)
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print(f"BM25 색인 저장 실패: {e}")
+        _cached_index = index
+        return index
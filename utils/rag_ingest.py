@@ -0,0 +1,297 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+
+# rag-docs 문서 적재: 텍스트 추출(마크다운/텍스트/PDF) → 구간 분할(크기/겹침 설정) → 파일별 내용 해시 기록
+# 결과는 .cache/rag_manifest.json에 파일별 {sha256, 크기, 수정 시각, 구간 목록}으로 저장한다.
+# 다시 실행하면 크기/수정 시각이 같은 파일은 읽지 않고, 달라졌어도 내용 해시가 같으면 건너뛰며,
+# 새 파일과 내용이 바뀐 파일만 텍스트를 추출하고 다시 나눈다. BM25 색인과 벡터 저장소는 이 구간 목록으로 갱신한다.
+# 적재는 아래 명령(앱 시작 스크립트 streamlit.sh에서도 실행)으로만 하고, 검색 경로는 load_manifest로 기록 파일의 수정 시각만 확인한다.
+#   python -m utils.rag_ingest            # 바뀐 문서만 다시 적재하고 BM25 색인 갱신
+#   python -m utils.rag_ingest --vectors  # 벡터 저장소도 갱신 (바뀐 구간만 임베딩)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAG_DOCS_DIR = os.getenv("RAG_DOCS_DIR", os.path.join(_ROOT, "rag-docs"))
+RAG_MANIFEST_PATH = os.getenv("RAG_MANIFEST_PATH", os.path.join(_ROOT, ".cache", "rag_manifest.json"))
+RAG_TEXT_SUFFIXES = {".md", ".txt", ""}   # 확장자 없는 파일도 텍스트로 취급
+RAG_PDF_SUFFIXES = {".pdf"}               # pypdf가 설치되어 있을 때만 적재
+RAG_CHUNK_CHARS = int(os.getenv("RAG_CHUNK_CHARS", 1200))     # 구간의 최대 길이 (겹침 제외)
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", 150))  # 앞 구간 끝부분을 다음 구간 앞에 반복하는 길이
+MANIFEST_VERSION = 1
+
+_HEADING = re.compile(r"^#{1,6}\s+(.*)$", re.M)
+
+_cached_manifests = {}
+_manifest_mtimes = {}   # manifest_path → 캐시한 기록을 읽거나 쓴 시점의 파일 수정 시각
+_cache_lock = threading.Lock()
+_warned_missing_pdf = False
+
+
+def ingest(docs_dir=RAG_DOCS_DIR, manifest_path=RAG_MANIFEST_PATH,
+           chunk_chars=RAG_CHUNK_CHARS, chunk_overlap=RAG_CHUNK_OVERLAP, full=False):
+    """rag-docs를 적재하고 (manifest, 변경 내역) 반환
+
+    변경 내역: {"added": [...], "updated": [...], "removed": [...], "unchanged": [...]}
+    full=True이면 해시와 관계없이 모든 문서를 다시 추출/분할한다.
+    """
+    if not 0 <= chunk_overlap < chunk_chars:
+        raise ValueError(f"구간 겹침({chunk_overlap})은 0 이상, 구간 길이({chunk_chars}) 미만이어야 합니다")
+    settings = {"docs_dir": os.path.abspath(docs_dir), "chunk_chars": chunk_chars, "chunk_overlap": chunk_overlap}
+
+    with _cache_lock:
+        previous = _cached_manifests.get(manifest_path) or _load_manifest(manifest_path)
+        if full or previous is None or previous["settings"] != settings:
+            previous_files = {}
+        else:
+            previous_files = previous["files"]
+
+        files, changes = {}, {"added": [], "updated": [], "removed": [], "unchanged": []}
+        dirty = previous is None or previous_files is not previous["files"]
+        for name, path in _doc_paths(docs_dir):
+            stat = os.stat(path)
+            entry = previous_files.get(name)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                files[name] = entry
+                changes["unchanged"].append(name)
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+            sha256 = hashlib.sha256(data).hexdigest()
+            dirty = True
+            if entry and entry["sha256"] == sha256:
+                # 수정 시각만 바뀐 경우 (복사/체크아웃 등) - 다시 나누지 않고 기록만 갱신
+                files[name] = {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                changes["unchanged"].append(name)
+                continue
+
+            try:
+                pages = extract_text(name, data)
+            except ImportError:
+                _warn_missing_pdf()
+                continue
+            except Exception as e:
+                # 손상된 PDF 등은 빈 문서로 기록하여 내용이 바뀔 때까지 다시 시도하지 않음
+                print(f"문서 텍스트 추출 실패 ({name}): {e}")
+                pages = []
+            files[name] = {
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "chunks": [
+                    {"text": body, "source": name, "heading": heading}
+                    for page_heading, text in pages
+                    for heading, body in split_sections(text, chunk_chars, chunk_overlap, page_heading)
+                ],
+            }
+            changes["updated" if entry else "added"].append(name)
+
+        changes["removed"] = sorted(set(previous_files) - set(files))
+        manifest = {"version": MANIFEST_VERSION, "settings": settings, "files": files}
+        if dirty or changes["removed"]:
+            _save_manifest(manifest_path, manifest)
+        _cached_manifests[manifest_path] = manifest
+        _manifest_mtimes[manifest_path] = _mtime_ns(manifest_path)
+        return manifest, changes
+
+
+def load_manifest(docs_dir=RAG_DOCS_DIR, manifest_path=RAG_MANIFEST_PATH):
+    """검색 경로에서 사용하는 적재 기록 (문서 폴더는 훑지 않고 기록 파일의 수정 시각만 확인)
+
+    다른 프로세스(python -m utils.rag_ingest)가 기록을 갱신했으면 다시 읽고, 기록이 없거나
+    다른 문서 폴더의 기록이면 그때 한 번만 적재한다.
+    """
+    mtime_ns = _mtime_ns(manifest_path)
+    with _cache_lock:
+        manifest = _cached_manifests.get(manifest_path)
+        if manifest is None or _manifest_mtimes.get(manifest_path) != mtime_ns:
+            manifest = _load_manifest(manifest_path) if mtime_ns is not None else None
+            if manifest is not None:
+                _cached_manifests[manifest_path] = manifest
+                _manifest_mtimes[manifest_path] = mtime_ns
+        if manifest is not None and manifest["settings"]["docs_dir"] == os.path.abspath(docs_dir):
+            return manifest
+    return ingest(docs_dir, manifest_path)[0]
+
+
+def manifest_chunks(manifest):
+    """적재된 모든 구간 [{"text", "source", "heading"}] (파일 이름 순)"""
+    return [chunk for name in sorted(manifest["files"]) for chunk in manifest["files"][name]["chunks"]]
+
+
+def manifest_fingerprint(manifest):
+    """색인이 최신인지 비교하는 값 (구간 분할 설정 + 파일별 내용 해시)"""
+    settings = manifest["settings"]
+    return {
+        "chunking": [settings["chunk_chars"], settings["chunk_overlap"]],
+        "files": {name: entry["sha256"] for name, entry in manifest["files"].items()},
+    }
+
+
+def extract_text(name, data):
+    """파일 내용에서 [(쪽 제목, 텍스트)] 추출 (텍스트 파일은 한 덩어리, PDF는 쪽 단위)"""
+    if os.path.splitext(name)[1].lower() in RAG_PDF_SUFFIXES:
+        return _extract_pdf_text(data)
+    return [("", data.decode("utf-8", errors="replace").replace("\r\n", "\n"))]
+
+
+def _extract_pdf_text(data):
+    from pypdf import PdfReader
+
+    # 글꼴 인코딩 경고가 쪽마다 출력되므로 오류만 남김
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+    pages = []
+    for number, page in enumerate(PdfReader(io.BytesIO(data)).pages, start=1):
+        text = (page.extract_text() or "").replace("\xa0", " ")
+        text = "\n".join(line.rstrip() for line in text.splitlines()).strip()
+        if text:
+            pages.append((f"p.{number}", text))
+    return pages
+
+
+def split_sections(text, max_chars=RAG_CHUNK_CHARS, overlap=0, default_heading=""):
+    """마크다운 제목 단위로 나눈 [(제목, 본문)]
+
+    긴 구간은 문단(문단도 길면 줄, 줄도 길면 글자) 단위로 max_chars 이하로 나누고,
+    다음 구간 앞에 이전 구간의 마지막 overlap자를 붙여 경계에 걸친 내용도 검색되게 한다.
+    """
+    starts = [match.start() for match in _HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        section = text[start:end].strip()
+        if not section:
+            continue
+        heading = _HEADING.match(section)
+        title = heading.group(1).strip() if heading else default_heading
+        current = ""
+        for separator, piece in _section_pieces(section, max_chars):
+            if current and len(current) + len(separator) + len(piece) > max_chars:
+                sections.append((title, current))
+                current = _overlap_tail(current, overlap)
+            current = f"{current}{separator}{piece}" if current else piece
+        if current:
+            sections.append((title, current))
+    return sections
+
+
+def _section_pieces(section, max_chars):
+    """[(앞 구분자, 조각)] - 문단 단위, max_chars보다 긴 문단(줄바꿈만 있는 PDF 쪽 등)은 단어 단위로 쪼갬"""
+    for paragraph in re.split(r"\n\s*\n", section):
+        if len(paragraph) <= max_chars:
+            yield "\n\n", paragraph
+            continue
+        separator = "\n\n"
+        for line in paragraph.split("\n"):
+            for word in line.split():
+                # max_chars보다 긴 단어(URL 등)는 글자 단위로 자르고 구분자 없이 이어 붙임
+                for start in range(0, len(word), max_chars):
+                    yield (separator if start == 0 else ""), word[start:start + max_chars]
+                separator = " "
+            separator = "\n" if separator == " " else separator
+
+
+def _overlap_tail(text, overlap):
+    """구간 끝의 overlap자 (단어 중간에서 시작하지 않도록 첫 공백 뒤부터)"""
+    if overlap <= 0:
+        return ""
+    tail = text[-overlap:]
+    if len(text) > overlap:
+        cut = re.search(r"\s", tail)
+        tail = tail[cut.end():] if cut else tail
+    return tail.strip()
+
+
+def _doc_paths(docs_dir):
+    suffixes = RAG_TEXT_SUFFIXES | RAG_PDF_SUFFIXES
+    for name in sorted(os.listdir(docs_dir)) if os.path.isdir(docs_dir) else []:
+        path = os.path.join(docs_dir, name)
+        if os.path.isfile(path) and not name.startswith(".") and os.path.splitext(name)[1].lower() in suffixes:
+            yield name, path
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError) as e:
+        print(f"적재 기록 로드 실패, 모든 문서를 다시 적재합니다: {e}")
+    return None
+
+
+def _save_manifest(path, manifest):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"적재 기록 저장 실패: {e}")
+
+
+def _warn_missing_pdf():
+    global _warned_missing_pdf
+    if not _warned_missing_pdf:
+        print("pypdf가 설치되어 있지 않아 PDF 문서를 건너뜁니다 (pip install pypdf)")
+        _warned_missing_pdf = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="rag-docs 문서를 적재하고 바뀐 문서만 다시 색인합니다.")
+    parser.add_argument("--docs-dir", default=RAG_DOCS_DIR)
+    parser.add_argument("--chunk-chars", type=int, default=RAG_CHUNK_CHARS,
+                        help="구간 최대 길이 (앱과 같은 값을 쓰도록 RAG_CHUNK_CHARS 환경변수로 설정하는 것을 권장)")
+    parser.add_argument("--chunk-overlap", type=int, default=RAG_CHUNK_OVERLAP,
+                        help="구간 겹침 길이 (RAG_CHUNK_OVERLAP 환경변수와 같은 값 권장)")
+    parser.add_argument("--full", action="store_true", help="내용 해시와 관계없이 모든 문서를 다시 적재")
+    parser.add_argument("--vectors", action="store_true", help="벡터 저장소도 갱신 (RAG_EMBEDDER 임베더 사용)")
+    args = parser.parse_args(argv)
+
+    from utils.rag_index import RAG_BM25_INDEX_PATH, update_bm25_index
+
+    started = time.perf_counter()
+    manifest, changes = ingest(args.docs_dir, chunk_chars=args.chunk_chars, chunk_overlap=args.chunk_overlap,
+                               full=args.full)
+    for status, label in (("added", "추가"), ("updated", "변경"), ("removed", "삭제")):
+        for name in changes[status]:
+            print(f"[{label}] {name}")
+    chunk_count = sum(len(entry["chunks"]) for entry in manifest["files"].values())
+    print(f"문서 {len(manifest['files'])}개 (변경 없음 {len(changes['unchanged'])}개), 구간 {chunk_count}개 "
+          f"- 적재 {time.perf_counter() - started:.2f}초")
+
+    started = time.perf_counter()
+    update_bm25_index(manifest, RAG_BM25_INDEX_PATH)
+    print(f"BM25 색인 갱신 {time.perf_counter() - started:.2f}초")
+
+    if args.vectors:
+        from utils.vector_store import RAG_VECTOR_STORE_DIR, create_embedder, update_vector_store
+
+        started = time.perf_counter()
+        embedder, embedder_name = create_embedder()
+        store = update_vector_store(manifest, embedder, embedder_name, RAG_VECTOR_STORE_DIR)
+        print(f"벡터 저장소 갱신 ({embedder_name}, 새로 임베딩한 구간 {store.embedded_count}개) "
+              f"{time.perf_counter() - started:.2f}초")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
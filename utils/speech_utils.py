@@ -1,18 +1,91 @@
 from dotenv import load_dotenv
 import os
+import json
+import hashlib
 import streamlit as st
 import azure.cognitiveservices.speech as speechsdk
 from langchain_openai import AzureChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
-import tempfile
 import wave
 import io
+import glob
+import mmap
+import struct
+import time
+import random
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from utils.transcript import Transcript
 
 # 회의록을 WAV 음성 파일로 업로드할 수 있도록 하는 speech 관련 함수를 모아 놓은 모듈
 # Azure Speech Service는 WAV 형식에서 가장 안정적인 성능을 제공합니다.
 
 llm_name = os.getenv("AZURE_OPENAI_LLM_4o")
 
+# 긴 회의 녹음을 무음 경계에서 분할하여 병렬로 인식하기 위한 설정
+SEGMENT_TARGET_SECONDS = 60      # 세그먼트 목표 길이
+SEGMENT_SEARCH_SECONDS = 15      # 목표 지점 전후로 무음 경계를 찾는 범위
+ENERGY_FRAME_SECONDS = 0.03      # 에너지 계산 프레임 길이 (30ms)
+ENERGY_SMOOTH_SECONDS = 0.3      # 단어 중간에서 잘리지 않도록 에너지를 평활화하는 구간
+MAX_PARALLEL_RECOGNIZERS = 4     # 동시에 실행할 SpeechRecognizer 수
+PUSH_BLOCK_BYTES = 64 * 1024     # Push 스트림에 한 번에 쓰는 바이트 수
+ANALYSIS_BLOCK_SECONDS = 10      # 에너지 분석 시 한 번에 float로 변환하는 구간 (메모리 상한)
+TICKS_PER_SECOND = 10_000_000    # Azure Speech offset 단위 (100ns)
+
+# 장시간 녹음 스트리밍 처리 (녹음 길이와 관계없이 구간 단위로 정규화/인식하여 처리 중 사본 크기를 구간 크기로 제한)
+STREAM_WINDOW_SECONDS = 20 * 60                   # 한 번에 정규화/무음 압축/인식하는 구간 길이
+STREAM_WINDOW_SEARCH_SECONDS = 30                 # 구간 경계를 무음에 맞추기 위한 탐색 범위
+
+# 연속 인식 제한 시간 = WAV 길이 * 배수 + 여유 시간 (고정 상한 없음)
+RECOGNITION_TIMEOUT_FACTOR = 2
+RECOGNITION_TIMEOUT_MARGIN = 30
+PROGRESS_INTERVAL_SECONDS = 0.5  # 진행 표시 갱신 주기 (종료는 이벤트로 즉시 감지)
+
+# 오디오 해시 기반 변환 결과 캐시 (모든 페이지/세션 공유, 크기 초과 시 오래 사용되지 않은 항목부터 삭제)
+TRANSCRIPT_CACHE_DIR = os.getenv(
+    "TRANSCRIPT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "transcripts")
+)
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+TRANSCRIPT_CACHE_VERSION = 2     # 인식 결과 형식이 바뀌면 올려서 기존 캐시 무효화 (2: 발화별 offset/길이/신뢰도)
+HASH_BLOCK_BYTES = 4 * 1024 * 1024
+
+# 세그먼트 단위 체크포인트 (재실행/새로고침 후 같은 녹음을 올리면 이어서 처리)
+TRANSCRIPT_JOB_DIR = os.path.join(TRANSCRIPT_CACHE_DIR, "jobs")
+TRANSCRIPT_JOB_MAX_AGE_SECONDS = 7 * 24 * 3600
+SEGMENT_MAX_ATTEMPTS = 4         # 세그먼트당 최대 시도 횟수
+SEGMENT_RETRY_BASE_SECONDS = 2   # 재시도 대기 시간 (지수 증가 + 지터)
+NON_RETRYABLE_ERRORS = ("authentication", "unauthorized", "forbidden", "invalid subscription")
+
+# 인식 전 오디오 정규화 (Azure Speech 최적 입력: 16kHz, 모노, 16-bit PCM)
+NORMALIZE_TARGET_RATE = 16000
+NORMALIZE_FILTER_TAPS = 63       # 다운샘플링 앨리어싱 방지용 저역통과 필터 길이
+NORMALIZE_CUTOFF_MARGIN = 0.9    # 목표 나이퀴스트 주파수 대비 차단 주파수 비율
+
+# 에너지/영교차율 기반 음성 구간 검출(VAD) - 긴 무음을 짧은 간격으로 압축
+VAD_MIN_SILENCE_SECONDS = 1.0    # 이보다 긴 무음만 압축
+VAD_KEEP_SILENCE_SECONDS = 0.3   # 압축 후 남겨두는 무음 길이 (발화 앞뒤로 절반씩)
+VAD_NOISE_PERCENTILE = 10        # 잡음 바닥으로 사용할 프레임 에너지 백분위
+VAD_ENERGY_MARGIN_DB = 10        # 잡음 바닥 대비 음성으로 판단하는 에너지 차이
+VAD_PEAK_MARGIN_DB = 20          # 무음이 거의 없는 녹음에서 임계값 상한 (상위 5% 에너지 대비)
+VAD_ZCR_MARGIN_DB = 4            # 무성음(ㅅ, ㅎ 등) 판단용 낮은 에너지 차이
+VAD_ZCR_THRESHOLD = 0.2          # 무성음 판단용 영교차율
+
+# 인식 전 신호 분석 - 부적합한 입력을 미리 걸러내고 정규화/VAD/구간 처리 여부 결정
+ANALYSIS_FFT_SIZE = 1024              # 유효 대역폭 추정용 FFT 길이
+ANALYSIS_CLIP_LEVEL = 0.999           # 전체 스케일 대비 이 이상이면 클리핑 샘플로 간주
+ANALYSIS_BANDWIDTH_FLOOR_DB = 60      # 스펙트럼 최대값 대비 이 이내의 성분이 있는 가장 높은 주파수를 유효 대역폭으로 사용
+ANALYSIS_MIN_RMS_DBFS = -60           # 이보다 작으면 사실상 무음 녹음 (인식 중단)
+ANALYSIS_MAX_SILENCE_RATIO = 0.98     # 무음 비율이 이보다 크면 인식할 음성이 없음 (인식 중단)
+ANALYSIS_VAD_MIN_SILENCE_RATIO = 0.05 # 무음 비율이 이보다 작으면 무음 압축 생략
+ANALYSIS_WARN_CLIPPING_RATIO = 0.001  # 클리핑 경고 기준
+ANALYSIS_WARN_SNR_DB = 15             # 잡음 경고 기준
+ANALYSIS_WARN_BANDWIDTH_HZ = 3400     # 전화 대역 이하이면 경고
+ANALYSIS_WARN_RMS_DBFS = -40          # 음량이 너무 작으면 경고
+
 # Azure Speech SDK 설정 (WAV 전용 최적화)
 @st.cache_resource
 def init_speech_config():
@@ -41,7 +114,8 @@ def init_speech_config():
         )
         
         # WAV 파일 처리를 위한 최적 설정
-        speech_config.speech_recognition_language = "ko-KR"        
+        speech_config.speech_recognition_language = "ko-KR"
+        speech_config.output_format = speechsdk.OutputFormat.Detailed  # 발화별 신뢰도 포함
         return speech_config
         
     except Exception as e:
@@ -66,8 +140,99 @@ def init_speech_config():
         
         return None
 
+# 업로드 버퍼를 복사하지 않고 PCM 영역만 가리키는 WAV 오디오 (data는 memoryview)
+class WavAudio(namedtuple("WavAudio", ["channels", "sample_width", "frame_rate", "n_frames", "data"])):
+    __slots__ = ()
+    
+    @property
+    def duration(self):
+        return self.n_frames / self.frame_rate if self.frame_rate else 0.0
+    
+    @property
+    def bytes_per_frame(self):
+        return self.sample_width * self.channels
+
+def parse_wav_header(buffer):
+    """RIFF/WAVE 헤더를 memoryview에서 직접 파싱하여 PCM 영역을 가리키는 WavAudio 반환 (복사 없음)"""
+    view = memoryview(buffer)
+    if len(view) < 12 or bytes(view[0:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        raise wave.Error("RIFF/WAVE 형식의 파일이 아닙니다.")
+    
+    fmt = None
+    data = None
+    position = 12
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        chunk_size = struct.unpack_from('<I', view, position + 4)[0]
+        body = position + 8
+        
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise wave.Error("fmt 청크가 손상되었습니다.")
+            format_tag, channels, frame_rate, _, _, bits = struct.unpack_from('<HHIIHH', view, body)
+            if format_tag == 0xFFFE and chunk_size >= 40:  # WAVE_FORMAT_EXTENSIBLE
+                format_tag = struct.unpack_from('<H', view, body + 24)[0]
+            fmt = (format_tag, channels, frame_rate, bits)
+        elif chunk_id == b'data':
+            # 스트리밍 녹음기는 data 크기를 0 또는 0xFFFFFFFF로 기록하기도 함
+            end = len(view) if chunk_size in (0, 0xFFFFFFFF) else min(body + chunk_size, len(view))
+            data = view[body:end]
+            break
+        position = body + chunk_size + (chunk_size & 1)
+    
+    if fmt is None:
+        raise wave.Error("fmt 청크가 없습니다.")
+    if data is None:
+        raise wave.Error("data 청크가 없습니다.")
+    
+    format_tag, channels, frame_rate, bits = fmt
+    if format_tag != 1:
+        raise wave.Error(f"압축된 WAV(format {format_tag})는 지원하지 않습니다. PCM WAV를 사용하세요.")
+    if channels == 0 or frame_rate == 0 or bits == 0:
+        raise wave.Error("WAV 헤더 값이 올바르지 않습니다.")
+    
+    sample_width = (bits + 7) // 8
+    bytes_per_frame = sample_width * channels
+    n_frames = len(data) // bytes_per_frame
+    return WavAudio(channels, sample_width, frame_rate, n_frames, data[:n_frames * bytes_per_frame])
+
+def load_wav_audio(source):
+    """경로, bytes, memoryview 중 어떤 입력이든 WavAudio로 변환"""
+    if isinstance(source, WavAudio):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return map_wav_file(source)
+    return parse_wav_header(source)
+
+def map_wav_file(path):
+    """WAV 파일을 메모리 매핑하여 WavAudio로 반환 (필요한 구간만 디스크에서 읽히므로 파일 크기 제한 없음)"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse_wav_header(mapped)
+
+def slice_wav_audio(audio, start, end):
+    """[start, end) 프레임 구간을 복사 없이 잘라낸 WavAudio 반환"""
+    bytes_per_frame = audio.bytes_per_frame
+    return audio._replace(n_frames=end - start, data=audio.data[start * bytes_per_frame:end * bytes_per_frame])
+
+@contextmanager
+def open_uploaded_wav(uploaded_file):
+    """Streamlit 업로드 파일의 WAV 버퍼(memoryview)를 제공하는 컨텍스트
+
+    UploadedFile은 이미 업로드 전체를 메모리에 가진 BytesIO이므로 디스크로 옮기지 않고 그 버퍼를 그대로 구간 단위로 처리한다.
+    (업로드 크기 상한은 .streamlit/config.toml의 maxUploadSize) 컨텍스트가 끝나면 memoryview를 명시적으로 해제한다.
+    """
+    view = uploaded_file.getbuffer()
+    try:
+        yield view
+    finally:
+        view.release()
+
 def validate_wav_file_only(file_data, file_name):
-    """WAV 파일 전용 검증 및 Azure Speech SDK 호환성 확인"""
+    """WAV 파일 전용 검증 및 Azure Speech SDK 호환성 확인
+
+    file_data는 bytes 또는 memoryview(UploadedFile.getbuffer())이며, 임시 파일 없이 WavAudio를 반환한다.
+    """
     try:
         file_extension = os.path.splitext(file_name)[1].lower()
         
@@ -85,46 +250,10 @@ def validate_wav_file_only(file_data, file_name):
             """)
             return None, False
         
-        # 임시 WAV 파일 생성
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            tmp_file.write(file_data)
-            tmp_file_path = tmp_file.name
-        
-        # WAV 파일 상세 검증 및 Azure Speech SDK 호환성 확인
+        # WAV 헤더 상세 검증 및 Azure Speech SDK 호환성 확인 (메모리에서 직접 파싱)
         try:
-            with wave.open(tmp_file_path, 'rb') as wav_file:
-                channels = wav_file.getnchannels()
-                sample_width = wav_file.getsampwidth()
-                frame_rate = wav_file.getframerate()
-                frames = wav_file.getnframes()
-                duration = frames / frame_rate
+            audio = parse_wav_header(file_data)
                 
-                
-                # Azure Speech Service 최적화 권장사항
-                optimization_warnings = []
-                if channels > 2:
-                    optimization_warnings.append("채널 수가 많습니다. 모노(1채널) 또는 스테레오(2채널)를 권장합니다.")
-                if sample_width != 2:
-                    optimization_warnings.append("16-bit PCM을 권장합니다.")
-                if frame_rate < 16000:
-                    optimization_warnings.append("16kHz 이상의 샘플링 레이트를 권장합니다.")
-                elif frame_rate > 48000:
-                    optimization_warnings.append("48kHz 이하의 샘플링 레이트를 권장합니다.")
-                
-                if optimization_warnings:
-                    st.warning("**🔧 Azure Speech Service 최적화 권장사항:**")
-                    for warning in optimization_warnings:
-                        st.warning(f"- {warning}")
-                    
-                    st.info("""
-                    **최적 WAV 설정으로 변환:**
-                    ```bash
-                    ffmpeg -i input.wav -acodec pcm_s16le -ar 16000 -ac 1 optimized.wav
-                    ```
-                    """)
-                
-                return tmp_file_path, True
-                    
         except wave.Error as e:
             st.error(f"❌ WAV 파일 오류: {e}")
             st.error("""
@@ -133,59 +262,219 @@ def validate_wav_file_only(file_data, file_name):
             2. 압축된 WAV가 아닌 PCM WAV 사용
             3. 오디오 편집 프로그램으로 재저장
             """)
-            os.unlink(tmp_file_path)
             return None, False
+        
+        # Azure Speech Service 최적화 권장사항
+        optimization_warnings = []
+        if audio.channels > 2:
+            optimization_warnings.append("채널 수가 많습니다. 모노(1채널) 또는 스테레오(2채널)를 권장합니다.")
+        if audio.sample_width != 2:
+            optimization_warnings.append("16-bit PCM을 권장합니다.")
+        if audio.frame_rate < 16000:
+            optimization_warnings.append("16kHz 이상의 샘플링 레이트를 권장합니다.")
+        elif audio.frame_rate > 48000:
+            optimization_warnings.append("48kHz 이하의 샘플링 레이트를 권장합니다.")
+        
+        if optimization_warnings:
+            st.warning("**🔧 Azure Speech Service 최적화 권장사항:**")
+            for warning in optimization_warnings:
+                st.warning(f"- {warning}")
+            
+            st.info("💡 인식 전에 16kHz / 모노 / 16-bit PCM으로 자동 변환됩니다.")
+        
+        return audio, True
             
     except Exception as e:
         st.error(f"❌ WAV 파일 준비 중 오류: {e}")
         return None, False
 
 # Azure Speech Service 전용 안전한 음성 인식 함수
-def speech_to_text_safe(wav_file_path, speech_config):
-    """Azure Speech Service를 이용한 WAV 파일 전용 안전한 음성 인식"""
+def speech_to_text_safe(wav_audio, speech_config, parallel=False, max_workers=MAX_PARALLEL_RECOGNIZERS, use_cache=True, normalize=True,
+                        vad=True, min_silence_seconds=VAD_MIN_SILENCE_SECONDS, stats=None):
+    """Azure Speech Service를 이용한 WAV 파일 전용 안전한 음성 인식
+
+    wav_audio는 validate_wav_file_only가 반환한 WavAudio(또는 WAV 경로/바이트)이다.
+    parallel=True이면 무음 경계에서 분할한 세그먼트를 여러 인식기로 동시에 처리한다.
+    use_cache=True이면 PCM 해시 기반 디스크 캐시를 먼저 조회한다.
+    normalize=True이면 업로드 전에 16kHz/모노/16-bit PCM으로 변환한다.
+    vad=True이면 min_silence_seconds보다 긴 무음을 압축한 뒤 인식하며, offset은 원본 녹음 기준으로 유지된다.
+    stats에 dict를 넘기면 녹음 길이, 무음 제거 비율, 세그먼트 수 등 처리 통계를 채워준다.
+    STREAM_WINDOW_SECONDS보다 긴 녹음은 구간 단위로 정규화/인식하여 파일 크기와 무관하게 메모리 사용량을 유지한다.
+    인식 전에 analyze_wav_signal로 신호를 분석하여 무음/음성 없는 녹음은 거부하고, 필요한 처리 단계만 수행한다.
+    반환값은 발화별 offset/길이/신뢰도를 가진 Transcript(str 하위 클래스)이며, 인식된 텍스트가 없으면 빈 Transcript, 실패 시 None이다.
+    """
+    stats = stats if stats is not None else {}
     
-    # 1단계: WAV 파일 존재 및 접근성 확인
-    if not os.path.exists(wav_file_path):
-        st.error("❌ WAV 파일이 존재하지 않습니다.")
+    # 1단계: WAV 데이터 파싱 및 유효성 확인 (디스크를 거치지 않음)
+    try:
+        audio = load_wav_audio(wav_audio)
+    except (OSError, wave.Error) as e:
+        st.error(f"❌ WAV 파일 정보 확인 실패: {e}")
         return None
     
-    # 파일 확장자 재확인
-    if not wav_file_path.lower().endswith('.wav'):
-        st.error("❌ WAV 파일이 아닙니다.")
+    data_size = len(audio.data)
+    if audio.n_frames == 0:
+        st.error("❌ 빈 WAV 파일입니다.")
         return None
     
+    st.info(f"📁 WAV 오디오 크기: {data_size / (1024 * 1024):.2f} MB ({audio.duration:.0f}초)")
+    
+    # 동일 녹음의 이전 변환 결과가 있으면 Azure 호출 없이 반환
+    cache_key = transcript_cache_key(audio, speech_config, normalize=normalize,
+                                     vad_silence=min_silence_seconds if vad else None) if use_cache else None
+    if cache_key:
+        cached = load_cached_transcript(cache_key)
+        if cached and cached.get("text"):
+            stats.update(cached.get("stats") or {})
+            stats["cached"] = True
+            st.success(f"⚡ 이전에 변환한 녹음입니다. 캐시된 결과를 사용합니다. (길이: {len(cached['text'])}자)")
+            return Transcript.from_dict(cached)
+    
+    # 신호 분석으로 인식할 수 없는 입력을 먼저 걸러내고 정규화/무음 압축/구간 처리 여부 결정
     try:
-        # 파일 크기 및 유효성 확인
-        file_size = os.path.getsize(wav_file_path)
-        if file_size == 0:
-            st.error("❌ 빈 WAV 파일입니다.")
-            return None
-        if file_size > 100 * 1024 * 1024:  # 100MB Azure 제한
-            st.error("❌ WAV 파일이 Azure 제한(100MB)을 초과합니다.")
+        report, energy = analyze_wav_signal(audio, with_energy=True)
+    except Exception as e:
+        st.warning(f"⚠️ 신호 분석 실패, 기본 설정으로 인식합니다: {e}")
+        report, energy = None, None
+    
+    windowed = True
+    if report:
+        stats["signal"] = {key: report[key] for key in ("rms_dbfs", "peak_dbfs", "clipping_ratio", "silence_ratio", "snr_db", "bandwidth_hz", "quality_score")}
+        st.info(
+            f"📊 신호 분석: 평균 음량 {report['rms_dbfs']:.0f} dBFS · 무음 {report['silence_ratio'] * 100:.0f}% · "
+            f"SNR {report['snr_db']:.0f} dB · 대역폭 {report['bandwidth_hz'] / 1000:.1f}kHz · 클리핑 {report['clipping_ratio'] * 100:.2f}%"
+        )
+        for warning in report["warnings"]:
+            st.warning(f"⚠️ {warning}")
+        if report["issues"]:
+            for issue in report["issues"]:
+                st.error(f"❌ {issue}")
             return None
+        
+        strategy = report["strategy"]
+        if vad and not strategy["vad"]:
+            st.info("💡 무음 구간이 거의 없어 무음 압축 단계를 생략합니다.")
+        normalize, vad, windowed = normalize and strategy["normalize"], vad and strategy["vad"], strategy["windowed"]
+    
+    options = dict(parallel=parallel, max_workers=max_workers, normalize=normalize, vad=vad, min_silence_seconds=min_silence_seconds)
+    windows = plan_stream_windows(audio, energy=energy) if windowed else [(0, audio.n_frames)]
+    if len(windows) > 1:
+        transcript = _stream_recognition_wav_safe(audio, speech_config, windows, stats, job_id=cache_key, **options)
+    else:
+        transcript = _transcribe_wav_window(audio, speech_config, stats, job_id=cache_key, **options)
+    
+    # 모든 세그먼트가 성공한 경우에만 캐시에 저장하고 체크포인트 정리 (실패 시 다음 업로드에서 이어서 처리)
+    if cache_key and transcript and not stats.get("failed_segments"):
+        save_cached_transcript(cache_key, transcript, stats)
+        clear_job_checkpoint(cache_key)
+    return transcript
 
-        st.info(f"📁 WAV 파일 크기: {file_size / (1024 * 1024):.2f} MB")
+def _transcribe_wav_window(audio, speech_config, stats, parallel, max_workers, normalize, vad, min_silence_seconds, job_id=None):
+    """정규화 → 무음 압축 → 인식을 하나의 오디오 구간에 대해 수행"""
+    # 16kHz/모노/16-bit로 변환하여 전송량을 줄이고 인식기의 기본 경로를 사용
+    if normalize and needs_normalization(audio):
+        try:
+            source = audio
+            audio = normalize_wav_audio(audio)
+            st.info(
+                f"🔄 오디오 정규화: {source.frame_rate / 1000:g}kHz {source.channels}ch {source.sample_width * 8}-bit "
+                f"→ {audio.frame_rate / 1000:g}kHz 모노 16-bit "
+                f"(전송량 {len(source.data) / max(len(audio.data), 1):.1f}배 감소)"
+            )
+        except Exception as e:
+            st.warning(f"⚠️ 오디오 정규화 실패, 원본 형식으로 인식합니다: {e}")
+    
+    # 긴 무음 구간 압축 (인식 시간과 과금 오디오 시간 절감)
+    stats.update({"duration_seconds": audio.duration, "removed_seconds": 0.0, "removed_ratio": 0.0, "cached": False})
+    regions, energy = None, None
+    if vad:
+        try:
+            regions, energy = detect_speech_regions(audio, min_silence_seconds=min_silence_seconds)
+            kept = sum(end - start for start, end in regions) / audio.frame_rate
+            stats["removed_seconds"] = audio.duration - kept
+            stats["removed_ratio"] = stats["removed_seconds"] / audio.duration if audio.duration else 0.0
+            st.info(
+                f"🔇 무음 구간 압축: 전체 {audio.duration:.0f}초 중 {stats['removed_seconds']:.0f}초 "
+                f"({stats['removed_ratio'] * 100:.1f}%) 제거"
+            )
+        except Exception as e:
+            st.warning(f"⚠️ 무음 구간 검출 실패, 전체 오디오를 인식합니다: {e}")
+            regions, energy = None, None
+    
+    # 음성 구간이 하나도 없으면 Azure로 보내지 않고 빈 결과로 기록 (regions=None인 VAD 생략/실패와 구분)
+    if regions == []:
+        st.info("🔇 음성 구간이 없어 인식을 건너뜁니다.")
+        stats.update({"segments": 0, "empty_windows": 1})
+        return Transcript()
+    
+    # 분할 병렬 인식 모드 (녹음 길이가 아닌 세그먼트 길이에 비례하는 처리 시간)
+    if parallel:
+        return parallel_recognition_wav_safe(audio, speech_config, max_workers=max_workers,
+                                             regions=regions, energy=energy, stats=stats, job_id=job_id)
+    return _single_recognition_wav_safe(audio, speech_config, regions=regions)
 
-    except Exception as e:
-        st.error(f"❌ WAV 파일 정보 확인 실패: {e}")
-        return None
+def _stream_recognition_wav_safe(audio, speech_config, windows, stats, job_id=None, **options):
+    """긴 녹음을 구간 단위로 차례대로 인식하고, 인식된 텍스트를 구간이 끝날 때마다 이어 붙임
+
+    한 번에 메모리에 올라가는 정규화 결과와 세그먼트 계획은 한 구간 분량으로 제한된다.
+    각 구간은 별도 체크포인트(job_id-w<번호>)를 사용하므로 중단 후에도 완료된 구간은 다시 인식하지 않는다.
+    """
+    st.info(f"🎞️ 장시간 녹음: {len(windows)}개 구간(약 {audio.duration / len(windows) / 60:.0f}분 단위)으로 나누어 순서대로 인식합니다.")
+    preview = st.empty()
+    parts = []
+    totals = {"segments": 0, "resumed_segments": 0, "retried_attempts": 0, "failed_segments": 0, "empty_windows": 0,
+              "removed_seconds": 0.0}
     
-    # 2단계: Azure AudioConfig 생성 (WAV 전용)
-    audio_config = None
-    try:        
-        # 절대 경로로 변환 (Azure SDK 요구사항)
-        abs_path = os.path.abspath(wav_file_path)
-        
-        # WAV 파일용 AudioConfig 생성
-        audio_config = speechsdk.AudioConfig(filename=abs_path)
+    for index, (start, end) in enumerate(windows):
+        window_stats = {}
+        label = f"구간 {index + 1}/{len(windows)} ({start / audio.frame_rate / 60:.0f}~{end / audio.frame_rate / 60:.0f}분)"
+        with st.status(f"🎧 {label} 인식 중...", expanded=False) as status:
+            text = _transcribe_wav_window(
+                slice_wav_audio(audio, start, end), speech_config, window_stats,
+                job_id=f"{job_id}-w{index}" if job_id else None, **options
+            )
+            if text is None:
+                status.update(label=f"❌ {label} 실패", state="error")
+            elif not text and window_stats.get("empty_windows"):
+                status.update(label=f"🔇 {label} 음성 없음", state="complete")
+            else:
+                status.update(label=f"{'✅' if text else '⚠️'} {label} 완료", state="complete")
         
+        for key in totals:
+            totals[key] += window_stats.get(key, 0)
+        if text is None:
+            # 오류로 끝난 구간 (순차 인식은 failed_segments를 남기지 않으므로 여기서 집계하여 부분 결과가 캐시되지 않게 함)
+            # 인증/할당량 등 복구 불가 오류는 남은 구간도 같은 이유로 실패하므로 중단 (완료 구간은 체크포인트에 남음)
+            if not window_stats.get("failed_segments"):
+                totals["failed_segments"] += 1
+            stats.update(totals)
+            st.error(f"❌ {label} 인식 실패로 나머지 구간 처리를 중단합니다.")
+            return None
+        if text:
+            parts.append(text.shifted(start * TICKS_PER_SECOND // audio.frame_rate))
+            preview.info(f"📝 {index + 1}/{len(windows)} 구간 누적 {sum(len(part) for part in parts)}자 · 최근: …{text[-80:]}")
+    
+    stats.update(totals)
+    stats.update({"duration_seconds": audio.duration, "windows": len(windows), "cached": False})
+    stats["removed_ratio"] = stats["removed_seconds"] / audio.duration if audio.duration else 0.0
+    
+    if not parts:
+        st.warning("⚠️ Azure Speech Service에서 인식된 텍스트가 없습니다.")
+        return None
+    return Transcript.concat(parts)
+
+def _single_recognition_wav_safe(audio, speech_config, regions=None):
+    """인식기 하나로 WavAudio 전체(또는 음성 구간 목록)를 연속 인식"""
+    kept_duration = sum(end - start for start, end in regions) / audio.frame_rate if regions is not None else audio.duration
+    # 2단계: Azure Push 스트림 AudioConfig 생성 (PCM 블록을 메모리에서 직접 공급)
+    try:
+        push_stream, audio_config = _create_push_stream(audio)
     except Exception as e:
         st.error(f"❌ Azure AudioConfig 생성 실패: {e}")
         st.error("""
         **Azure AudioConfig 문제 해결:**
-        - WAV 파일 경로에 특수문자가 없는지 확인
-        - 파일에 읽기 권한이 있는지 확인
-        - 다른 프로그램에서 파일을 사용 중이지 않은지 확인
+        - WAV 파일이 표준 PCM 형식인지 확인
+        - 8/16-bit PCM, 모노 WAV로 변환 후 재시도
         """)
         return None
     
@@ -211,40 +500,16 @@ def speech_to_text_safe(wav_file_path, speech_config):
         
         return None
     
-    # 4단계: Azure Speech Service 음성 인식 실행
+    # 4단계: Azure Speech Service 연속 인식 단일 실행 (session_stopped/canceled 이벤트로 종료)
     try:
         st.info("🎯 Azure Speech Service로 음성 인식 시작...")
-        
-        # 단일 음성 인식 시도
-        result = speech_recognizer.recognize_once_async().get()
-        
-        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            recognized_text = result.text.strip()
-            if len(recognized_text) > 1:
-                st.success(f"✅ 음성 인식 성공 (길이: {len(recognized_text)}자)")
-                return recognized_text
-            else:
-                st.info("ℹ️ 짧은 텍스트 인식됨, 연속 인식 시도...")
-                return continuous_recognition_wav_safe(speech_recognizer)
-                
-        elif result.reason == speechsdk.ResultReason.NoMatch:
-            st.warning("⚠️ Azure Speech Service에서 음성을 인식하지 못했습니다. 연속 인식 시도...")
-            return continuous_recognition_wav_safe(speech_recognizer)
-            
-        elif result.reason == speechsdk.ResultReason.Canceled:
-            cancellation = result.cancellation_details
-            st.error(f"❌ Azure Speech Service 인식 취소: {cancellation.reason}")
-            
-            if cancellation.reason == speechsdk.CancellationReason.Error:
-                st.error(f"🔍 Azure 오류 세부사항: {cancellation.error_details}")
-                
-                # Azure 특화 오류 해결 가이드
-                if "authentication" in cancellation.error_details.lower():
-                    st.error("🔑 Azure 인증 오류: Speech Service 키를 확인하세요.")
-                elif "quota" in cancellation.error_details.lower():
-                    st.error("📊 Azure 할당량 초과: 사용량을 확인하세요.")
-            
-            return None
+        pieces = regions if regions is not None else [(0, audio.n_frames)]
+        return continuous_recognition_wav_safe(
+            speech_recognizer,
+            kept_duration,
+            feed=lambda: _feed_push_stream(push_stream, audio, pieces),
+            offset_map=lambda offset: segment_offset_to_original(pieces, offset, audio.frame_rate)
+        )
     
     except Exception as e:
         st.error(f"❌ Azure Speech Service 음성 인식 오류: {e}")
@@ -258,67 +523,247 @@ def speech_to_text_safe(wav_file_path, speech_config):
             except:
                 pass
 
-def continuous_recognition_wav_safe(speech_recognizer):
-    """Azure Speech Service WAV 파일 전용 안전한 연속 음성 인식"""
+# 오디오 해시 기반 변환 결과 캐시
+def transcript_cache_key(audio, speech_config, normalize=True, vad_silence=None):
+    """PCM 데이터 해시 + 인식 언어/오디오 형식/정규화/VAD 설정으로 캐시 키 생성"""
+    digest = hashlib.sha256()
+    for start in range(0, len(audio.data), HASH_BLOCK_BYTES):
+        digest.update(audio.data[start:start + HASH_BLOCK_BYTES])
+    settings = {
+        "version": TRANSCRIPT_CACHE_VERSION,
+        "language": getattr(speech_config, "speech_recognition_language", None),
+        "format": [audio.channels, audio.sample_width, audio.frame_rate],
+        "normalize": NORMALIZE_TARGET_RATE if normalize else None,
+        "vad_silence": vad_silence,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def _transcript_cache_path(cache_key):
+    return os.path.join(TRANSCRIPT_CACHE_DIR, f"{cache_key}.json")
+
+def load_cached_transcript(cache_key):
+    """캐시된 변환 결과({"text", "segments", "stats"}) 조회 (적중 시 수정 시각을 갱신하여 LRU 순서 유지)"""
+    path = _transcript_cache_path(cache_key)
     try:
-        results = []
-        done = False
-        error_occurred = False
-        
-        def result_handler(evt):
-            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                text = evt.result.text.strip()
-                if text:
-                    results.append(text)
-                    st.info(f"✅ 조각 #{len(results)}: {text[:50]}...")
-        
-        def stop_handler(evt):
-            nonlocal done
-            done = True
-            st.info("🏁 Azure Speech Service 연속 인식 완료")
-        
-        def error_handler(evt):
-            nonlocal error_occurred, done
-            error_occurred = True
-            done = True
-            st.error(f"❌ Azure Speech Service 연속 인식 오류: {evt}")
-        
-        # Azure Speech Service 이벤트 핸들러 연결
-        speech_recognizer.recognized.connect(result_handler)
-        speech_recognizer.session_stopped.connect(stop_handler)
-        speech_recognizer.canceled.connect(error_handler)
-        
-        # Azure 연속 인식 시작
-        speech_recognizer.start_continuous_recognition()
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(path)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+def save_cached_transcript(cache_key, transcript, stats=None):
+    """변환 결과(Transcript 또는 문자열)를 캐시에 원자적으로 저장하고 용량 상한을 넘으면 오래된 항목 삭제"""
+    try:
+        os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+        path = _transcript_cache_path(cache_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            entry = transcript.to_dict() if isinstance(transcript, Transcript) else {"text": transcript}
+            json.dump(dict(entry, stats=stats or {}, created=time.time()), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        _evict_transcript_cache()
+    except OSError as e:
+        print(f"변환 결과 캐시 저장 실패: {e}")
+
+def _evict_transcript_cache():
+    """캐시 총 용량이 상한을 넘으면 가장 오래 사용되지 않은 항목부터 삭제"""
+    entries = []
+    with os.scandir(TRANSCRIPT_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= TRANSCRIPT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+    
+    # 오래 방치된 미완료 작업 체크포인트 정리
+    if os.path.isdir(TRANSCRIPT_JOB_DIR):
+        expire_before = time.time() - TRANSCRIPT_JOB_MAX_AGE_SECONDS
+        with os.scandir(TRANSCRIPT_JOB_DIR) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < expire_before:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+
+# 세그먼트 단위 체크포인트 저장소 (작업별 JSONL: 첫 줄은 세그먼트 계획, 이후 완료된 세그먼트)
+_job_checkpoint_lock = threading.Lock()
+
+def _job_checkpoint_path(job_id):
+    return os.path.join(TRANSCRIPT_JOB_DIR, f"{job_id}.jsonl")
+
+def _segment_plan_hash(segments):
+    """세그먼트 계획이 같을 때만 체크포인트를 재사용하기 위한 해시"""
+    plan = [[[int(start), int(end)] for start, end in pieces] for pieces in segments]
+    return hashlib.sha256(json.dumps(plan).encode("utf-8")).hexdigest()
+
+def start_job_checkpoint(job_id, plan_hash, segment_count):
+    """이전 체크포인트에서 완료된 세그먼트 결과를 읽어오고, 계획이 다르면 새로 시작"""
+    path = _job_checkpoint_path(job_id)
+    completed = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get("plan") == plan_hash:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # 중단된 쓰기로 잘린 마지막 줄
+                    completed[record["index"]] = [tuple(item) for item in record["utterances"]]
+                return completed
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    try:
+        os.makedirs(TRANSCRIPT_JOB_DIR, exist_ok=True)
+        with _job_checkpoint_lock, open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"plan": plan_hash, "segments": segment_count, "created": time.time()}) + "\n")
+    except OSError as e:
+        print(f"체크포인트 생성 실패: {e}")
+    return completed
+
+def _append_job_checkpoint(job_id, index, utterances):
+    """완료된 세그먼트 결과를 체크포인트에 추가 (작업 스레드에서 호출)"""
+    try:
+        line = json.dumps({"index": index, "utterances": utterances}, ensure_ascii=False)
+        with _job_checkpoint_lock, open(_job_checkpoint_path(job_id), 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    except OSError as e:
+        print(f"체크포인트 기록 실패: {e}")
+
+def clear_job_checkpoint(job_id):
+    """작업 완료 후 체크포인트 삭제 (장시간 녹음의 구간별 체크포인트 포함)"""
+    for path in [_job_checkpoint_path(job_id)] + glob.glob(_job_checkpoint_path(f"{job_id}-w*")):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def _is_retryable_error(error):
+    return not any(keyword in str(error).lower() for keyword in NON_RETRYABLE_ERRORS)
+
+def _recognition_timeout(audio_duration):
+    """WAV 길이로부터 인식 제한 시간(초) 계산"""
+    return audio_duration * RECOGNITION_TIMEOUT_FACTOR + RECOGNITION_TIMEOUT_MARGIN
+
+def _show_cancellation_guide(error_details):
+    """Azure 인식 취소 오류에 대한 해결 가이드 표시"""
+    st.error(f"🔍 Azure 오류 세부사항: {error_details}")
+    if "authentication" in str(error_details).lower():
+        st.error("🔑 Azure 인증 오류: Speech Service 키를 확인하세요.")
+    elif "quota" in str(error_details).lower():
+        st.error("📊 Azure 할당량 초과: 사용량을 확인하세요.")
+
+def _run_continuous_recognition(speech_recognizer, timeout=None, feed=None, on_wait=None):
+    """session_stopped/canceled 이벤트가 올 때까지 한 번만 연속 인식 실행
+
+    feed는 인식 시작 후 오디오를 공급하는 함수, on_wait는 대기 중 주기적으로 호출되는 함수(경과 초 전달).
+    작업 스레드에서도 호출되므로 이 함수 안에서는 st를 호출하지 않는다.
+    """
+    utterances = []
+    errors = []
+    finished = threading.Event()
+    
+    def result_handler(evt):
+        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            text = evt.result.text.strip()
+            if text:
+                utterances.append((evt.result.offset, evt.result.duration, text, _result_confidence(evt.result)))
+    
+    def canceled_handler(evt):
+        if evt.cancellation_details.reason == speechsdk.CancellationReason.Error:
+            errors.append(evt.cancellation_details.error_details)
+        finished.set()
+    
+    speech_recognizer.recognized.connect(result_handler)
+    speech_recognizer.session_stopped.connect(lambda evt: finished.set())
+    speech_recognizer.canceled.connect(canceled_handler)
+    
+    started = time.monotonic()
+    speech_recognizer.start_continuous_recognition()
+    try:
+        if feed:
+            feed()
         
-        # 진행 상황 표시 (최대 3분 - WAV 파일은 더 오래 걸릴 수 있음)
-        import time
-        max_wait = 180  # 3분
-        elapsed = 0
+        # 이벤트가 오면 즉시 깨어나고, 진행 표시가 필요할 때만 주기적으로 깨어남
+        while not finished.is_set():
+            elapsed = time.monotonic() - started
+            if timeout is not None and elapsed >= timeout:
+                errors.append(f"인식 시간 초과 ({timeout:.0f}초)")
+                break
+            wait = PROGRESS_INTERVAL_SECONDS if on_wait else None
+            if timeout is not None:
+                remaining = timeout - elapsed
+                wait = remaining if wait is None else min(wait, remaining)
+            if finished.wait(wait):
+                break
+            if on_wait:
+                on_wait(time.monotonic() - started)
+    finally:
+        speech_recognizer.stop_continuous_recognition()
+    
+    return {"utterances": utterances, "error": errors[0] if errors else None}
+
+def _result_confidence(result):
+    """Detailed 출력 형식 JSON에서 최상위 후보의 신뢰도 추출 (없으면 None)"""
+    try:
+        return float(json.loads(result.json)["NBest"][0]["Confidence"])
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        return None
+
+def continuous_recognition_wav_safe(speech_recognizer, audio_duration=None, feed=None, offset_map=None):
+    """Azure Speech Service WAV 파일 전용 안전한 연속 음성 인식
+
+    audio_duration(초)이 주어지면 WAV 길이에 비례한 제한 시간을 적용한다.
+    feed는 Push 스트림 인식기에 오디오를 공급하는 함수, offset_map은 인식 offset을 원본 녹음 기준으로 바꾸는 함수이다.
+    발화별 offset/길이/신뢰도를 가진 Transcript(str 하위 클래스)를 반환한다. (인식된 텍스트가 없으면 빈 Transcript, 오류 시 None)
+    """
+    try:
+        timeout = _recognition_timeout(audio_duration) if audio_duration else None
+        expected = audio_duration or 0
         
         progress = st.progress(0)
         status_text = st.empty()
         
-        while not done and elapsed < max_wait:
-            time.sleep(1)
-            elapsed += 1
-            progress.progress(elapsed / max_wait)
-            status_text.text(f"Azure Speech Service 처리 중... {elapsed}/{max_wait}초")
+        def show_progress(elapsed):
+            if expected:
+                progress.progress(min(elapsed / expected, 0.99))
+                status_text.text(f"Azure Speech Service 처리 중... {elapsed:.0f}초 경과 (녹음 길이 {expected:.0f}초)")
+            else:
+                status_text.text(f"Azure Speech Service 처리 중... {elapsed:.0f}초 경과")
+        
+        result = _run_continuous_recognition(speech_recognizer, timeout=timeout, feed=feed, on_wait=show_progress)
         
-        # Azure 연속 인식 정리
-        speech_recognizer.stop_continuous_recognition()
         progress.progress(1.0)
         status_text.text("처리 완료")
         
-        if error_occurred:
+        if result["error"]:
             st.error("❌ Azure Speech Service 연속 인식 중 오류 발생")
+            _show_cancellation_guide(result["error"])
             return None
         
-        if results:
-            full_text = " ".join(results)
-            st.success(f"✅ Azure Speech Service로 총 {len(results)}개 조각 인식 완료")
-            st.info(f"📝 총 텍스트 길이: {len(full_text)}자")
-            return full_text
+        if result["utterances"]:
+            utterances = result["utterances"]
+            if offset_map:
+                utterances = [(offset_map(offset), duration, text, confidence) for offset, duration, text, confidence in utterances]
+            transcript = Transcript.from_utterances(utterances)
+            st.success(f"✅ Azure Speech Service로 총 {transcript.utterance_count}개 조각 인식 완료")
+            st.info(f"📝 총 텍스트 길이: {len(transcript)}자")
+            return transcript
         else:
             st.warning("⚠️ Azure Speech Service에서 인식된 텍스트가 없습니다.")
             st.info("""
@@ -327,54 +772,513 @@ def continuous_recognition_wav_safe(speech_recognizer):
             - 배경 소음이 적은 녹음 사용
             - 16kHz, 16-bit, 모노 WAV로 변환
             """)
-            return None
+            return Transcript()
             
     except Exception as e:
         st.error(f"❌ Azure Speech Service 연속 인식 처리 오류: {e}")
         return None
 
+# PCM 바이트를 모노 float32 샘플([-1, 1])로 변환
+def _pcm_to_float(pcm, sample_width):
+    """PCM 바이트를 [-1, 1) 범위의 float32 배열로 변환 (채널 인터리브 유지)"""
+    if sample_width == 1:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        packed = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = np.where(packed >= 1 << 23, packed - (1 << 24), packed).astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(pcm, dtype='<i4').astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"지원하지 않는 샘플 크기: {sample_width} bytes")
+    return samples
+
+def _pcm_to_mono(pcm, sample_width, channels):
+    """PCM 바이트를 채널 평균(모노) float32 배열로 변환"""
+    samples = _pcm_to_float(pcm, sample_width)
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    return samples
+
+def _frame_energy(samples, frame_len):
+    """프레임 단위 RMS 에너지 계산 (벡터화)"""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def _frame_zcr(samples, frame_len):
+    """프레임 단위 영교차율 계산 (벡터화)"""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    signs = np.signbit(samples[:n_frames * frame_len].reshape(n_frames, frame_len))
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1).astype(np.float32) / frame_len
+
+def wav_frame_features(audio, frame_len, with_zcr=False):
+    """WavAudio 전체의 프레임 에너지(와 영교차율)를 일정 크기 블록 단위로 계산 (전체 float 사본을 만들지 않음)"""
+    block_frames = max(frame_len, int(ANALYSIS_BLOCK_SECONDS * audio.frame_rate) // frame_len * frame_len)
+    bytes_per_frame = audio.bytes_per_frame
+    energies, zcrs = [], []
+    for start in range(0, audio.n_frames, block_frames):
+        end = min(start + block_frames, audio.n_frames)
+        block = _pcm_to_mono(audio.data[start * bytes_per_frame:end * bytes_per_frame], audio.sample_width, audio.channels)
+        energies.append(_frame_energy(block, frame_len))
+        if with_zcr:
+            zcrs.append(_frame_zcr(block, frame_len))
+    
+    empty = np.zeros(0, dtype=np.float32)
+    energy = np.concatenate(energies) if energies else empty
+    if not with_zcr:
+        return energy
+    return energy, (np.concatenate(zcrs) if zcrs else empty)
+
+def wav_frame_energy(audio, frame_len):
+    """WavAudio 전체의 프레임 에너지 계산"""
+    return wav_frame_features(audio, frame_len)
+
+def _speech_threshold(energy):
+    """프레임 에너지의 dB 값, 잡음 바닥, 음성 판정 임계값 반환"""
+    level_db = 20 * np.log10(energy + 1e-10)
+    noise_floor = np.percentile(level_db, VAD_NOISE_PERCENTILE)
+    threshold = min(noise_floor + VAD_ENERGY_MARGIN_DB, np.percentile(level_db, 95) - VAD_PEAK_MARGIN_DB)
+    return level_db, noise_floor, threshold
+
+def detect_speech_regions(audio, min_silence_seconds=VAD_MIN_SILENCE_SECONDS, keep_silence_seconds=VAD_KEEP_SILENCE_SECONDS):
+    """에너지/영교차율로 음성 프레임을 판별하고, 긴 무음을 압축한 유지 구간 목록과 프레임 에너지 반환
+
+    반환하는 (시작, 끝) 구간은 원본 오디오 프레임 기준이므로 그대로 원본 offset 맵으로 사용된다.
+    """
+    frame_len = max(1, int(ENERGY_FRAME_SECONDS * audio.frame_rate))
+    energy, zcr = wav_frame_features(audio, frame_len, with_zcr=True)
+    if len(energy) == 0:
+        return [(0, audio.n_frames)], energy
+    
+    # 잡음 바닥 대비 상대 에너지로 판정 (녹음 음량에 무관)
+    level_db, noise_floor, threshold = _speech_threshold(energy)
+    is_speech = (level_db > threshold) | (
+        (level_db > noise_floor + VAD_ZCR_MARGIN_DB) & (zcr > VAD_ZCR_THRESHOLD)
+    )
+    
+    # 무음 구간(연속된 비음성 프레임)의 시작/끝 인덱스
+    padded = np.concatenate(([True], is_speech, [True])).astype(np.int8)
+    changes = np.diff(padded)
+    silence_starts = np.flatnonzero(changes == -1)
+    silence_ends = np.flatnonzero(changes == 1)
+    
+    min_silence = int(min_silence_seconds / ENERGY_FRAME_SECONDS)
+    keep_half = int(keep_silence_seconds / ENERGY_FRAME_SECONDS / 2)
+    long_silence = (silence_ends - silence_starts) >= max(min_silence, 2 * keep_half + 1)
+    
+    regions = []
+    position = 0
+    for start, end in zip(silence_starts[long_silence], silence_ends[long_silence]):
+        cut_start = (start + keep_half) * frame_len if start > 0 else 0
+        cut_end = min((end - keep_half) * frame_len, audio.n_frames) if end < len(energy) else audio.n_frames
+        if cut_start > position:
+            regions.append((position, cut_start))
+        position = max(position, cut_end)
+    if position < audio.n_frames:
+        regions.append((position, audio.n_frames))
+    
+    return regions, energy
+
+def _split_range_at_silence(energy, frame_len, start, end, target, search):
+    """[start, end) 구간을 목표 길이 근처의 가장 조용한 지점에서 분할"""
+    if end - start <= target + search:
+        return [(start, end)]
+    
+    cuts = [start]
+    position = start
+    while end - position > target + search:
+        low = (position + target - search) // frame_len
+        high = min((position + target + search) // frame_len, len(energy))
+        if high <= low:
+            break
+        quietest = low + int(np.argmin(energy[low:high]))
+        cut = quietest * frame_len + frame_len // 2
+        if cut <= position:
+            break
+        cuts.append(cut)
+        position = cut
+    cuts.append(end)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def plan_segments(audio, regions=None, energy=None, target_seconds=SEGMENT_TARGET_SECONDS, search_seconds=SEGMENT_SEARCH_SECONDS):
+    """유지 구간들을 목표 길이 단위 세그먼트로 묶어 반환
+
+    각 세그먼트는 원본 프레임 기준 (시작, 끝) 조각의 목록이며, 조각들을 이어 붙여 하나의 스트림으로 인식한다.
+    regions가 None이면 전체 오디오를, 빈 목록(음성 없음)이면 빈 세그먼트 목록을 반환한다.
+    """
+    frame_rate = audio.frame_rate
+    target = int(target_seconds * frame_rate)
+    search = int(search_seconds * frame_rate)
+    regions = regions if regions is not None else [(0, audio.n_frames)]
+    
+    frame_len = max(1, int(ENERGY_FRAME_SECONDS * frame_rate))
+    if energy is None and any(end - start > target + search for start, end in regions):
+        energy = wav_frame_energy(audio, frame_len)
+    if energy is not None:
+        smooth = max(1, int(ENERGY_SMOOTH_SECONDS / ENERGY_FRAME_SECONDS))
+        if smooth > 1 and len(energy) >= smooth:
+            energy = np.convolve(energy, np.ones(smooth, dtype=np.float32) / smooth, mode='same')
+    
+    segments = []
+    current, current_len = [], 0
+    for region_start, region_end in regions:
+        for start, end in _split_range_at_silence(energy, frame_len, region_start, region_end, target, search):
+            if current and (current_len >= target or current_len + (end - start) > target + search):
+                segments.append(current)
+                current, current_len = [], 0
+            current.append((start, end))
+            current_len += end - start
+    if current:
+        segments.append(current)
+    return segments
+
+def plan_stream_windows(audio, energy=None, window_seconds=STREAM_WINDOW_SECONDS, search_seconds=STREAM_WINDOW_SEARCH_SECONDS):
+    """장시간 녹음을 무음 근처에서 나눈 (시작, 끝) 처리 구간 목록 반환 (짧은 녹음은 구간 하나)"""
+    window = int(window_seconds * audio.frame_rate)
+    search = int(search_seconds * audio.frame_rate)
+    if audio.n_frames <= window + search:
+        return [(0, audio.n_frames)]
+    
+    frame_len = max(1, int(ENERGY_FRAME_SECONDS * audio.frame_rate))
+    if energy is None:
+        energy = wav_frame_energy(audio, frame_len)
+    return _split_range_at_silence(energy, frame_len, 0, audio.n_frames, window, search)
+
+def split_wav_at_silence(audio, target_seconds=SEGMENT_TARGET_SECONDS, search_seconds=SEGMENT_SEARCH_SECONDS):
+    """목표 길이 근처의 가장 조용한 지점에서 분할한 (시작, 끝) 프레임 목록 반환"""
+    segments = plan_segments(audio, target_seconds=target_seconds, search_seconds=search_seconds)
+    return [pieces[0] for pieces in segments]
+
+def segment_offset_to_original(pieces, offset_ticks, frame_rate):
+    """압축된 세그먼트 스트림 안의 offset(100ns)을 원본 녹음 기준 offset으로 변환"""
+    offset_frames = offset_ticks * frame_rate // TICKS_PER_SECOND
+    position = 0
+    for start, end in pieces:
+        length = end - start
+        if offset_frames < position + length:
+            break
+        position += length
+    original_frames = start + min(max(offset_frames - position, 0), length)
+    return int(original_frames * TICKS_PER_SECOND // frame_rate)
+
+# 로컬 오디오 정규화 (다운믹스 → 16kHz 리샘플링 → 16-bit 재양자화)
+def needs_normalization(audio, target_rate=NORMALIZE_TARGET_RATE):
+    """Azure Speech 최적 형식(16kHz, 모노, 16-bit)이 아닌지 확인"""
+    return audio.channels != 1 or audio.sample_width != 2 or audio.frame_rate != target_rate
+
+def _lowpass_kernel(cutoff, taps=NORMALIZE_FILTER_TAPS):
+    """Hamming 창을 적용한 windowed-sinc 저역통과 필터 (cutoff: 샘플당 주기)"""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+def normalize_wav_audio(audio, target_rate=NORMALIZE_TARGET_RATE):
+    """WavAudio를 모노/target_rate/16-bit PCM으로 변환 (입력을 일정 크기 블록 단위로 처리)"""
+    ratio = audio.frame_rate / target_rate
+    n_out = int(audio.n_frames / ratio)
+    out = np.empty(n_out, dtype='<i2')
+    
+    # 다운샘플링 시에만 앨리어싱 방지 필터 적용
+    kernel = _lowpass_kernel(0.5 / ratio * NORMALIZE_CUTOFF_MARGIN) if ratio > 1 else None
+    half = len(kernel) // 2 + 1 if kernel is not None else 1
+    bytes_per_frame = audio.bytes_per_frame
+    block_out = int(ANALYSIS_BLOCK_SECONDS * target_rate)
+    
+    for out_start in range(0, n_out, block_out):
+        out_end = min(out_start + block_out, n_out)
+        positions = np.arange(out_start, out_end, dtype=np.float64) * ratio
+        
+        # 필터 문맥을 포함한 입력 구간만 float로 변환
+        low = max(int(positions[0]) - half, 0)
+        high = min(int(positions[-1]) + 2 + half, audio.n_frames)
+        block = _pcm_to_mono(audio.data[low * bytes_per_frame:high * bytes_per_frame], audio.sample_width, audio.channels)
+        if kernel is not None:
+            block = np.convolve(block, kernel, mode='same')
+        
+        # 선형 보간으로 목표 샘플 위치의 값 계산
+        relative = positions - low
+        index = relative.astype(np.int64)
+        frac = (relative - index).astype(np.float32)
+        next_index = np.minimum(index + 1, len(block) - 1)
+        resampled = block[index] * (1 - frac) + block[next_index] * frac
+        
+        out[out_start:out_end] = np.clip(np.round(resampled * 32767.0), -32768, 32767)
+    
+    return WavAudio(1, 2, target_rate, n_out, memoryview(out).cast('B'))
+
+def _create_push_stream(audio):
+    """WavAudio 형식에 맞는 Push 스트림과 AudioConfig 생성"""
+    stream_format = speechsdk.audio.AudioStreamFormat(
+        samples_per_second=audio.frame_rate,
+        bits_per_sample=audio.sample_width * 8,
+        channels=audio.channels
+    )
+    push_stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+    return push_stream, speechsdk.audio.AudioConfig(stream=push_stream)
+
+def _feed_push_stream(push_stream, audio, pieces):
+    """원본 프레임 기준 조각들의 PCM을 고정 크기 블록으로 Push 스트림에 기록 (블록 크기만큼만 복사)"""
+    bytes_per_frame = audio.bytes_per_frame
+    for start, end in pieces:
+        pcm = audio.data[start * bytes_per_frame:end * bytes_per_frame]
+        for offset in range(0, len(pcm), PUSH_BLOCK_BYTES):
+            push_stream.write(bytes(pcm[offset:offset + PUSH_BLOCK_BYTES]))
+    push_stream.close()
+
+def _recognize_pcm_segment(speech_config, audio, pieces, timeout):
+    """Push 스트림으로 세그먼트 하나를 인식하고 offset을 원본 녹음 기준으로 변환 (작업 스레드에서 실행, st 호출 금지)"""
+    push_stream, audio_config = _create_push_stream(audio)
+    recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
+    result = _run_continuous_recognition(recognizer, timeout=timeout, feed=lambda: _feed_push_stream(push_stream, audio, pieces))
+    result["utterances"] = [
+        (segment_offset_to_original(pieces, offset, audio.frame_rate), duration, text, confidence)
+        for offset, duration, text, confidence in result["utterances"]
+    ]
+    return result
+
+def _recognize_segment_with_retry(speech_config, audio, pieces, timeout, index, job_id=None):
+    """일시적 오류(Canceled, 시간 초과 등)는 지수 백오프로 재시도하고, 성공하면 체크포인트에 기록"""
+    for attempt in range(1, SEGMENT_MAX_ATTEMPTS + 1):
+        try:
+            result = _recognize_pcm_segment(speech_config, audio, pieces, timeout)
+        except Exception as e:
+            result = {"utterances": [], "error": str(e)}
+        result["attempts"] = attempt
+        
+        if not result["error"]:
+            if job_id:
+                _append_job_checkpoint(job_id, index, result["utterances"])
+            return result
+        if attempt == SEGMENT_MAX_ATTEMPTS or not _is_retryable_error(result["error"]):
+            return result
+        time.sleep(SEGMENT_RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return result
+
+def parallel_recognition_wav_safe(wav_audio, speech_config, max_workers=MAX_PARALLEL_RECOGNIZERS, regions=None, energy=None, stats=None, job_id=None):
+    """WAV를 무음 경계에서 분할하여 제한된 수의 인식기로 병렬 인식 후 원본 offset 순으로 재조립
+
+    regions는 detect_speech_regions가 반환한 유지 구간 목록이며, 없으면 전체 오디오를 사용한다.
+    job_id가 주어지면 완료된 세그먼트를 체크포인트에 기록하고, 같은 작업이 다시 들어오면 남은 세그먼트만 인식한다.
+    """
+    try:
+        audio = load_wav_audio(wav_audio)
+        segments = plan_segments(audio, regions=regions, energy=energy)
+    except Exception as e:
+        st.error(f"❌ WAV 세그먼트 분할 실패: {e}")
+        return None
+    if not segments:
+        if stats is not None:
+            stats["segments"] = 0
+        return Transcript()
+    
+    frame_rate = audio.frame_rate
+    st.info(f"✂️ 무음 구간 기준으로 {len(segments)}개 세그먼트로 분할, 최대 {max_workers}개 동시 인식")
+    
+    # 이전 실행에서 완료된 세그먼트는 다시 인식하지 않음
+    completed = start_job_checkpoint(job_id, _segment_plan_hash(segments), len(segments)) if job_id else {}
+    if completed:
+        st.info(f"♻️ 이전 작업에서 완료된 {len(completed)}/{len(segments)}개 세그먼트를 이어서 처리합니다.")
+    
+    progress = st.progress(len(completed) / len(segments))
+    status_text = st.empty()
+    utterances = [item for items in completed.values() for item in items]
+    failed = []
+    retried = 0
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for index, pieces in enumerate(segments):
+                if index in completed:
+                    continue
+                duration = sum(end - start for start, end in pieces) / frame_rate
+                future = executor.submit(
+                    _recognize_segment_with_retry,
+                    speech_config, audio, pieces,
+                    _recognition_timeout(duration),
+                    index, job_id
+                )
+                futures[future] = index
+            
+            for done_count, future in enumerate(as_completed(futures), start=len(completed) + 1):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"utterances": [], "error": str(e), "attempts": 1}
+                
+                if result["error"]:
+                    failed.append((index, result["error"]))
+                retried += result.get("attempts", 1) - 1
+                utterances.extend(result["utterances"])
+                
+                progress.progress(done_count / len(segments))
+                status_text.text(f"Azure Speech Service 세그먼트 인식 중... {done_count}/{len(segments)}")
+    except Exception as e:
+        st.error(f"❌ Azure Speech Service 병렬 인식 처리 오류: {e}")
+        return None
+    
+    status_text.text("처리 완료")
+    
+    if stats is not None:
+        stats["segments"] = len(segments)
+        stats["resumed_segments"] = len(completed)
+        stats["retried_attempts"] = retried
+        stats["failed_segments"] = len(failed)
+    
+    if retried:
+        st.info(f"🔁 일시적 오류로 총 {retried}회 세그먼트 재시도")
+    if failed:
+        st.warning(f"⚠️ {len(failed)}개 세그먼트 인식 실패 (완료된 세그먼트는 저장되어 같은 파일을 다시 올리면 이어서 처리됩니다)")
+        for index, error in sorted(failed):
+            st.warning(f"- 세그먼트 #{index + 1}: {error}")
+        if not _is_retryable_error(failed[0][1]):
+            _show_cancellation_guide(failed[0][1])
+            return None
+    
+    if not utterances:
+        st.warning("⚠️ Azure Speech Service에서 인식된 텍스트가 없습니다.")
+        return Transcript()
+    
+    transcript = Transcript.from_utterances(utterances)
+    st.success(f"✅ {len(segments)}개 세그먼트에서 총 {len(utterances)}개 조각 인식 완료")
+    st.info(f"📝 총 텍스트 길이: {len(transcript)}자")
+    return transcript
+
+# WAV 신호 분석 (메모리 매핑된 PCM을 일정 크기 블록 단위로 한 번만 읽음)
+def analyze_wav_signal(source, with_energy=False):
+    """음량, 클리핑, 무음 비율, SNR, 유효 대역폭을 계산하고 처리 전략을 결정한 분석 보고서 반환
+
+    source는 WavAudio, WAV 경로(메모리 매핑), bytes/memoryview 중 하나이다.
+    보고서의 issues가 비어 있지 않으면 인식해도 결과를 얻을 수 없는 입력이다.
+    with_energy=True이면 구간 분할에 재사용할 수 있도록 원본 기준 프레임 에너지를 함께 반환한다.
+    """
+    audio = load_wav_audio(source)
+    frame_rate = audio.frame_rate
+    frame_len = max(1, int(ENERGY_FRAME_SECONDS * frame_rate))
+    block_frames = max(frame_len, int(ANALYSIS_BLOCK_SECONDS * frame_rate) // frame_len * frame_len)
+    bytes_per_frame = audio.bytes_per_frame
+    window = np.hanning(ANALYSIS_FFT_SIZE).astype(np.float32)
+    
+    sum_squares, peak, clipped, total_samples = 0.0, 0.0, 0, 0
+    spectrum = np.zeros(ANALYSIS_FFT_SIZE // 2 + 1, dtype=np.float64)
+    energies = []
+    for start in range(0, audio.n_frames, block_frames):
+        end = min(start + block_frames, audio.n_frames)
+        samples = _pcm_to_float(audio.data[start * bytes_per_frame:end * bytes_per_frame], audio.sample_width)
+        magnitude = np.abs(samples)
+        if len(magnitude):
+            peak = max(peak, float(magnitude.max()))
+        clipped += int(np.count_nonzero(magnitude >= ANALYSIS_CLIP_LEVEL))
+        total_samples += len(samples)
+        
+        if audio.channels > 1:
+            usable = len(samples) - len(samples) % audio.channels
+            samples = samples[:usable].reshape(-1, audio.channels).mean(axis=1)
+        sum_squares += float(np.dot(samples, samples))
+        energies.append(_frame_energy(samples, frame_len))
+        
+        # 겹치지 않는 FFT 프레임의 파워 스펙트럼 누적 (Welch 방식 평균)
+        n_fft_frames = len(samples) // ANALYSIS_FFT_SIZE
+        if n_fft_frames:
+            frames = samples[:n_fft_frames * ANALYSIS_FFT_SIZE].reshape(n_fft_frames, ANALYSIS_FFT_SIZE)
+            frames = (frames - frames.mean(axis=1, keepdims=True)) * window
+            spectrum += (np.abs(np.fft.rfft(frames, axis=1)) ** 2).sum(axis=0)
+    
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    mono_samples = total_samples // max(audio.channels, 1)
+    rms = np.sqrt(sum_squares / mono_samples) if mono_samples else 0.0
+    
+    # 무음 비율은 VAD와 같은 임계값, SNR은 상위 에너지 구간(발화)과 잡음 바닥의 차이로 추정
+    silence_ratio, snr_db = 1.0, 0.0
+    if len(energy):
+        level_db, noise_floor, threshold = _speech_threshold(energy)
+        silence_ratio = 1.0 - float(np.count_nonzero(level_db > threshold)) / len(energy)
+        snr_db = min(float(np.percentile(level_db, 95) - noise_floor), 100.0)
+    
+    bandwidth_hz = 0.0
+    if spectrum.max() > 0:
+        level = 10 * np.log10(spectrum / spectrum.max() + 1e-20)
+        bandwidth_hz = int(np.flatnonzero(level > -ANALYSIS_BANDWIDTH_FLOOR_DB)[-1]) * frame_rate / ANALYSIS_FFT_SIZE
+    
+    report = {
+        "duration_seconds": audio.duration,
+        "rms_dbfs": float(20 * np.log10(rms + 1e-10)),
+        "peak_dbfs": float(20 * np.log10(peak + 1e-10)),
+        "clipping_ratio": clipped / total_samples if total_samples else 0.0,
+        "silence_ratio": silence_ratio,
+        "snr_db": float(snr_db),
+        "bandwidth_hz": float(bandwidth_hz),
+    }
+    report.update(_assess_signal(audio, report))
+    return (report, energy) if with_energy else report
+
+def _assess_signal(audio, report):
+    """분석 수치로 차단 사유, 경고, 품질 점수, 처리 전략 결정"""
+    issues, warnings = [], []
+    score = 100
+    
+    if report["rms_dbfs"] < ANALYSIS_MIN_RMS_DBFS:
+        issues.append(f"녹음이 거의 무음입니다 (평균 음량 {report['rms_dbfs']:.0f} dBFS)")
+    elif report["silence_ratio"] > ANALYSIS_MAX_SILENCE_RATIO:
+        issues.append(f"음성 구간이 거의 없습니다 (무음 비율 {report['silence_ratio'] * 100:.1f}%)")
+    
+    if report["clipping_ratio"] > ANALYSIS_WARN_CLIPPING_RATIO:
+        score -= 30 if report["clipping_ratio"] > ANALYSIS_WARN_CLIPPING_RATIO * 10 else 10
+        warnings.append(f"클리핑(음량 포화)이 {report['clipping_ratio'] * 100:.2f}% 발생했습니다. 녹음 입력 음량을 낮추세요")
+    if report["snr_db"] < ANALYSIS_WARN_SNR_DB:
+        score -= 30 if report["snr_db"] < ANALYSIS_WARN_SNR_DB / 2 else 15
+        warnings.append(f"배경 잡음이 큽니다 (SNR {report['snr_db']:.0f} dB). 조용한 환경의 녹음을 권장합니다")
+    if report["bandwidth_hz"] < ANALYSIS_WARN_BANDWIDTH_HZ:
+        score -= 20
+        warnings.append(f"유효 대역폭이 {report['bandwidth_hz'] / 1000:.1f}kHz로 좁습니다 (전화 음질). 인식 정확도가 낮을 수 있습니다")
+    if report["rms_dbfs"] < ANALYSIS_WARN_RMS_DBFS:
+        score -= 15
+        warnings.append(f"음량이 작습니다 (평균 {report['rms_dbfs']:.0f} dBFS)")
+    
+    return {
+        "quality_score": 0 if issues else max(0, score),
+        "issues": issues,
+        "warnings": warnings,
+        "strategy": {
+            "normalize": needs_normalization(audio),
+            "vad": report["silence_ratio"] >= ANALYSIS_VAD_MIN_SILENCE_RATIO,
+            "windowed": audio.duration > STREAM_WINDOW_SECONDS + STREAM_WINDOW_SEARCH_SECONDS,
+        },
+    }
+
 # WAV 파일 품질 검사 함수
 def check_wav_quality_for_azure(wav_file_path):
-    """Azure Speech Service 최적화를 위한 WAV 파일 품질 검사"""
+    """Azure Speech Service 인식 적합성 검사 (헤더가 아닌 신호 분석 결과 기반)"""
     try:
-        with wave.open(wav_file_path, 'rb') as wav_file:
-            params = wav_file.getparams()
-            
-            quality_score = 100
-            recommendations = []
-            
-            # Azure Speech Service 최적 설정 기준으로 점수 계산
-            if params.nchannels > 2:
-                quality_score -= 20
-                recommendations.append("채널을 1-2개로 줄이세요")
-            elif params.nchannels == 1:
-                quality_score += 10  # 모노 채널 보너스
-            
-            if params.sampwidth != 2:  # 16-bit
-                quality_score -= 30
-                recommendations.append("16-bit로 변환하세요")
-            
-            if params.framerate < 16000:
-                quality_score -= 25
-                recommendations.append("16kHz 이상으로 업샘플링하세요")
-            elif params.framerate == 16000:
-                quality_score += 15  # 16kHz 보너스
-            elif params.framerate > 48000:
-                quality_score -= 10
-                recommendations.append("48kHz 이하로 다운샘플링하세요")
-            
-            return {
-                "quality_score": max(0, quality_score),
-                "recommendations": recommendations,
-                "azure_optimized": quality_score >= 90
-            }
-            
+        report = analyze_wav_signal(wav_file_path)
     except Exception as e:
         return {
             "quality_score": 0,
             "recommendations": [f"파일 분석 실패: {e}"],
             "azure_optimized": False
         }
+    
+    # 형식 관련 권장사항은 인식 전 정규화 단계에서 자동으로 처리됨
+    recommendations = report["issues"] + report["warnings"]
+    if report["strategy"]["normalize"]:
+        recommendations.append("인식 전에 16kHz / 모노 / 16-bit PCM으로 자동 변환됩니다")
+    
+    return {
+        "quality_score": report["quality_score"],
+        "recommendations": recommendations,
+        "azure_optimized": report["quality_score"] >= 90,
+        "auto_normalized": report["strategy"]["normalize"],
+        "signal": report
+    }
 
 # 레거시 함수명 호환성 유지 (WAV 전용으로 변경)
 def validate_and_prepare_audio(file_data, file_name):
@@ -0,0 +1,315 @@
+import json
+import streamlit as st
+from jsonschema import Draft202012Validator
+from langchain_core.messages import HumanMessage, SystemMessage
+from utils.json_stream import extract_json_object
+
+# 분석/코드 개선 단계의 JSON 응답 스키마 검증 및 부분 복구
+# 응답은 JSON 모드로 요청하고, 스키마에 맞지 않는 필드만 골라 작은 복구 요청으로 고친다 (전체 재생성 없음).
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+REPAIR_CONTEXT_STRING_LIMIT = 200   # 복구 요청에 참고용으로 넣는 문서의 문자열 길이 상한
+# 원본 코드에서 옮겨 적어야 하는 필드 - 복구 요청에는 원본 코드가 없으므로 모델이 지어내지 않도록 복구하지 않고 오류로 남긴다
+UNREPAIRABLE_FIELDS = {"improved_code", "search"}
+
+_TEXT = {"type": "string"}
+_COUNT = {"type": ["integer", "string"]}
+
+REQUIREMENTS_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "required": ["ui_requirements", "user_feedback", "summary"],
+    "properties": {
+        "ui_requirements": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["category", "current_issue", "improvement_request", "priority", "technical_detail"],
+                "properties": {
+                    "category": _TEXT,
+                    "current_issue": _TEXT,
+                    "improvement_request": _TEXT,
+                    "priority": {"enum": ["high", "medium", "low"]},
+                    "technical_detail": _TEXT,
+                    "user_impact": _TEXT,
+                },
+            },
+        },
+        "user_feedback": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["feedback", "pain_point", "suggested_solution"],
+                "properties": {
+                    "feedback": _TEXT,
+                    "pain_point": _TEXT,
+                    "suggested_solution": _TEXT,
+                },
+            },
+        },
+        "summary": {
+            "type": "object",
+            "required": ["total_requirements", "high_priority_count", "main_focus_areas"],
+            "properties": {
+                "total_requirements": _COUNT,
+                "high_priority_count": _COUNT,
+                "main_focus_areas": {"type": "array", "items": _TEXT},
+                "expected_outcome": _TEXT,
+            },
+        },
+    },
+}
+
+_APPLIED_CHANGES = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "required": ["requirement", "change_description", "code_section"],
+        "properties": {
+            "requirement": _TEXT,
+            "change_description": _TEXT,
+            "code_section": _TEXT,
+            "before_after": _TEXT,
+        },
+    },
+}
+
+# 회의 결과 기반 UI 개선 페이지: 문장 형태의 summary
+CODE_IMPROVEMENT_SCHEMA = {
+    "type": "object",
+    "required": ["applied_changes", "improved_code", "summary"],
+    "properties": {
+        "applied_changes": _APPLIED_CHANGES,
+        "improved_code": {"type": "string", "minLength": 1},
+        "summary": _TEXT,
+    },
+}
+
+# 통합 UI 개선 페이지: technical_improvements와 객체 형태의 summary
+INTEGRATED_CODE_IMPROVEMENT_SCHEMA = {
+    "type": "object",
+    "required": ["applied_changes", "improved_code", "summary"],
+    "properties": {
+        "applied_changes": _APPLIED_CHANGES,
+        "improved_code": {"type": "string", "minLength": 1},
+        "technical_improvements": {"type": "array", "items": _TEXT},
+        "summary": {
+            "type": "object",
+            "properties": {
+                "total_changes": _COUNT,
+                "main_improvements": {"type": "array", "items": _TEXT},
+                "expected_benefits": _TEXT,
+            },
+        },
+    },
+}
+
+# 패치 모드: improved_code 대신 변경사항마다 search/replace 편집을 받는다 (utils.code_patch에서 적용)
+_PATCH_CHANGES = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "required": ["requirement", "change_description", "search", "replace"],
+        "properties": {
+            "requirement": _TEXT,
+            "change_description": _TEXT,
+            "search": {"type": "string", "minLength": 1},
+            "replace": _TEXT,
+        },
+    },
+}
+
+CODE_PATCH_SCHEMA = {
+    "type": "object",
+    "required": ["applied_changes", "summary"],
+    "properties": {
+        "applied_changes": _PATCH_CHANGES,
+        "summary": _TEXT,
+    },
+}
+
+INTEGRATED_CODE_PATCH_SCHEMA = {
+    "type": "object",
+    "required": ["applied_changes", "summary"],
+    "properties": {
+        "applied_changes": _PATCH_CHANGES,
+        "technical_improvements": INTEGRATED_CODE_IMPROVEMENT_SCHEMA["properties"]["technical_improvements"],
+        "summary": INTEGRATED_CODE_IMPROVEMENT_SCHEMA["properties"]["summary"],
+    },
+}
+
+REPAIR_SYSTEM_PROMPT = """
+당신은 JSON 응답에서 스키마에 맞지 않는 필드만 고치는 도구입니다.
+
+각 수정 대상에는 path(문서 내 위치), value(현재 값, 없으면 null), schema(만족해야 하는 JSON Schema), errors(검증 오류)가 주어집니다.
+context는 참고용 전체 문서이며 긴 문자열은 잘려 있습니다.
+
+**규칙:**
+- 주어진 path의 값만 schema에 맞도록 고치고, 기존 내용과 의미는 최대한 유지
+- 누락된 값은 context의 내용으로 합리적으로 채움
+- 다른 설명 없이 아래 형식의 JSON으로만 답변
+
+{"fixes": [{"path": ["필드", 0], "value": "수정된 값"}]}
+"""
+
+
+def schema_errors(data, schema):
+    """스키마 검증 오류 목록 (문서 순서)"""
+    return sorted(Draft202012Validator(schema).iter_errors(data), key=lambda error: list(map(str, error.absolute_path)))
+
+
+def format_schema_error(error):
+    path = "/".join(str(part) for part in error.absolute_path) or "(root)"
+    return f"{path}: {error.message}"
+
+
+def validate_structured_response(llm, data, schema, stage):
+    """파싱된 응답을 스키마로 검증하고, 잘못된 필드만 복구 요청으로 고쳐서 (data, 남은 오류 메시지 목록) 반환
+
+    data가 None(응답에서 JSON 객체를 찾지 못함)이면 복구하지 않고 오류로 반환한다 (전체 재생성 없음).
+    """
+    if data is None:
+        return None, ["응답에서 JSON 객체를 찾지 못했습니다"]
+
+    errors = schema_errors(data, schema)
+    if not errors:
+        return data, []
+
+    try:
+        fixed = _repair_fields(llm, data, errors, schema)
+    except Exception as e:
+        print(f"{stage} 응답 복구 실패: {e}")
+        fixed = 0
+
+    remaining = schema_errors(data, schema)
+    if fixed:
+        st.caption(f"🩹 형식이 맞지 않는 필드 {fixed}개를 부분 복구했습니다")
+    return data, [format_schema_error(error) for error in remaining]
+
+
+def render_schema_errors(errors):
+    """복구되지 않은 스키마 오류 표시 (결과는 그대로 사용)"""
+    if errors:
+        with st.expander(f"⚠️ 형식이 맞지 않는 필드 {len(errors)}개 (복구되지 않음)"):
+            for message in errors:
+                st.write(f"- {message}")
+
+
+def _is_repairable(error, target):
+    """원본 코드가 있어야 고칠 수 있는 필드(UNREPAIRABLE_FIELDS)와 관련된 오류/대상이 아닌지 확인"""
+    if UNREPAIRABLE_FIELDS & set(map(str, target)) or UNREPAIRABLE_FIELDS & set(map(str, error.absolute_path)):
+        return False
+    if error.validator == "required" and list(error.absolute_path) == list(target):
+        # 배열 원소 안의 필드 누락 (최상위 필드 누락은 키별 대상으로 이미 나뉨)
+        return not UNREPAIRABLE_FIELDS & {key for key in error.validator_value if key not in error.instance}
+    return True
+
+
+def _repair_targets(errors):
+    """오류마다 고칠 최소 단위(최상위 필드 또는 배열 원소)의 경로"""
+    targets = []
+    for error in errors:
+        path = list(error.absolute_path)
+        if not path and error.validator == "required":
+            # 최상위 필드 누락: 누락된 키 각각이 복구 대상
+            candidates = [(key,) for key in error.validator_value if key not in error.instance]
+        elif not path:
+            candidates = [()]
+        elif len(path) >= 2 and isinstance(path[1], int):
+            candidates = [tuple(path[:2])]
+        else:
+            candidates = [tuple(path[:1])]
+
+        for target in candidates:
+            if target not in targets:
+                targets.append(target)
+    return targets
+
+
+def _repair_fields(llm, data, errors, schema):
+    """오류가 있는 필드만 담은 작은 요청으로 수정값을 받아 data에 반영하고, 반영한 필드 수 반환"""
+    errors_by_target, skipped = {}, set()
+    for error in errors:
+        for target in _repair_targets([error]):
+            errors_by_target.setdefault(target, []).append(error.message)
+            if not _is_repairable(error, target):
+                skipped.add(target)
+    if () in errors_by_target:
+        return 0  # 문서 전체가 객체가 아닌 경우는 필드 단위로 고칠 수 없음
+    # improved_code/search 관련 대상은 복구하지 않고 남은 오류로 보고
+    targets = [target for target in errors_by_target if target not in skipped]
+    if not targets:
+        return 0
+
+    request = {
+        "targets": [
+            {
+                "path": list(target),
+                "value": _get_path(data, target),
+                "schema": _subschema(schema, target),
+                "errors": errors_by_target[target],
+            }
+            for target in targets
+        ],
+        "context": _compact(data),
+    }
+    messages = [
+        SystemMessage(content=REPAIR_SYSTEM_PROMPT),
+        HumanMessage(content=json.dumps(request, ensure_ascii=False)),
+    ]
+    response = llm.invoke(messages, response_format=JSON_RESPONSE_FORMAT)
+    fixes = (extract_json_object(response.content, expected_keys=("fixes",)) or {}).get("fixes") or []
+
+    fixed = 0
+    for fix in fixes:
+        if not isinstance(fix, dict) or not isinstance(fix.get("path"), list):
+            continue
+        target = tuple(fix["path"])
+        value = fix.get("value")
+        original = _get_path(data, target)
+        if isinstance(original, dict) and isinstance(value, dict):
+            # 같은 원소의 다른 필드를 고치면서 원본 코드에서 온 값(search 등)을 바꾸지 않도록 원래 값 유지
+            value = {**value, **{key: original[key] for key in UNREPAIRABLE_FIELDS if key in original}}
+        if target in targets and _set_path(data, target, value):
+            fixed += 1
+    return fixed
+
+
+def _subschema(schema, path):
+    for key in path:
+        schema = schema.get("items", {}) if isinstance(key, int) else schema.get("properties", {}).get(key, {})
+    return schema
+
+
+def _get_path(data, path):
+    value = data
+    for key in path:
+        if isinstance(key, int) and isinstance(value, list) and key < len(value):
+            value = value[key]
+        elif isinstance(key, str) and isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return None
+    return value
+
+
+def _set_path(data, path, value):
+    parent = _get_path(data, path[:-1])
+    key = path[-1]
+    if isinstance(key, int) and isinstance(parent, list) and key < len(parent):
+        parent[key] = value
+    elif isinstance(key, str) and isinstance(parent, dict):
+        parent[key] = value
+    else:
+        return False
+    return True
+
+
+def _compact(value):
+    """복구 요청의 참고 문맥용으로 긴 문자열을 잘라낸 사본"""
+    if isinstance(value, str):
+        return value if len(value) <= REPAIR_CONTEXT_STRING_LIMIT else value[:REPAIR_CONTEXT_STRING_LIMIT] + "…"
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    return value
@@ -0,0 +1,205 @@
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+import streamlit as st
+
+# 프롬프트 토큰 수 계산, 토큰 예산 단위 텍스트 분할 및 실행 방식(한 번에/구간 분할/map-reduce) 결정
+# tiktoken 인코딩을 한 번만 로드하여 재사용하며, 인코딩 파일을 받을 수 없는 환경에서는 UTF-8 바이트 수로 근사한다.
+# Azure를 호출하기 전에 입력이 배포의 컨텍스트 창에 들어가는지 확인하여, 왕복 후에야 실패하는 일을 막는다.
+
+TOKEN_ENCODING = "o200k_base"    # GPT-4o / GPT-4.1 계열 토크나이저
+BYTES_PER_TOKEN_ESTIMATE = 4     # tiktoken을 사용할 수 없을 때의 근사치 (한국어 포함 텍스트 기준 보수적)
+MESSAGE_OVERHEAD_TOKENS = 4      # 메시지마다 붙는 역할/구분 토큰
+
+# 배포 이름에 포함된 모델명 → (컨텍스트 창, 최대 출력 토큰). 앞에서부터 먼저 일치하는 항목을 사용한다.
+# 배포별로 다르게 설정하려면 LLM_CONTEXT_WINDOW_<배포 이름> 환경변수(대문자, '-'/'.'는 '_')를 지정한다.
+MODEL_LIMITS = (
+    ("gpt-4.1", (1_047_576, 32_768)),
+    ("gpt-4o", (128_000, 16_384)),
+    ("gpt-4-turbo", (128_000, 4_096)),
+    ("gpt-4-32k", (32_768, 4_096)),
+    ("gpt-4", (8_192, 4_096)),
+    ("gpt-35-turbo", (16_385, 4_096)),
+)
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", 128_000))
+DEFAULT_MAX_OUTPUT_TOKENS = 16_384
+
+EXECUTION_MODES = {
+    "single": "한 번에 처리",
+    "chunked": "구간별로 나누어 처리",
+    "map_reduce": "구간별 요약 후 통합 (map-reduce)",
+    "too_large": "한도 초과",
+}
+
+ExecutionPlan = namedtuple("ExecutionPlan", [
+    "deployment", "context_window", "part_tokens", "input_tokens", "output_tokens",
+    "mode", "chunk_tokens", "chunk_count",
+])
+
+_SENTENCE_END = re.compile(r'(?<=[.!?。])\s+|\n+')
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            print(f"tiktoken 인코딩 로드 실패, 바이트 수로 토큰을 근사합니다: {e}")
+    return _encoding
+
+
+def token_counts_are_exact():
+    """tiktoken으로 정확히 계산하는지 여부 (False이면 바이트 수 기반 근사치)"""
+    return _get_encoding() is not None
+
+
+@lru_cache(maxsize=64)
+def count_tokens(text):
+    """텍스트의 토큰 수 (tiktoken을 사용할 수 없으면 근사치)
+
+    Streamlit은 위젯 조작마다 스크립트를 다시 실행하므로 같은 입력의 결과는 캐시한다.
+    """
+    return _count_tokens(text)
+
+
+def _count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN_ESTIMATE)
+
+
+def split_text_by_tokens(text, max_tokens):
+    """줄/문장 경계를 유지하면서 각 조각이 max_tokens를 넘지 않도록 텍스트 분할
+
+    한 줄(문장)이 max_tokens보다 길면 토큰(또는 근사 바이트) 단위로 잘라서 넣는다.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens는 0보다 커야 합니다")
+
+    chunks, current, current_tokens = [], [], 0
+    for unit in _split_units(text):
+        tokens = _count_tokens(unit)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_hard_split(unit, max_tokens))
+            continue
+        if current and current_tokens + tokens + 1 > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _split_units(text):
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if _count_tokens(line) <= 256:
+            yield line
+        else:
+            # 줄바꿈 없이 이어지는 녹취록은 문장 단위로 나눈다
+            yield from (sentence for sentence in _SENTENCE_END.split(line) if sentence.strip())
+
+
+def _hard_split(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+    # 근사 모드: 문자 수 기준으로 자르되 바이트 예산을 넘지 않도록 보수적으로 계산
+    max_chars = max(1, max_tokens * BYTES_PER_TOKEN_ESTIMATE // 3)
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def model_limits(deployment):
+    """배포의 (컨텍스트 창, 최대 출력 토큰)"""
+    name = (deployment or "").lower()
+    window, max_output = DEFAULT_CONTEXT_WINDOW, DEFAULT_MAX_OUTPUT_TOKENS
+    for model, limits in MODEL_LIMITS:
+        if model in name:
+            window, max_output = limits
+            break
+
+    override = os.getenv("LLM_CONTEXT_WINDOW_" + re.sub(r'[^0-9A-Za-z]', '_', deployment or "").upper())
+    if override:
+        window = int(override)
+    return window, max_output
+
+
+def plan_execution(deployment, parts, output_tokens, chunk_part=None, strategy="map_reduce", echo_part=None,
+                   max_single_pass_tokens=None, max_chunk_tokens=None):
+    """호출 전에 입력 토큰을 세어 실행 방식을 결정
+
+    parts는 {항목 이름: 텍스트 또는 미리 추정한 토큰 수} (예: 시스템 프롬프트, 회의록, 요구사항 JSON, 코드)이며
+    각 항목이 하나의 메시지로 전달된다고 본다. 응답이 echo_part 항목을 다시 담아 돌려주는 경우(개선된 전체 코드 등)
+    예상 출력은 output_tokens + 해당 항목의 토큰 수이며, 배포의 최대 출력 토큰도 넘지 않아야 한다.
+
+    입력과 출력이 컨텍스트 창(max_single_pass_tokens가 있으면 그 값)에 들어가면 "single",
+    아니면 chunk_part 항목을 나누어 strategy("chunked" 또는 "map_reduce")로 처리하며, 나눌 수 없으면 "too_large"이다.
+    """
+    part_tokens = {
+        name: count_tokens(value) if isinstance(value, str) else int(value) for name, value in parts.items()
+    }
+    input_tokens = sum(part_tokens.values()) + MESSAGE_OVERHEAD_TOKENS * len(parts)
+    window, max_output = model_limits(deployment)
+    expected_output = output_tokens + part_tokens.get(echo_part, 0)
+
+    def make_plan(mode, chunk_tokens=0, chunk_count=1):
+        return ExecutionPlan(deployment, window, part_tokens, input_tokens, min(expected_output, max_output),
+                             mode, chunk_tokens, chunk_count)
+
+    single_limit = window - min(expected_output, max_output)
+    if max_single_pass_tokens is not None:
+        single_limit = min(single_limit, max_single_pass_tokens)
+    if input_tokens <= single_limit and expected_output <= max_output:
+        return make_plan("single")
+
+    if chunk_part is None:
+        return make_plan("too_large")
+
+    # 나눌 항목 외의 입력(시스템 프롬프트 등)은 구간마다 반복해서 전달된다
+    chunk_room = single_limit - (input_tokens - part_tokens[chunk_part])
+    if echo_part == chunk_part:
+        chunk_room = min(chunk_room, max_output - output_tokens)
+    if max_chunk_tokens is not None:
+        chunk_room = min(chunk_room, max_chunk_tokens)
+    if chunk_room <= 0:
+        return make_plan("too_large")
+    return make_plan(strategy, chunk_room, -(-part_tokens[chunk_part] // chunk_room))
+
+
+def render_execution_plan(plan, labels=None):
+    """실행 버튼 앞에 표시할 토큰 예상치와 실행 방식 (컨텍스트 창을 넘으면 오류로 표시)"""
+    labels = labels or {}
+    breakdown = " · ".join(f"{labels.get(name, name)} {tokens:,}" for name, tokens in plan.part_tokens.items())
+    usage = (plan.input_tokens + plan.output_tokens) / plan.context_window * 100
+    approx = "" if token_counts_are_exact() else " (근사치)"
+    st.caption(
+        f"🧮 예상 토큰{approx}: 입력 {plan.input_tokens:,} ({breakdown}) + 출력 최대 {plan.output_tokens:,} · "
+        f"컨텍스트 창 {plan.context_window:,} 중 {usage:.0f}%"
+    )
+
+    mode = EXECUTION_MODES[plan.mode]
+    if plan.mode == "too_large":
+        st.error(f"❌ 입력 또는 예상 출력이 {plan.deployment or '모델'}의 한도를 넘습니다. 입력을 줄인 뒤 다시 시도해주세요.")
+    elif plan.mode == "single":
+        st.caption(f"⚙️ 실행 방식: {mode}")
+    else:
+        st.caption(f"⚙️ 실행 방식: {mode} · {plan.chunk_count}개 구간 (구간당 최대 {plan.chunk_tokens:,} 토큰)")
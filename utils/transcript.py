@@ -0,0 +1,148 @@
+import numpy as np
+
+# 음성 인식 결과를 발화 단위로 보관하는 녹취록 모델
+# 발화별 offset/길이/신뢰도는 numpy 배열 컬럼으로, 텍스트는 하나의 문자열로 저장하여
+# 수 시간 분량의 녹취록도 발화 수만큼의 파이썬 객체 없이 st.session_state에 작게 유지된다.
+
+TICKS_PER_SECOND = 10_000_000    # Azure Speech offset 단위 (100ns)
+
+
+class Transcript(str):
+    """발화 단위 offset/길이/신뢰도를 배열 컬럼으로 가진 녹취록
+
+    문자열 값은 발화 텍스트를 공백으로 이어 붙인 전체 녹취록이므로 기존처럼 str로 사용할 수 있다.
+    i번째 발화의 텍스트는 self[text_starts[i]:text_ends[i]]이며, offset/duration은 원본 녹음 기준 100ns 단위이다.
+    """
+
+    def __new__(cls, text="", offsets=(), durations=(), text_starts=(), text_ends=(), confidences=()):
+        transcript = super().__new__(cls, text)
+        transcript.offsets = np.asarray(offsets, dtype=np.int64)
+        transcript.durations = np.asarray(durations, dtype=np.int64)
+        transcript.text_starts = np.asarray(text_starts, dtype=np.int64)
+        transcript.text_ends = np.asarray(text_ends, dtype=np.int64)
+        transcript.confidences = np.asarray(confidences, dtype=np.float32)  # 알 수 없으면 NaN
+        return transcript
+
+    def __reduce__(self):
+        return (self.__class__, (str(self), self.offsets, self.durations, self.text_starts, self.text_ends, self.confidences))
+
+    @classmethod
+    def from_utterances(cls, utterances):
+        """(offset, duration, text, confidence) 목록을 offset 순으로 정렬하여 녹취록 생성"""
+        utterances = sorted(utterances, key=lambda item: item[0])
+        lengths = np.fromiter((len(item[2]) for item in utterances), dtype=np.int64, count=len(utterances))
+        text_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])) if len(lengths) else lengths
+        return cls(
+            " ".join(item[2] for item in utterances),
+            [item[0] for item in utterances],
+            [item[1] for item in utterances],
+            text_starts,
+            text_starts + lengths,
+            [np.nan if item[3] is None else item[3] for item in utterances],
+        )
+
+    @classmethod
+    def concat(cls, transcripts):
+        """시간 순서대로 인식된 녹취록들을 하나로 이어 붙임 (각 녹취록의 offset은 이미 원본 기준이어야 함)"""
+        transcripts = [transcript for transcript in transcripts if transcript]
+        if not transcripts:
+            return cls()
+
+        bases = np.cumsum([0] + [len(transcript) + 1 for transcript in transcripts[:-1]])
+        return cls(
+            " ".join(transcripts),
+            np.concatenate([t.offsets for t in transcripts]),
+            np.concatenate([t.durations for t in transcripts]),
+            np.concatenate([t.text_starts + base for t, base in zip(transcripts, bases)]),
+            np.concatenate([t.text_ends + base for t, base in zip(transcripts, bases)]),
+            np.concatenate([t.confidences for t in transcripts]),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """to_dict 결과(또는 텍스트만 있는 이전 캐시 항목)로부터 녹취록 복원"""
+        columns = data.get("segments") or {}
+        return cls(
+            data.get("text") or "",
+            columns.get("offsets", ()),
+            columns.get("durations", ()),
+            columns.get("text_starts", ()),
+            columns.get("text_ends", ()),
+            columns.get("confidences", ()),
+        )
+
+    def to_dict(self):
+        """JSON으로 저장할 수 있는 형태로 변환"""
+        return {
+            "text": str(self),
+            "segments": {
+                "offsets": self.offsets.tolist(),
+                "durations": self.durations.tolist(),
+                "text_starts": self.text_starts.tolist(),
+                "text_ends": self.text_ends.tolist(),
+                "confidences": [None if np.isnan(value) else round(float(value), 4) for value in self.confidences],
+            },
+        }
+
+    def shifted(self, ticks):
+        """모든 offset을 ticks만큼 이동한 녹취록 (구간 단위 인식 결과를 원본 기준으로 맞출 때 사용)"""
+        return self.__class__(str(self), self.offsets + ticks, self.durations, self.text_starts, self.text_ends, self.confidences)
+
+    @property
+    def utterance_count(self):
+        return len(self.offsets)
+
+    @property
+    def duration_seconds(self):
+        """마지막 발화가 끝나는 시각 (초)"""
+        if not self.utterance_count:
+            return 0.0
+        return float((self.offsets + self.durations).max()) / TICKS_PER_SECOND
+
+    @property
+    def mean_confidence(self):
+        """신뢰도가 있는 발화들의 평균 신뢰도 (없으면 None)"""
+        known = self.confidences[~np.isnan(self.confidences)]
+        return float(known.mean()) if len(known) else None
+
+    def utterance(self, index):
+        """i번째 발화를 (시작 초, 길이 초, 텍스트, 신뢰도)로 반환"""
+        confidence = float(self.confidences[index])
+        return (
+            self.offsets[index] / TICKS_PER_SECOND,
+            self.durations[index] / TICKS_PER_SECOND,
+            str.__getitem__(self, slice(int(self.text_starts[index]), int(self.text_ends[index]))),
+            None if np.isnan(confidence) else confidence,
+        )
+
+    def iter_utterances(self):
+        for index in range(self.utterance_count):
+            yield self.utterance(index)
+
+    def slice_time(self, start_seconds=0.0, end_seconds=None):
+        """[start_seconds, end_seconds) 사이에 시작하는 발화만 담은 녹취록 (텍스트 재파싱 없이 배열 검색)"""
+        low = int(np.searchsorted(self.offsets, int(start_seconds * TICKS_PER_SECOND), side='left'))
+        high = self.utterance_count if end_seconds is None else int(
+            np.searchsorted(self.offsets, int(end_seconds * TICKS_PER_SECOND), side='left'))
+        if high <= low:
+            return self.__class__()
+
+        text_base = int(self.text_starts[low])
+        return self.__class__(
+            str.__getitem__(self, slice(text_base, int(self.text_ends[high - 1]))),
+            self.offsets[low:high],
+            self.durations[low:high],
+            self.text_starts[low:high] - text_base,
+            self.text_ends[low:high] - text_base,
+            self.confidences[low:high],
+        )
+
+    def to_timestamped_text(self):
+        """발화마다 [시:분:초] 타임스탬프를 붙인 텍스트 (발화 정보가 없으면 전체 텍스트)"""
+        if not self.utterance_count:
+            return str(self)
+        lines = []
+        for start, _, text, _ in self.iter_utterances():
+            minutes, seconds = divmod(int(start), 60)
+            lines.append(f"[{minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}] {text}")
+        return "\n".join(lines)
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import threading
+from typing import Any
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from utils.rag_index import tokenize
+from utils.rag_ingest import RAG_DOCS_DIR, load_manifest, manifest_chunks, manifest_fingerprint
+
+# rag-docs 구간 임베딩을 저장하는 로컬 벡터 저장소 (별도 서비스 없음)
+# 임베딩은 float32 행렬 파일(vectors.f32)에, 구간 텍스트/출처와 임베딩 모델 정보는 meta.json에 저장한다.
+# 두 파일은 세대(generation) 디렉터리에 함께 기록하고, 모두 기록한 뒤 CURRENT 파일 하나를 교체하여 새 세대로 전환한다.
+# (중간에 실패하면 CURRENT가 이전 세대를 그대로 가리키므로 벡터와 메타데이터가 서로 다른 세대로 섞이지 않는다)
+# 시작 시 행렬을 메모리에 읽지 않고 memory-map하며, 검색은 정규화된 벡터의 내적(코사인 유사도)과 argpartition으로 상위 k개를 고른다.
+# 구간이 수만 개로 늘어도 검색 한 번은 행렬-벡터 곱 한 번이다.
+# 문서가 바뀌면 이전 저장소에 같은 텍스트의 구간이 있는 경우 그 벡터를 복사하고, 새 구간만 임베딩한다.
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAG_VECTOR_STORE_DIR = os.getenv("RAG_VECTOR_STORE_DIR", os.path.join(_ROOT, ".cache", "rag_vectors"))
+RAG_EMBEDDER = os.getenv("RAG_EMBEDDER", "azure" if os.getenv("AZURE_OPENAI_EMBEDDING") else "hashing")
+EMBEDDING_BATCH_SIZE = 64       # 임베딩 요청 한 번에 보내는 구간 수
+HASHING_EMBEDDING_DIM = 512
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"        # 현재 세대 디렉터리 이름
+GENERATION_PREFIX = "gen-"
+
+
+class HashingEmbeddings(Embeddings):
+    """토큰 해싱 기반의 결정적 로컬 임베딩 (네트워크 없이 동작, 테스트/오프라인용 대체 임베더)
+
+    tokenize()의 토큰을 crc32로 차원에 배정하고 부호를 나누어 더한 뒤 L2 정규화한다.
+    """
+
+    def __init__(self, dim=HASHING_EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = zlib.crc32(token.encode("utf-8"))
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+class MmapVectorStore:
+    """memory-map한 float32 임베딩 행렬 + 구간 메타데이터"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            generation = f.read().strip()
+        directory = os.path.join(path, generation)
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.path = path
+        self.generation = generation
+        self.embedder_name = meta["embedder"]
+        self.fingerprint = meta["fingerprint"]
+        self.chunks = meta["chunks"]
+        self.dim = meta["dim"]
+        self.embedded_count = 0   # build()에서 새로 임베딩한 구간 수
+        shape = (len(self.chunks), self.dim)
+        self.vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float32, mode="r", shape=shape) \
+            if self.chunks else np.zeros(shape, dtype=np.float32)
+
+    @classmethod
+    def build(cls, path, chunks, embedder, embedder_name, fingerprint=None, batch_size=EMBEDDING_BATCH_SIZE,
+              previous=None):
+        """구간을 batch_size개씩 임베딩하여 새 세대 디렉터리의 행렬 파일에 바로 기록 (전체 행렬을 메모리에 모으지 않음)
+
+        previous(같은 임베더의 이전 저장소)에 같은 텍스트의 구간이 있으면 임베딩하지 않고 벡터를 복사한다.
+        행렬과 meta.json을 모두 기록한 뒤 CURRENT를 교체하므로, 중간에 실패해도 이전 저장소는 그대로 남는다.
+        """
+        reusable = {}
+        if previous is not None and previous.embedder_name == embedder_name:
+            reusable = {chunk["text"]: number for number, chunk in enumerate(previous.chunks)}
+        pending = [number for number, chunk in enumerate(chunks) if chunk["text"] not in reusable]
+
+        generation = f"{GENERATION_PREFIX}{time.time_ns()}"
+        directory = os.path.join(path, generation)
+        os.makedirs(directory)
+        try:
+            vectors_path = os.path.join(directory, VECTORS_FILE)
+            dim = previous.dim if reusable else None
+            matrix = None
+            if dim and chunks:
+                matrix = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(len(chunks), dim))
+                for number, chunk in enumerate(chunks):
+                    if chunk["text"] in reusable:
+                        matrix[number] = previous.vectors[reusable[chunk["text"]]]
+            for start in range(0, len(pending), batch_size):
+                numbers = pending[start:start + batch_size]
+                batch = np.asarray(embedder.embed_documents([chunks[number]["text"] for number in numbers]),
+                                   dtype=np.float32)
+                if matrix is None:
+                    dim = batch.shape[1]
+                    matrix = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(len(chunks), dim))
+                norms = np.linalg.norm(batch, axis=1, keepdims=True)
+                matrix[numbers] = batch / np.where(norms == 0, 1, norms)
+            if matrix is not None:
+                matrix.flush()
+                del matrix
+
+            with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"embedder": embedder_name, "dim": dim or 0, "fingerprint": fingerprint or {}, "chunks": chunks},
+                          f, ensure_ascii=False)
+            current_path = os.path.join(path, CURRENT_FILE)
+            with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+                f.write(generation)
+            os.replace(f"{current_path}.tmp", current_path)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+        store = cls(path)
+        store.embedded_count = len(pending)
+        _remove_old_generations(path, keep={generation, previous.generation if previous is not None else None})
+        return store
+
+    def search(self, query_vector, k=3):
+        """[(코사인 유사도, 구간)] 유사도 내림차순 상위 k개"""
+        if not self.chunks:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.vectors @ (query / norm if norm else query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[number]), self.chunks[number]) for number in top]
+
+
+def _remove_old_generations(path, keep):
+    """현재/직전 세대를 제외한 세대 디렉터리 삭제 (직전 세대는 아직 열려 있을 수 있어 다음 빌드 때 삭제)"""
+    for name in os.listdir(path):
+        if name.startswith(GENERATION_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+class MmapVectorRetriever(BaseRetriever):
+    """로컬 벡터 저장소를 사용하는 LangChain retriever"""
+
+    store: Any
+    embedder: Any
+    k: int = 3
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [
+            Document(page_content=chunk["text"], metadata={"source": chunk["source"], "heading": chunk["heading"], "score": score})
+            for score, chunk in self.store.search(self.embedder.embed_query(query), self.k)
+        ]
+
+
+def create_embedder(kind=RAG_EMBEDDER):
+    """(임베더, 임베더 이름) - 이름이 저장소와 다르면 저장소를 다시 만든다"""
+    if kind == "azure":
+        from utils.client_pool import get_embedding_client
+
+        deployment = os.getenv("AZURE_OPENAI_EMBEDDING")
+        return get_embedding_client(deployment), f"azure:{deployment}"
+    if kind == "hashing":
+        return HashingEmbeddings(), f"hashing:{HASHING_EMBEDDING_DIM}"
+    raise ValueError(f"지원하지 않는 임베더입니다: {kind}")
+
+
+_cached_store = None
+_cache_lock = threading.Lock()
+
+
+def get_vector_retriever(k=3, embedder=None, embedder_name=None, docs_dir=RAG_DOCS_DIR, path=RAG_VECTOR_STORE_DIR):
+    """rag-docs 벡터 검색 retriever (embedder를 주지 않으면 RAG_EMBEDDER 설정을 사용)"""
+    if embedder is None:
+        embedder, embedder_name = create_embedder()
+    return MmapVectorRetriever(store=load_vector_store(embedder, embedder_name, docs_dir, path), embedder=embedder, k=k)
+
+
+def load_vector_store(embedder, embedder_name, docs_dir=RAG_DOCS_DIR, path=RAG_VECTOR_STORE_DIR):
+    """저장된 벡터가 적재 기록/임베더와 같으면 memory-map하여 재사용하고, 아니면 바뀐 구간만 임베딩하여 갱신"""
+    manifest = load_manifest(docs_dir)
+    return update_vector_store(manifest, embedder, embedder_name, path)
+
+
+def update_vector_store(manifest, embedder, embedder_name, path=RAG_VECTOR_STORE_DIR):
+    """적재 기록(utils.rag_ingest)과 저장소의 fingerprint/임베더가 다르면 갱신"""
+    global _cached_store
+    fingerprint = manifest_fingerprint(manifest)
+    with _cache_lock:
+        store = _cached_store
+        if store is None or store.path != path:
+            store = None
+            if os.path.exists(os.path.join(path, CURRENT_FILE)):
+                try:
+                    store = MmapVectorStore(path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"벡터 저장소 로드 실패, 다시 만듭니다: {e}")
+        if store is None or store.fingerprint != fingerprint or store.embedder_name != embedder_name:
+            store = MmapVectorStore.build(path, manifest_chunks(manifest), embedder, embedder_name, fingerprint,
+                                          previous=store)
+        _cached_store = store
+        return store